@@ -0,0 +1,193 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Measures the throughput of saves against a local :py:class:`~pyswh.testing.MockSwhServer`.
+
+For the single (`save()` one origin after the other), bulk (`SwhClient.save_many()`) and async
+(`AsyncSwhClient.save_many()`) paths, the benchmark reports saves per minute, API requests per save,
+and the median and 99th percentile of the time from taking an origin to completing its save.
+
+Run it from the repository root with, e.g.::
+
+    python benchmarks/bench_save.py --origins 200 --concurrency 16 --task-delay 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import typing as t
+
+from pyswh import swh
+from pyswh.polling import PollingStrategy
+from pyswh.testing import MockSwhServer
+from pyswh.transport import create_transport
+
+PATHS = ('single', 'bulk', 'async')
+
+
+class Report(t.NamedTuple):
+    """
+    The measurements for one path.
+    """
+    path: str
+    saves: int
+    failures: int
+    seconds: float
+    requests: int
+    latencies: t.List[float]
+
+    @property
+    def saves_per_minute(self) -> float:
+        return self.saves / self.seconds * 60 if self.seconds else 0.0
+
+    @property
+    def requests_per_save(self) -> float:
+        return self.requests / self.saves if self.saves else 0.0
+
+    def percentile(self, p: int) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[p - 1]
+
+
+class _Timer:
+    """
+    Stamps origins as they are taken by a bulk save, and measures the time until their results are yielded.
+    """
+
+    def __init__(self, origins: t.Iterable[str]):
+        self._origins = origins
+        self._taken: t.Dict[str, float] = {}
+        self.latencies: t.List[float] = []
+        self.failures = 0
+
+    def __iter__(self) -> t.Iterator[str]:
+        for origin_url in self._origins:
+            self._taken[origin_url] = time.perf_counter()
+            yield origin_url
+
+    def done(self, result: swh.BulkSaveResult):
+        self.latencies.append(time.perf_counter() - self._taken.pop(result.origin_url))
+        if result.outcome is not swh.SaveOutcome.SUCCEEDED:
+            self.failures += 1
+
+
+def _origins(path: str, count: int) -> t.List[str]:
+    return [f'https://example.org/{path}/repo-{i}' for i in range(count)]
+
+
+def bench_single(server: MockSwhServer, origins: t.List[str], polling: PollingStrategy, transport: str,
+                 **_) -> t.Tuple[t.List[float], int]:
+    latencies, failures = [], 0
+    with swh.SwhClient(api_root_url=server.api_root_url, polling=polling,
+                       transport=create_transport(transport)) as client:
+        for origin_url in origins:
+            started = time.perf_counter()
+            try:
+                client.save(origin_url, False, None)
+            except swh.SwhSaveError:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+    return latencies, failures
+
+
+def bench_bulk(server: MockSwhServer, origins: t.List[str], polling: PollingStrategy, concurrency: int,
+               multiplex: bool, transport: str) -> t.Tuple[t.List[float], int]:
+    timer = _Timer(origins)
+    pool_maxsize = max(concurrency, swh._DEFAULT_POOL_MAXSIZE)
+    with swh.SwhClient(api_root_url=server.api_root_url, polling=polling, multiplex_polling=multiplex,
+                       transport=create_transport(transport, pool_maxsize=pool_maxsize)) as client:
+        for result in client.save_many(timer, max_workers=concurrency):
+            timer.done(result)
+    return timer.latencies, timer.failures
+
+
+def bench_async(server: MockSwhServer, origins: t.List[str], polling: PollingStrategy, concurrency: int,
+                **_) -> t.Tuple[t.List[float], int]:
+    from pyswh.aio import AsyncSwhClient
+
+    async def run():
+        timer = _Timer(origins)
+        async with AsyncSwhClient(api_root_url=server.api_root_url, polling=polling,
+                                  max_connections=concurrency) as client:
+            async for result in client.save_many(timer, max_concurrency=concurrency):
+                timer.done(result)
+        return timer.latencies, timer.failures
+
+    return asyncio.run(run())
+
+
+_BENCHMARKS = {'single': bench_single, 'bulk': bench_bulk, 'async': bench_async}
+
+
+def run(path: str, server: MockSwhServer, origins: t.List[str], polling: PollingStrategy, concurrency: int = 8,
+        multiplex: bool = False, transport: str = 'requests') -> Report:
+    """
+    Saves the origins on one path, and measures the throughput.
+
+    :param str path: The path to measure, one of `single`, `bulk` and `async`.
+    :param MockSwhServer server: The running mock server to save against.
+    :param t.List[str] origins: The URLs of the origins to save.
+    :param PollingStrategy polling: The polling strategy of the client.
+    :param int concurrency: The number of saves in flight on the bulk and async paths.
+    :param bool multiplex: Whether the bulk path checks the status with the central poller.
+    :param str transport: The transport backend of the single and bulk paths.
+    :return: The measurements.
+    :rtype: Report
+    """
+    requests_before = server.total_requests
+    started = time.perf_counter()
+    latencies, failures = _BENCHMARKS[path](server, origins, polling, concurrency=concurrency, multiplex=multiplex,
+                                            transport=transport)
+    seconds = time.perf_counter() - started
+    return Report(path, len(origins), failures, seconds, server.total_requests - requests_before, latencies)
+
+
+def _format(report: Report) -> str:
+    return (f'{report.path:<8} {report.saves:>6} {report.failures:>6} {report.seconds:>8.2f} '
+            f'{report.saves_per_minute:>10.1f} {report.requests_per_save:>8.2f} '
+            f'{report.percentile(50):>8.3f} {report.percentile(99):>8.3f}')
+
+
+def main(argv: t.Optional[t.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--origins', type=int, default=100, help='number of origins per path (default: %(default)s)')
+    parser.add_argument('--single-origins', type=int, metavar='N',
+                        help='number of origins for the single path (default: a tenth of --origins)')
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS), help='paths to measure')
+    parser.add_argument('--concurrency', type=int, default=8, help='saves in flight (default: %(default)s)')
+    parser.add_argument('--multiplex', action='store_true', help='use the central status poller on the bulk path')
+    parser.add_argument('--transport', choices=('requests', 'urllib3'), default='requests',
+                        help='transport of the single and bulk paths (default: %(default)s)')
+    parser.add_argument('--task-delay', type=float, default=0.3,
+                        help='seconds from submission to a completed save task (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency per request')
+    parser.add_argument('--rate-limit', type=int, default=1_000_000, help='requests per rate limit window')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of failing save tasks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 502')
+    parser.add_argument('--poll-delay', type=float, default=0.1,
+                        help='initial seconds between status checks (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    polling = PollingStrategy(initial_delay=args.poll_delay, max_delay=max(args.poll_delay, 5.0))
+    third = args.task_delay / 3
+    server = MockSwhServer(schedule_delay=third, run_delay=third, visit_delay=third, latency=args.latency,
+                           rate_limit=args.rate_limit, failure_rate=args.failure_rate, error_rate=args.error_rate,
+                           seed=0)
+    print(f'{"path":<8} {"saves":>6} {"failed":>6} {"seconds":>8} {"saves/min":>10} {"req/save":>8} '
+          f'{"p50 s":>8} {"p99 s":>8}')
+    with server:
+        for path in args.paths:
+            count = args.origins
+            if path == 'single':
+                count = args.single_origins if args.single_origins is not None else max(args.origins // 10, 1)
+            report = run(path, server, _origins(path, count), polling, args.concurrency, args.multiplex,
+                         args.transport)
+            print(_format(report), flush=True)
+
+
+if __name__ == '__main__':
+    main()
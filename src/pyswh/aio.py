@@ -0,0 +1,602 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+import logging
+import typing as t
+import weakref
+
+try:
+    import aiohttp
+except ImportError as ie:  # pragma: no cover
+    raise ImportError('The asyncio API of pyswh requires aiohttp. '
+                      'Install it with "pip install pyswh[async]".') from ie
+
+from pyswh import swh
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.errors import SwhSaveError, SwhSaveRejectedError
+from pyswh.metrics import NULL_METRICS, SLEEP_POLL, SLEEP_RETRY, Metrics, _trace_stage, _trace_status
+from pyswh.origins import OriginDeduplicator
+from pyswh.polling import Poll, PollingStrategy
+from pyswh.ratelimit import RateLimiter, TokenPool, _sleep_async
+from pyswh.result import SaveResult
+from pyswh.retry import CircuitBreaker, RetryPolicy
+from pyswh.swh import BulkSaveResult, SaveOutcome, _RequestMethod
+
+_DEFAULT_MAX_CONNECTIONS = 100
+_DEFAULT_MAX_CONCURRENCY = 100
+
+_log = logging.getLogger(__name__)
+
+
+class _AsyncResponse:
+    """
+    A response of the Software Heritage API whose content has been read completely,
+    so that it can be used after the underlying connection has been released to the pool.
+
+    :param int status_code: The HTTP status code of the response.
+    :param t.Mapping[str, str] headers: The (case-insensitive) headers of the response.
+    :param bytes content: The content of the response.
+    """
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code: int, headers: t.Mapping[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        """
+        The content of the response as text.
+        """
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> t.Any:
+        """
+        Parses the content of the response as JSON.
+
+        :return: The parsed content.
+        :rtype: t.Any
+        """
+        return json.loads(self.content)
+
+
+def _client_timeout(timeout: t.Union[float, t.Tuple[float, float], None]) -> aiohttp.ClientTimeout:
+    """
+    Converts a timeout in the format used by :py:class:`~pyswh.swh.SwhClient` to an :py:class:`aiohttp.ClientTimeout`.
+
+    :param timeout: The timeout in seconds, either as a single value, or as a `(connect, read)` tuple.
+    :return: The timeout for aiohttp.
+    :rtype: aiohttp.ClientTimeout
+    """
+    if isinstance(timeout, tuple):
+        return aiohttp.ClientTimeout(total=None, sock_connect=timeout[0], sock_read=timeout[1])
+    return aiohttp.ClientTimeout(total=timeout)
+
+
+class AsyncSwhClient:
+    """
+    An asyncio client for the Software Heritage API.
+
+    The async client works like :py:class:`~pyswh.swh.SwhClient`, but never blocks the event loop:
+    requests go through a shared pool of keep-alive connections managed by an :py:class:`aiohttp.ClientSession`,
+    and waiting for save tasks and for rate limit resets uses :py:func:`asyncio.sleep` (through the client's clock).
+    This allows thousands of saves to be in flight at the same time in a single event loop.
+
+    The client must be used from within a running event loop, preferably as an async context manager,
+    so that its connections are closed when it is no longer needed.
+
+    :param str api_root_url: The root URL of the Software Heritage API, e.g., to use a staging instance.
+    :param int max_connections: The maximum number of simultaneous connections in the pool.
+    :param timeout: The timeout for each request in seconds, either as a single value,
+        or as a `(connect, read)` tuple.
+    :param bool keep_alive: Whether to keep connections open between requests.
+    :param RateLimiter rate_limiter: The rate limiter that holds the rate budget for all requests made by the client.
+        It can be shared with other clients, including synchronous ones. Defaults to a new blocking
+        :py:class:`~pyswh.ratelimit.RateLimiter` that reports to the client's metrics.
+    :param PollingStrategy polling: The strategy for polling the status of saves.
+        Defaults to a :py:class:`~pyswh.polling.PollingStrategy` with exponential backoff from one second,
+        and without a timeout.
+    :param Metrics metrics: The metrics to report requests, the stages of saves and the time spent waiting to.
+        Defaults to discarding all measurements.
+    :param RetryPolicy retry: The policy for retrying requests that have failed transiently.
+        Defaults to a :py:class:`~pyswh.retry.RetryPolicy` with up to four attempts per request.
+    :param CircuitBreaker circuit_breaker: The circuit breaker that pauses all requests while the API is down,
+        which may be shared with other clients, including synchronous ones. Defaults to a new
+        :py:class:`~pyswh.retry.CircuitBreaker` that reports to the client's metrics.
+    :param bool keep_raw_responses: Whether errors should keep the body of the API response that caused them in
+        :py:attr:`~pyswh.errors.SwhSaveError.raw`. By default, only the statuses are kept.
+    :param Clock clock: The clock that the client tells the time and waits with, and that the default rate limiter
+        and circuit breaker use. Defaults to the system clock; pass a :py:class:`~pyswh.clock.VirtualClock`
+        to simulate waits.
+    """
+
+    def __init__(self,
+                 api_root_url: str = swh._API_ROOT_URL,
+                 max_connections: int = _DEFAULT_MAX_CONNECTIONS,
+                 timeout: t.Union[float, t.Tuple[float, float], None] = swh._DEFAULT_TIMEOUT,
+                 keep_alive: bool = True,
+                 rate_limiter: t.Optional[RateLimiter] = None,
+                 polling: t.Optional[PollingStrategy] = None,
+                 metrics: t.Optional[Metrics] = None,
+                 retry: t.Optional[RetryPolicy] = None,
+                 circuit_breaker: t.Optional[CircuitBreaker] = None,
+                 keep_raw_responses: bool = False,
+                 clock: t.Optional[Clock] = None):
+        self.api_root_url = swh._prepare_url(api_root_url)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.rate_limiter = (rate_limiter if rate_limiter is not None
+                             else RateLimiter(metrics=self.metrics, clock=self.clock))
+        self.polling = polling if polling is not None else PollingStrategy()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.circuit_breaker = (circuit_breaker if circuit_breaker is not None
+                                else CircuitBreaker(metrics=self.metrics, clock=self.clock))
+        self.keep_raw_responses = keep_raw_responses
+        self._session: t.Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncSwhClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the session of this client, and the connections in its pool.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The :py:class:`aiohttp.ClientSession` that holds the client's connection pool.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, force_close=not self.keep_alive)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=_client_timeout(self.timeout))
+        return self._session
+
+    def _raw(self, response: _AsyncResponse) -> t.Optional[bytes]:
+        """
+        Returns the body of a response to keep in an error, if the client keeps raw responses.
+        """
+        return response.content if self.keep_raw_responses else None
+
+    def _build_request_url(self, origin_url: str) -> str:
+        """
+        Constructs a valid request URL to use with the Software Heritage API from its parts.
+
+        :param str origin_url: The URL for the origin source code repository that should be saved.
+        :return: A valid request URL
+        :rtype: str
+        """
+        return swh._prepare_url(self.api_root_url + swh._API_ENDPOINT_SAVE + swh._visit_type + swh._API_URL_PATH
+                                + origin_url)
+
+    async def _ping(self, auth_token: t.Optional[str] = None) -> t.Tuple[int, t.Mapping[str, str]]:
+        """
+        Pings the SWH API.
+
+        :param str auth_token: An optional SWH auth token, whose rate limit should be reported.
+        :return: The status code and the headers of the ping response, which contain rate limit information.
+        :rtype: t.Tuple[int, t.Mapping[str, str]]
+        """
+        headers = {'Authorization': f'Bearer {auth_token}'} if auth_token else None
+        started = self.clock.monotonic()
+        try:
+            async with self.session.get(self.api_root_url + swh._API_ENDPOINT_PING, headers=headers) as response:
+                await response.read()
+        except aiohttp.ClientError:
+            swh._report_request(self.metrics, 'ping', 'GET', started, clock=self.clock)
+            raise
+        swh._report_request(self.metrics, 'ping', 'GET', started, response.status, response.headers, self.clock)
+        return response.status, response.headers
+
+    async def _check_rate_limit(self):
+        """
+        Takes one request from the rate budget of the client's :py:class:`~pyswh.ratelimit.RateLimiter`,
+        and backs off if the rate limit is exceeded.
+        """
+        await self.rate_limiter.acquire_async(self._ping)
+
+    async def _request(self, method: _RequestMethod, origin_url: str, auth_token: swh.AuthToken) -> _AsyncResponse:
+        """
+        Makes a rate limit-safe request to the SWH API and returns the completely read response.
+        Requests that fail transiently are retried like those of :py:class:`~pyswh.swh.SwhClient`.
+
+        :param _RequestMethod method: The request method to use for the request.
+        :param str origin_url: The origin URL to use for construction of the request URL.
+        :param auth_token: An optional SWH auth token, or a pool of tokens.
+        :return: The response returned for the request.
+        :rtype: _AsyncResponse
+        """
+        request_url = self._build_request_url(origin_url)
+        endpoint = 'save' if method is _RequestMethod.POST else 'status'
+        pool = auth_token if isinstance(auth_token, TokenPool) else None
+        headers = {'Accept': 'application/json'}
+        attempts = 0
+        while True:
+            await self.circuit_breaker.wait_async()
+            try:
+                auth_token = await self._authorize(pool, auth_token, headers)
+                result = await self._send(method, request_url, headers, endpoint)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.circuit_breaker.record_failure()
+                attempts += 1
+                if not self.retry.should_retry(method.value, attempts, not isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                await self._wait_to_retry(request_url, attempts, repr(e))
+                continue
+            if await self._learn_rate_limit(result, pool, auth_token):
+                continue
+            if not self.retry.is_transient(result.status_code):
+                self.circuit_breaker.record_success()
+                return result
+            self.circuit_breaker.record_failure()
+            attempts += 1
+            if not self.retry.should_retry(method.value, attempts):
+                return result
+            await self._wait_to_retry(request_url, attempts, f'HTTP status {result.status_code}', result.headers)
+
+    async def _authorize(self, pool: t.Optional[TokenPool], auth_token: swh.AuthToken,
+                         headers: t.Dict[str, str]) -> t.Optional[str]:
+        """
+        Takes one request from the rate budget, and sets the `Authorization` header of a request,
+        see :meth:`~pyswh.swh.SwhClient._authorize`.
+        """
+        if pool is not None:
+            auth_token = await pool.acquire_async(self._ping)
+        else:
+            await self._check_rate_limit()
+        if auth_token:
+            headers['Authorization'] = f'Bearer {auth_token}'
+        return auth_token
+
+    async def _send(self, method: _RequestMethod, request_url: str, headers: t.Mapping[str, str],
+                    endpoint: str) -> _AsyncResponse:
+        """
+        Sends a single request with the client's session, reads the response completely,
+        and reports the request to the client's metrics.
+
+        :return: The response returned for the request.
+        :rtype: _AsyncResponse
+        """
+        started = self.clock.monotonic()
+        try:
+            async with self.session.request(method.value, request_url, headers=headers) as response:
+                result = _AsyncResponse(response.status, response.headers, await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            swh._report_request(self.metrics, endpoint, method.value, started, clock=self.clock)
+            raise
+        swh._report_request(self.metrics, endpoint, method.value, started, result.status_code, result.headers,
+                            self.clock)
+        return result
+
+    async def _learn_rate_limit(self, result: _AsyncResponse, pool: t.Optional[TokenPool],
+                                auth_token: t.Optional[str]) -> bool:
+        """
+        Updates the rate limiter of the client, or of the token from the pool, from the headers of a response,
+        and backs off if the API has responded with HTTP status code 429 (Too many requests).
+
+        :return: Whether the request has been answered with HTTP status code 429, and should be repeated.
+        :rtype: bool
+        """
+        if result.status_code == 429:
+            self.circuit_breaker.record_success()
+            if pool is not None:
+                pool.back_off(auth_token, result.headers)
+            else:
+                await self.rate_limiter.back_off_async(result.headers)
+            return True
+        if pool is not None:
+            pool.update(auth_token, result.headers)
+        else:
+            await self.rate_limiter.update_async(result.headers)
+        return False
+
+    async def _wait_to_retry(self, request_url: str, attempts: int, failure: t.Any,
+                             headers: t.Optional[t.Mapping[str, str]] = None):
+        """
+        Waits before retrying a request that has failed transiently, as long as the client's retry policy says.
+
+        :param str request_url: The URL of the request.
+        :param int attempts: The number of attempts made so far.
+        :param failure: The error or the HTTP status that the request has failed with.
+        :param t.Mapping[str, str] headers: The headers of the failed response, if any.
+        """
+        delay = self.retry.delay(attempts, headers, self.clock.time())
+        _log.warning(f'Request to {request_url} failed ({failure}). '
+                     f'Retrying in {delay:.1f} sec. (attempt {attempts + 1} of {self.retry.max_attempts}).')
+        await _sleep_async(self.metrics, delay, SLEEP_RETRY, self.clock)
+
+    async def _init_save(self, origin_url: str, auth_token: str) -> _AsyncResponse:
+        """
+        Requests the initial save action in the Software Heritage API.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :return: The response returned for the request.
+        :rtype: _AsyncResponse
+        :raises SwhSaveError: if no connection to the internet exists.
+        """
+        try:
+            return await self._request(_RequestMethod.POST, origin_url, auth_token)
+        except aiohttp.ClientConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+
+    async def _get_status(self, origin_url: str, auth_token: str, task_id: str,
+                          poll: Poll) -> t.Tuple[_AsyncResponse, t.Any]:
+        """
+        Requests the current status of a save task.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param Poll poll: The state of polling for this save, which counts the status check.
+        :return: The response, and the JSON object for the save task.
+        :rtype: t.Tuple[_AsyncResponse, t.Any]
+        :raises SwhSaveError: if no connection to the internet exists, or if the status cannot be retrieved.
+        """
+        try:
+            response = await self._request(_RequestMethod.GET, origin_url, auth_token)
+        except aiohttp.ClientConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API during progress check. '
+                               'Are you connected to the internet?')
+        poll.polls += 1
+        swh._raise_for_status_check(origin_url, response.status_code)
+        _trace_status(self.metrics, poll, swh._find_current_result(response.text, task_id, poll, self._raw(response)))
+        return response, poll.status
+
+    async def _check_save_progress(self, origin_url: str, auth_token: str, task_id: str, poll: Poll) -> int:
+        """
+        Checks on the progress of the save action until it has completed, and reports its results.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param Poll poll: The state of polling for this save.
+        :return: The number of status checks made for the save.
+        :rtype: int
+        :raises SwhSaveError: if no connection to the internet exists, or if the save action was unsuccessful.
+        :raises SwhSaveTimeoutError: if the save action has not completed within the timeout of the polling strategy.
+        """
+        while True:
+            response, response_json = await self._get_status(origin_url, auth_token, task_id, poll)
+            save_status = response_json['save_task_status']
+            if save_status == 'failed':
+                raise swh._failed_error(origin_url, response_json, self._raw(response))
+            elif save_status == 'succeeded':
+                _log.info(f'Saving {origin_url} has succeeded with visit status {response_json["visit_status"]}!')
+                return poll.polls
+            # One of not created, not yet scheduled, scheduled
+            delay = poll.next_delay()
+            _log.info(f'The save task for {origin_url} is {save_status}. '
+                      f'Waiting for {delay:.1f} sec. before checking the status again.')
+            await _sleep_async(self.metrics, delay, SLEEP_POLL, self.clock)
+
+    async def _check_status(self, response: _AsyncResponse, auth_token: str, task_id: str, poll: Poll) -> int:
+        """
+        Checks the status of the save action as reported by the response to the initial save request,
+        waits until the save request has been accepted or rejected, and then checks on the progress of the save.
+
+        :param _AsyncResponse response: The response of the initial save request.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the current save task.
+        :param Poll poll: The state of polling for this save.
+        :return: The number of status checks made for the save.
+        :rtype: int
+        :raises SwhSaveError: if the save request has been rejected.
+        """
+        response_json = swh._find_current_result(response.text, task_id, poll, self._raw(response))
+        origin_url = response_json['origin_url']
+        poll.task_id = task_id
+        _trace_status(self.metrics, poll, response_json)
+        while response_json['save_request_status'] == 'pending':
+            delay = poll.next_delay()
+            _log.info(f'The request to save {origin_url} is still pending. '
+                      f'Waiting for {delay:.1f} sec. before checking the status again.')
+            await _sleep_async(self.metrics, delay, SLEEP_POLL, self.clock)
+            response, response_json = await self._get_status(origin_url, auth_token, task_id, poll)
+        if response_json['save_request_status'] == 'rejected':
+            raise swh._rejected_error(origin_url, response_json, self._raw(response))
+
+        # Request status is accepted, check for save progress
+        return await self._check_save_progress(origin_url, auth_token, task_id, poll)
+
+    async def _save(self, origin_url: str, post_only: bool, auth_token: str, poll: Poll):
+        """
+        Attempts to save code in the Software Heritage Archive, and counts the status checks in the given poll.
+
+        :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API and return.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param Poll poll: The state of polling for this save.
+        :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+        """
+        init_response = await self._init_save(origin_url, auth_token)
+        if init_response.status_code == 200:
+            _trace_stage(self.metrics, poll, 'submitted')
+        if post_only:
+            if init_response.status_code == 200:
+                swh._keep_submitted(poll, init_response)
+            return
+        if init_response.status_code == 200:
+            # The API promises exactly one object as content of the POST response, so we can safely get the task ID
+            task_id = init_response.json()['loading_task_id']
+            await self._check_status(init_response, auth_token, task_id, poll)
+        else:
+            swh._raise_for_init_status(origin_url, init_response.status_code, self._raw(init_response))
+
+    async def save(self, origin_url: str, post_only: bool, auth_token: swh.AuthToken) -> SaveResult:
+        """
+        Attempts to save code in the Software Heritage Archive.
+
+        This coroutine wraps the `/api/1/origin/save/ <https://archive.softwareheritage.org/1/origin/save/doc/>`_
+        endpoint. It can be awaited in :py:func:`asyncio.gather` together with many other saves.
+        The status of the save is checked following the client's :py:class:`~pyswh.polling.PollingStrategy`.
+
+        :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API and return,
+            without checking for the success of the save operation.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :return: The result of the save.
+        :rtype: SaveResult
+        :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+            The error carries the result of the save up to the error.
+        :raises SwhSaveTimeoutError: if the save has not completed within the timeout of the polling strategy.
+        """
+        poll = self.polling.start(origin_url, self.clock)
+        try:
+            await self._save(origin_url, post_only, auth_token, poll)
+        except SwhSaveError as sse:
+            raise swh._with_result(sse, poll)
+        return SaveResult.from_poll(poll, swh._visit_type)
+
+    async def _save_one(self, origin_url: str, post_only: bool, auth_token: str) -> BulkSaveResult:
+        """
+        Saves a single origin, and captures the outcome instead of raising an error.
+
+        :param str origin_url: The URL of the origin that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :return: The result of the save.
+        :rtype: BulkSaveResult
+        """
+        poll = self.polling.start(origin_url, self.clock)
+        try:
+            await self._save(origin_url, post_only, auth_token, poll)
+        except SwhSaveRejectedError as sre:
+            outcome, error = SaveOutcome.REJECTED, sre
+        except SwhSaveError as sse:
+            outcome, error = SaveOutcome.FAILED, sse
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ce:
+            outcome = SaveOutcome.FAILED
+            error = SwhSaveError(f'Request to the Software Heritage API failed for {origin_url}: {ce!r}')
+        else:
+            outcome, error = SaveOutcome.SUCCEEDED, None
+        if error is not None:
+            return BulkSaveResult(origin_url, outcome, error, poll.polls, swh._with_result(error, poll).result)
+        return BulkSaveResult(origin_url, outcome, None, poll.polls, SaveResult.from_poll(poll, swh._visit_type))
+
+    async def save_all(self, origins: t.Iterable[str], auth_token: swh.AuthToken = None,
+                       max_concurrency: int = _DEFAULT_MAX_CONCURRENCY,
+                       post_only: bool = False) -> t.List[BulkSaveResult]:
+        """
+        Attempts to save many origins in the Software Heritage Archive concurrently,
+        and returns the results once all saves have completed.
+
+        The saves are run with :py:func:`asyncio.gather`, and at most `max_concurrency` of them are in flight at the
+        same time. Errors do not end the bulk save, but are reported in the results.
+
+        :param t.Iterable[str] origins: The URLs of the origins that should be saved in the archive.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int max_concurrency: The maximum number of origins to save at the same time.
+        :param bool post_only: Whether the URLs should simply be posted to the API,
+            without checking for the success of the save operations.
+        :return: The results of the saves, in the order of the origins.
+        :rtype: t.List[BulkSaveResult]
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def bounded_save(origin_url: str) -> BulkSaveResult:
+            async with semaphore:
+                return await self._save_one(origin_url, post_only, auth_token)
+
+        return list(await asyncio.gather(*(bounded_save(origin_url) for origin_url in origins)))
+
+    def save_many(self, origins: t.Iterable[str], auth_token: swh.AuthToken = None,
+                  max_concurrency: int = _DEFAULT_MAX_CONCURRENCY, post_only: bool = False,
+                  dedupe: bool = False) -> t.AsyncIterator[BulkSaveResult]:
+        """
+        Attempts to save many origins in the Software Heritage Archive concurrently,
+        and yields the result for each origin as soon as its save has completed.
+
+        Origins are taken lazily from the iterable, so that it may be a stream of arbitrary length.
+        With `dedupe`, equivalent origin URLs are saved only once, see :meth:`pyswh.swh.SwhClient.save_many`.
+
+        :param t.Iterable[str] origins: The URLs of the origins that should be saved in the archive.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int max_concurrency: The maximum number of origins to save at the same time.
+        :param bool post_only: Whether the URLs should simply be posted to the API,
+            without checking for the success of the save operations.
+        :param bool dedupe: Whether to save equivalent origin URLs only once.
+        :return: An async iterator over the results of the saves, in the order in which they complete.
+        :rtype: t.AsyncIterator[BulkSaveResult]
+        """
+        if dedupe:
+            deduplicator: OriginDeduplicator[BulkSaveResult] = OriginDeduplicator()
+            return deduplicator.fan_out_async(self._save_many(deduplicator.unique(origins), auth_token,
+                                                              max_concurrency, post_only))
+        return self._save_many(origins, auth_token, max_concurrency, post_only)
+
+    async def _save_many(self, origins: t.Iterable[str], auth_token: swh.AuthToken, max_concurrency: int,
+                         post_only: bool) -> t.AsyncIterator[BulkSaveResult]:
+        """
+        Saves many origins concurrently, see :meth:`save_many`.
+        """
+        pending: t.Set[asyncio.Future] = set()
+        try:
+            for origin_url in origins:
+                pending.add(asyncio.ensure_future(self._save_one(origin_url, post_only, auth_token)))
+                if len(pending) >= max_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_default_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSwhClient]' = \
+    weakref.WeakKeyDictionary()
+
+
+def _get_default_client() -> AsyncSwhClient:
+    """
+    Returns the shared async client for the running event loop, and creates it on first use.
+    All default async clients share their rate limiter and circuit breaker with the default client of
+    :py:mod:`pyswh.swh`.
+
+    :return: The default async client for the running event loop.
+    :rtype: AsyncSwhClient
+    """
+    loop = asyncio.get_running_loop()
+    client = _default_clients.get(loop)
+    if client is None:
+        default_client = swh._get_default_client()
+        client = AsyncSwhClient(rate_limiter=default_client.rate_limiter,
+                                circuit_breaker=default_client.circuit_breaker)
+        _default_clients[loop] = client
+    return client
+
+
+async def async_save(origin_url: str, post_only: bool, auth_token: swh.AuthToken) -> SaveResult:
+    """
+    Attempts to save code in the Software Heritage Archive without blocking the event loop.
+
+    This coroutine uses a shared default :py:class:`AsyncSwhClient` for the running event loop.
+    Create your own :py:class:`AsyncSwhClient` to configure the connection pool, timeouts, or the API root URL,
+    and to control when its connections are closed.
+
+    :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+    :param bool post_only: Whether the URL should simply be posted to the API and return,
+        without checking for the success of the save operation.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :return: The result of the save.
+    :rtype: SaveResult
+    :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+    """
+    return await _get_default_client().save(origin_url, post_only, auth_token)
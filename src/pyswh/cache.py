@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+
+_DEFAULT_MAXSIZE = 4096
+_DEFAULT_TTL = 3600.0  # seconds
+
+_log = logging.getLogger(__name__)
+
+
+class VisitCache:
+    """
+    A thread-safe LRU cache with a time to live, for the latest visits of origins.
+
+    Each entry expires `ttl` seconds after it has been stored. When the cache is full, the least recently used entry
+    is evicted. If a `path` is given, the cache is loaded from that JSON file, if it exists, and written back to it
+    by :meth:`save`, so that repeated runs over overlapping lists of origins do not look up the same visits again.
+
+    :param int maxsize: The maximum number of entries.
+    :param float ttl: The number of seconds for which an entry is valid.
+    :param str path: The path of an optional JSON file to persist the cache in.
+    :param Clock clock: The clock to tell the time with. Defaults to the system clock.
+    """
+
+    def __init__(self, maxsize: int = _DEFAULT_MAXSIZE, ttl: float = _DEFAULT_TTL, path: t.Optional[str] = None,
+                 clock: t.Optional[Clock] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self._entries: 'OrderedDict[str, t.Tuple[float, t.Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def lookup(self, key: str) -> t.Tuple[bool, t.Any]:
+        """
+        Looks up an entry.
+
+        :param str key: The key of the entry.
+        :return: Whether a valid entry exists, and its value.
+        :rtype: t.Tuple[bool, t.Any]
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= self.clock.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: str, value: t.Any):
+        """
+        Stores an entry, and evicts the least recently used entry if the cache is full.
+
+        :param str key: The key of the entry.
+        :param t.Any value: The value of the entry, which must be serializable as JSON if the cache is persisted.
+        """
+        with self._lock:
+            self._entries[key] = (self.clock.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        """
+        Removes an entry, if it exists.
+
+        :param str key: The key of the entry.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def save(self):
+        """
+        Writes the valid entries to the cache's file, if it has a path.
+        """
+        if self.path is None:
+            return
+        now = self.clock.time()
+        with self._lock:
+            entries = [[key, expires, value] for key, (expires, value) in self._entries.items() if expires > now]
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self, path: str):
+        """
+        Loads the valid entries from a file written by :meth:`save`.
+        """
+        now = self.clock.time()
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            _log.warning(f'Could not load the visit cache from {path}: {e}')
+            return
+        for key, expires, value in entries[-self.maxsize:]:
+            if expires > now:
+                self._entries[key] = (expires, value)
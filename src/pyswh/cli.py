@@ -0,0 +1,273 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import argparse
+from collections import Counter
+import json
+import logging
+import os
+import sys
+import time
+import typing as t
+
+from pyswh import swh
+from pyswh.journal import SaveJournal
+from pyswh.polling import PollingStrategy
+from pyswh.ratelimit import TokenPool
+from pyswh.retry import RetryPolicy
+
+EXIT_OK = 0
+"""All origins have been saved, or skipped."""
+EXIT_PARTIAL_FAILURE = 1
+"""Some origins could not be saved."""
+EXIT_USAGE = 2
+"""The command line is invalid."""
+EXIT_FAILURE = 3
+"""No origin could be saved."""
+EXIT_INTERRUPTED = 130
+"""The command has been interrupted."""
+
+_ENV_AUTH_TOKENS = 'PYSWH_AUTH_TOKENS'
+_DEFAULT_PROGRESS_INTERVAL = 5.0  # seconds
+
+_log = logging.getLogger(__name__)
+
+
+def _read_origins(stream: t.TextIO) -> t.Iterator[str]:
+    """
+    Reads origin URLs from a stream one line at a time, skipping empty lines and comments starting with `#`.
+
+    :param t.TextIO stream: The stream to read from.
+    :return: An iterator over the origin URLs.
+    :rtype: t.Iterator[str]
+    """
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def _result_line(result: swh.BulkSaveResult) -> str:
+    """
+    Serializes the result of a save as a line of JSON.
+
+    :param swh.BulkSaveResult result: The result of the save.
+    :return: The JSON line, without a line break.
+    :rtype: str
+    """
+    line = {'origin_url': result.origin_url,
+            'outcome': result.outcome.value,
+            'error': str(result.error) if result.error is not None else None,
+            'polls': result.polls}
+    if result.result is not None:
+        line.update(task_id=result.result.task_id, request_status=result.result.request_status,
+                    task_status=result.result.task_status, visit_status=result.result.visit_status,
+                    duration=round(result.result.duration, 3))
+    return json.dumps(line)
+
+
+class _Progress:
+    """
+    Counts the outcomes of saves, and reports progress and throughput.
+
+    :param t.TextIO stream: The stream to report to.
+    :param float interval: The minimum number of seconds between two progress reports, or `None` to not report
+        progress while saving.
+    """
+
+    def __init__(self, stream: t.TextIO, interval: t.Optional[float]):
+        self.stream = stream
+        self.interval = interval
+        self.outcomes: t.Counter[swh.SaveOutcome] = Counter()
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    @property
+    def total(self) -> int:
+        """
+        The number of origins that have been processed.
+        """
+        return sum(self.outcomes.values())
+
+    def record(self, result: swh.BulkSaveResult):
+        """
+        Counts the outcome of a save, and reports progress if the interval has passed.
+
+        :param swh.BulkSaveResult result: The result of the save.
+        """
+        self.outcomes[result.outcome] += 1
+        now = time.monotonic()
+        if self.interval is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, final: bool = False):
+        """
+        Writes a line with the counts of outcomes and the throughput.
+
+        :param bool final: Whether this is the summary after all origins have been processed.
+        """
+        elapsed = time.monotonic() - self.started
+        rate = self.total / elapsed * 60 if elapsed > 0 else 0.0
+        counts = ', '.join(f'{self.outcomes[outcome]} {outcome.value}' for outcome in swh.SaveOutcome)
+        prefix = 'Done' if final else 'Progress'
+        self.stream.write(f'{prefix}: {self.total} origins in {elapsed:.0f} sec. ({counts}), {rate:.1f} saves/min\n')
+        self.stream.flush()
+
+    def exit_code(self) -> int:
+        """
+        Computes the exit code from the outcomes.
+
+        :return: :py:data:`EXIT_OK` if no save has failed, :py:data:`EXIT_FAILURE` if all saves have failed,
+            and :py:data:`EXIT_PARTIAL_FAILURE` otherwise.
+        :rtype: int
+        """
+        failed = self.outcomes[swh.SaveOutcome.FAILED] + self.outcomes[swh.SaveOutcome.REJECTED]
+        if failed == 0:
+            return EXIT_OK
+        if failed == self.total:
+            return EXIT_FAILURE
+        return EXIT_PARTIAL_FAILURE
+
+
+def _auth_token(tokens: t.List[str]) -> t.Union[str, TokenPool, None]:
+    """
+    Selects the authentication to use from the tokens given on the command line or in the environment.
+
+    :param t.List[str] tokens: The tokens given on the command line.
+    :return: No token, a single token, or a pool of several tokens.
+    :rtype: t.Union[str, TokenPool, None]
+    """
+    if not tokens:
+        tokens = os.environ.get(_ENV_AUTH_TOKENS, '').replace(',', ' ').split()
+    if not tokens:
+        return None
+    if len(tokens) == 1:
+        return tokens[0]
+    return TokenPool(tokens)
+
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    Creates the parser for the command line.
+
+    :return: The argument parser.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog='pyswh', description='Save code in the Software Heritage Archive.')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='log more details to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+    save = commands.add_parser('save', help='save origins in the archive',
+                               description='Save origins in the archive. One JSON line is written for each origin '
+                                           'as soon as its save has completed. The exit code is 0 if no save has '
+                                           'failed, 1 if some saves have failed, and 3 if all saves have failed.')
+    save.add_argument('origins', nargs='*', metavar='URL', help='origin URLs to save, in addition to --from')
+    save.add_argument('-f', '--from', dest='source', metavar='FILE',
+                      help='file with one origin URL per line, or - for stdin (default: stdin if no URL is given)')
+    save.add_argument('-o', '--output', metavar='FILE', help='file to append the results to (default: stdout)')
+    save.add_argument('-c', '--concurrency', type=int, default=swh._DEFAULT_MAX_WORKERS, metavar='N',
+                      help='number of origins to save at the same time (default: %(default)s)')
+    save.add_argument('-t', '--token', action='append', default=[], metavar='TOKEN',
+                      help=f'API authentication token; repeat to use a pool of tokens '
+                           f'(default: whitespace-separated tokens in ${_ENV_AUTH_TOKENS})')
+    save.add_argument('--post-only', action='store_true', help='submit the save requests without waiting for them')
+    save.add_argument('--timeout', type=float, metavar='SEC', help='maximum number of seconds to wait for each save')
+    save.add_argument('--retries', type=int, default=RetryPolicy().max_attempts - 1, metavar='N',
+                      help='number of retries of requests that fail transiently (default: %(default)s)')
+    save.add_argument('--journal', metavar='FILE', help='SQLite journal to record the saves in, and to resume from')
+    save.add_argument('--freshness', type=float, metavar='SEC',
+                      help='skip origins that the journal has recorded as saved within SEC seconds')
+    save.add_argument('--min-age', type=float, metavar='SEC',
+                      help='skip origins whose latest visit in the archive is younger than SEC seconds')
+    save.add_argument('--dedupe', action='store_true',
+                      help='save equivalent spellings of an origin URL only once, and report the result for each')
+    save.add_argument('--progress', type=float, metavar='SEC', nargs='?', const=_DEFAULT_PROGRESS_INTERVAL,
+                      help='report progress to stderr every SEC seconds (default: every '
+                           f'{_DEFAULT_PROGRESS_INTERVAL:.0f} seconds if stderr is a terminal)')
+    save.add_argument('-q', '--quiet', action='store_true', help='do not report progress or a summary')
+    return parser
+
+
+def _origins(args: argparse.Namespace, stdin: t.TextIO) -> t.Iterator[str]:
+    """
+    Streams the origin URLs given on the command line, and from the input file or stdin.
+    """
+    yield from args.origins
+    if args.source is None and args.origins:
+        return
+    if args.source in (None, '-'):
+        yield from _read_origins(stdin)
+    else:
+        with open(args.source, encoding='utf-8') as f:
+            yield from _read_origins(f)
+
+
+def _save(args: argparse.Namespace, stdin: t.TextIO, stdout: t.TextIO, stderr: t.TextIO) -> int:
+    """
+    Runs the `save` command.
+
+    :return: The exit code.
+    :rtype: int
+    """
+    if args.concurrency < 1:
+        stderr.write('pyswh: error: --concurrency must be at least 1\n')
+        return EXIT_USAGE
+    if args.retries < 0:
+        stderr.write('pyswh: error: --retries must not be negative\n')
+        return EXIT_USAGE
+    interval = args.progress
+    if interval is None and not args.quiet and stderr.isatty():
+        interval = _DEFAULT_PROGRESS_INTERVAL
+    progress = _Progress(stderr, None if args.quiet else interval)
+    polling = PollingStrategy(timeout=args.timeout)
+    output = open(args.output, 'a', encoding='utf-8') if args.output else stdout
+    journal = SaveJournal(args.journal) if args.journal else None
+    try:
+        with swh.SwhClient(pool_maxsize=max(args.concurrency, swh._DEFAULT_POOL_MAXSIZE), polling=polling,
+                           retry=RetryPolicy(max_attempts=args.retries + 1)) as client:
+            results = client.save_many(_origins(args, stdin), _auth_token(args.token), args.concurrency,
+                                       args.post_only, journal, args.freshness, args.min_age, args.dedupe)
+            for result in results:
+                output.write(_result_line(result) + '\n')
+                output.flush()
+                progress.record(result)
+    except KeyboardInterrupt:
+        stderr.write('pyswh: interrupted\n')
+        return EXIT_INTERRUPTED
+    finally:
+        if journal is not None:
+            journal.close()
+        if output is not stdout:
+            output.close()
+        if not args.quiet:
+            progress.report(final=True)
+    return progress.exit_code()
+
+
+def main(argv: t.Optional[t.List[str]] = None, stdin: t.TextIO = None, stdout: t.TextIO = None,
+         stderr: t.TextIO = None) -> int:
+    """
+    Runs the `pyswh` command line interface.
+
+    :param t.List[str] argv: The command line arguments, defaults to the arguments of the process.
+    :param t.TextIO stdin: The stream to read origin URLs from, defaults to standard input.
+    :param t.TextIO stdout: The stream to write results to, defaults to standard output.
+    :param t.TextIO stderr: The stream to write progress and errors to, defaults to standard error.
+    :return: The exit code.
+    :rtype: int
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    try:
+        args = _parser().parse_args(argv)
+    except SystemExit as e:
+        return e.code
+    logging.basicConfig(stream=stderr, format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+                        level=logging.WARNING - 10 * min(args.verbose, 2))
+    try:
+        return _save(args, stdin, stdout, stderr)
+    except OSError as e:
+        stderr.write(f'pyswh: error: {e}\n')
+        return EXIT_USAGE
@@ -0,0 +1,126 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import threading
+import time
+import typing as t
+
+
+class Clock:
+    """
+    The source of time for clients, rate limiters, circuit breakers and polls, which tells the time and waits.
+
+    This base class uses the system clock, and is the default. :py:class:`VirtualClock` simulates time instead, so
+    that back-offs and polling can be replayed without waiting.
+    """
+
+    def time(self) -> float:
+        """
+        Returns the current time.
+
+        :return: The current epoch in seconds, as used by the rate limit reset times of the API.
+        :rtype: float
+        """
+        return time.time()
+
+    def monotonic(self) -> float:
+        """
+        Returns the value of a monotonic clock, to measure durations with.
+
+        :return: The value of the clock in seconds.
+        :rtype: float
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        """
+        Waits, blocking the calling thread.
+
+        :param float seconds: The number of seconds to wait.
+        """
+        time.sleep(seconds)
+
+    def wait(self, condition: threading.Condition, seconds: float) -> bool:
+        """
+        Waits until a condition is notified, or until a number of seconds has passed.
+
+        :param threading.Condition condition: The condition to wait for, whose lock the calling thread holds.
+        :param float seconds: The maximum number of seconds to wait.
+        :return: Whether the condition has been notified, rather than the time having passed.
+        :rtype: bool
+        """
+        return condition.wait(seconds)
+
+    async def sleep_async(self, seconds: float):
+        """
+        Waits without blocking the event loop.
+
+        :param float seconds: The number of seconds to wait.
+        """
+        import asyncio  # Only needed by the asyncio API, and slow to import
+        await asyncio.sleep(seconds)
+
+
+SYSTEM_CLOCK = Clock()
+"""The :py:class:`Clock` that uses the system clock."""
+
+
+class VirtualClock(Clock):
+    """
+    A clock that simulates time: waiting returns immediately, and advances the clock by the time waited.
+
+    Time passes only when someone waits, or when the clock is advanced with :meth:`advance`, so that hours of
+    back-offs and polling run in milliseconds, with deterministic timings. Each wait advances the clock on its own,
+    which is exact for saves that run one after the other. The waits of concurrent threads add up rather than overlap.
+
+    Waiting for a condition with :meth:`wait` lets the whole time pass, as if the condition had not been notified.
+
+    A virtual clock is thread-safe.
+
+    :param float start: The epoch at which the clock starts. Defaults to the current time, so that reset times of
+        rate limits taken from the system clock remain meaningful.
+    """
+
+    def __init__(self, start: t.Optional[float] = None):
+        self._now = time.time() if start is None else start
+        self._start = self._now
+        self.slept = 0.0
+        """The total number of seconds that have been waited."""
+        self.sleeps: t.List[float] = []
+        """The length of each wait, in the order of the waits."""
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now - self._start
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            seconds = max(0.0, seconds)
+            self._now += seconds
+            self.slept += seconds
+            self.sleeps.append(seconds)
+
+    def wait(self, condition: threading.Condition, seconds: float) -> bool:
+        self.sleep(seconds)
+        return False
+
+    async def sleep_async(self, seconds: float):
+        import asyncio  # Only needed by the asyncio API, and slow to import
+        self.sleep(seconds)
+        await asyncio.sleep(0)  # Let other tasks run, as a real wait would
+
+    def advance(self, seconds: float):
+        """
+        Lets time pass without waiting, e.g., to simulate the time taken by requests.
+
+        :param float seconds: The number of seconds to advance the clock by.
+        :raises ValueError: if `seconds` is negative.
+        """
+        if seconds < 0:
+            raise ValueError('A clock cannot go back in time.')
+        with self._lock:
+            self._now += seconds
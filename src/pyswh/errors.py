@@ -2,9 +2,121 @@
 #
 # SPDX-License-Identifier: MIT
 
-class SwhSaveError(Exception):
+import typing as t
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from pyswh.result import SaveResult
+
+
+class SwhError(Exception):
+    """
+    Base class of the errors raised when the Software Heritage API cannot do what it has been asked for.
+    """
+    pass
+
+
+class SwhSaveError(SwhError):
     """
     Error during the saving of code in the Software Heritage Archive.
     Raised by :meth:`~pyswh.swh.save`.
+
+    Errors raised for a save carry its :py:class:`~pyswh.result.SaveResult`, whose fields they expose.
+    The body of the API response that caused the error is only kept if the client has been created with
+    `keep_raw_responses`.
+
+    :param str message: The error message.
+    :param SaveResult result: The result of the save up to the error, if known.
+    :param bytes raw: The body of the API response that caused the error, if it should be kept.
+    """
+
+    def __init__(self, message: str = '', result: t.Optional['SaveResult'] = None, raw: t.Optional[bytes] = None):
+        super().__init__(message)
+        self.result = result
+        self.raw = raw
+
+    @property
+    def origin_url(self) -> t.Optional[str]:
+        """
+        The URL of the origin that should have been saved, if known.
+        """
+        return self.result.origin_url if self.result is not None else None
+
+    @property
+    def visit_type(self) -> t.Optional[str]:
+        """
+        The visit type of the save request, if known.
+        """
+        return self.result.visit_type if self.result is not None else None
+
+    @property
+    def request_status(self) -> t.Optional[str]:
+        """
+        The last known status of the save request, e.g., `rejected`.
+        """
+        return self.result.request_status if self.result is not None else None
+
+    @property
+    def task_status(self) -> t.Optional[str]:
+        """
+        The last known status of the save task, e.g., `failed`.
+        """
+        return self.result.task_status if self.result is not None else None
+
+    @property
+    def visit_status(self) -> t.Optional[str]:
+        """
+        The last known visit status, e.g., `partial`.
+        """
+        return self.result.visit_status if self.result is not None else None
+
+    @property
+    def task_id(self) -> t.Optional[str]:
+        """
+        The task id of the save task, if the save request has been accepted.
+        """
+        return self.result.task_id if self.result is not None else None
+
+    @property
+    def polls(self) -> int:
+        """
+        The number of status checks made for the save.
+        """
+        return self.result.polls if self.result is not None else 0
+
+
+class SwhSaveRejectedError(SwhSaveError):
+    """
+    Error raised when the Software Heritage API refuses a save request, e.g.,
+    because the request has been rejected, the origin URL is invalid, or the origin URL is blacklisted.
+    """
+    pass
+
+
+class SwhSaveTimeoutError(SwhSaveError):
+    """
+    Error raised when a save has not completed within the timeout of the
+    :py:class:`~pyswh.polling.PollingStrategy` used to check its status.
+    """
+    pass
+
+
+class SwhRateLimitError(SwhSaveError):
+    """
+    Error raised when the Software Heritage API rate limit is used up,
+    and the :py:class:`~pyswh.ratelimit.RateLimiter` is set to fail fast rather than wait for the rate limit reset.
+
+    :param str message: The error message.
+    :param int reset_time: The epoch at which the rate limit will be reset.
+    """
+
+    def __init__(self, message: str, reset_time: int = None):
+        super().__init__(message)
+        self.reset_time = reset_time
+
+
+class SwhVaultError(SwhError):
+    """
+    Error raised when a bundle cannot be cooked or downloaded from the Software Heritage Vault,
+    e.g., because cooking has failed, or because the downloaded bundle is corrupt.
     """
     pass
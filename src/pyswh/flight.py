@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures import Future
+import threading
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.metrics import NULL_METRICS, SLEEP_DEBOUNCE, Metrics
+
+_K = t.TypeVar('_K')
+_T = t.TypeVar('_T')
+
+
+class SingleFlight(t.Generic[_K, _T]):
+    """
+    A table of calls in flight, which runs concurrent calls for the same key only once.
+
+    The first call for a key (the leader) runs, and calls for the same key that arrive while it is in flight attach
+    to it, and return its result or raise its error. Once the leader has completed, the next call for the key runs
+    anew. With a `debounce` window, the leader waits before it runs, so that a burst of calls is merged into one.
+
+    :param float debounce: The number of seconds that the leader waits for further calls before it runs.
+    :param Metrics metrics: The metrics to report the time spent waiting for further calls to.
+    :param Clock clock: The clock that the leader waits with. Defaults to the system clock.
+    :raises ValueError: if `debounce` is negative.
+    """
+
+    def __init__(self, debounce: float = 0.0, metrics: t.Optional[Metrics] = None, clock: t.Optional[Clock] = None):
+        if debounce < 0:
+            raise ValueError('The debounce window must not be negative.')
+        self.debounce = debounce
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.joined = 0
+        """The number of calls that have attached to a call in flight."""
+        self._flights: t.Dict[_K, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: _K, call: t.Callable[[], _T]) -> _T:
+        """
+        Runs a call, unless a call for the same key is in flight, and returns its result.
+
+        :param key: The key of the call.
+        :param call: The callable to run.
+        :return: The result of the call, or of the call in flight that this call has attached to.
+        :raises Exception: the error raised by the call, or by the call in flight that this call has attached to.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            else:
+                self.joined += 1
+        if not leader:
+            return flight.result()
+        try:
+            if self.debounce:
+                self.clock.sleep(self.debounce)
+                self.metrics.slept(SLEEP_DEBOUNCE, self.debounce)
+            result = call()
+        except BaseException as e:
+            self._land(key)
+            flight.set_exception(e)
+            raise
+        self._land(key)
+        flight.set_result(result)
+        return result
+
+    def _land(self, key: _K):
+        """
+        Removes the call for a key from the table, so that later calls run anew.
+        """
+        with self._lock:
+            del self._flights[key]
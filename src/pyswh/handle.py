@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures import CancelledError, TimeoutError
+import typing as t
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.poller import StatusPoller, StatusWatch
+from pyswh.result import SaveResult
+
+
+class SaveHandle:
+    """
+    A handle for a submitted save request, whose status is tracked in the background.
+
+    Handles are returned by :meth:`~pyswh.swh.SwhClient.submit` as soon as the save request has been accepted for
+    processing. The status of the save task is checked by the client's :py:class:`~pyswh.poller.StatusPoller`,
+    so that the thread that has submitted the request is free to do other work, and can wait for the result later,
+    or register a callback.
+
+    :param StatusPoller poller: The poller that tracks the status of the save task.
+    :param StatusWatch watch: The watch for the save task.
+    """
+
+    def __init__(self, poller: StatusPoller, watch: StatusWatch):
+        self._poller = poller
+        self._watch = watch
+        self._cancelled = False
+
+    def __repr__(self) -> str:
+        return f'<SaveHandle origin_url={self.origin_url!r} task_id={self.task_id!r} status={self.status!r}>'
+
+    @property
+    def origin_url(self) -> str:
+        """
+        The URL of the origin that is being saved.
+        """
+        return self._watch.origin_url
+
+    @property
+    def task_id(self) -> str:
+        """
+        The task id of the save task, provided by the SWH API.
+        """
+        return self._watch.task_id
+
+    @property
+    def status(self) -> t.Optional[str]:
+        """
+        The status of the save task as last reported by the API, e.g., `scheduled` or `succeeded`.
+        """
+        return (self._watch.poll.status or {}).get('save_task_status')
+
+    @property
+    def polls(self) -> int:
+        """
+        The number of status checks made for the save so far.
+        """
+        return self._watch.poll.polls
+
+    def done(self) -> bool:
+        """
+        Checks whether the save has completed, successfully or not, or waiting for it has been cancelled.
+
+        :return: Whether the save has completed.
+        :rtype: bool
+        """
+        return self._watch.done
+
+    def cancelled(self) -> bool:
+        """
+        Checks whether waiting for the save has been cancelled with :meth:`cancel_wait`.
+
+        :return: Whether waiting has been cancelled.
+        :rtype: bool
+        """
+        return self._cancelled
+
+    def result(self, timeout: t.Optional[float] = None) -> SaveResult:
+        """
+        Waits for the save to complete.
+
+        :param float timeout: The maximum number of seconds to wait, or `None` to wait indefinitely.
+        :return: The result of the save.
+        :rtype: SaveResult
+        :raises SwhSaveError: if the save task was unsuccessful.
+        :raises concurrent.futures.TimeoutError: if the save has not completed within `timeout` seconds.
+        :raises concurrent.futures.CancelledError: if waiting for the save has been cancelled.
+        """
+        error = self.exception(timeout)
+        if error is not None:
+            raise error
+        return SaveResult.from_poll(self._watch.poll, swh._visit_type)
+
+    def exception(self, timeout: t.Optional[float] = None) -> t.Optional[SwhSaveError]:
+        """
+        Waits for the save to complete, and returns the error that made it fail.
+
+        :param float timeout: The maximum number of seconds to wait, or `None` to wait indefinitely.
+        :return: The error that made the save fail, or `None` if it has succeeded.
+        :rtype: t.Optional[SwhSaveError]
+        :raises concurrent.futures.TimeoutError: if the save has not completed within `timeout` seconds.
+        :raises concurrent.futures.CancelledError: if waiting for the save has been cancelled.
+        """
+        if not self._watch.wait(timeout):
+            raise TimeoutError(f'Saving {self.origin_url} has not completed within {timeout} seconds.')
+        if self._cancelled:
+            raise CancelledError(f'Waiting for saving {self.origin_url} has been cancelled.')
+        return self._watch.error
+
+    def cancel_wait(self) -> bool:
+        """
+        Stops tracking the status of the save. The save task itself continues in the archive.
+        Callbacks are called, and waiters raise :py:class:`concurrent.futures.CancelledError`.
+
+        :return: Whether tracking has been stopped, i.e., whether the save had not completed yet.
+        :rtype: bool
+        """
+        if not self._poller.unwatch(self._watch):
+            return False
+        # A status request that is in flight may still resolve the watch first
+        return self._watch._resolve(error=SwhSaveError(f'Waiting for saving {self.origin_url} has been cancelled.'),
+                                    before=self._cancel)
+
+    def _cancel(self):
+        """
+        Marks waiting as cancelled, before the watch is resolved.
+        """
+        self._cancelled = True
+
+    def add_done_callback(self, callback: t.Callable[['SaveHandle'], None]):
+        """
+        Registers a callable that is called with the handle once the save has completed, or waiting for it has been
+        cancelled. If the save has already completed, the callable is called immediately.
+        Callbacks are called in a background thread of the poller.
+
+        :param callback: The callable to call.
+        """
+        self._watch.add_done_callback(lambda _: callback(self))
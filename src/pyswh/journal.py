@@ -0,0 +1,243 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import logging
+import sqlite3
+import threading
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+
+_DEFAULT_BATCH_SIZE = 100
+_DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+
+_COLUMNS = ('origin_url', 'visit_type', 'request_status', 'task_id', 'task_status', 'visit_status', 'outcome',
+            'error', 'submitted_at', 'updated_at', 'completed_at')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS saves (
+    origin_url TEXT NOT NULL,
+    visit_type TEXT NOT NULL,
+    request_status TEXT,
+    task_id TEXT,
+    task_status TEXT,
+    visit_status TEXT,
+    outcome TEXT,
+    error TEXT,
+    submitted_at REAL,
+    updated_at REAL NOT NULL,
+    completed_at REAL,
+    PRIMARY KEY (origin_url, visit_type)
+)
+'''
+
+_UPSERT = (f'INSERT INTO saves ({", ".join(_COLUMNS)}) VALUES ({", ".join("?" * len(_COLUMNS))}) '
+           f'ON CONFLICT (origin_url, visit_type) DO UPDATE SET '
+           + ', '.join(f'{column} = excluded.{column}' for column in _COLUMNS[2:]))
+
+_log = logging.getLogger(__name__)
+
+
+class JournalEntry(t.NamedTuple):
+    """
+    The journaled state of saving a single origin.
+    """
+    origin_url: str
+    """The URL of the origin."""
+    visit_type: str
+    """The visit type of the save request, e.g., `git`."""
+    request_status: t.Optional[str] = None
+    """The last known status of the save request, e.g., `accepted`."""
+    task_id: t.Optional[str] = None
+    """The task id of the save task, provided by the SWH API."""
+    task_status: t.Optional[str] = None
+    """The last known status of the save task, e.g., `succeeded`."""
+    visit_status: t.Optional[str] = None
+    """The last known visit status, e.g., `full`."""
+    outcome: t.Optional[str] = None
+    """The outcome of the save, e.g., `succeeded`, or `None` if the save has not completed."""
+    error: t.Optional[str] = None
+    """The error message if the save has not succeeded."""
+    submitted_at: t.Optional[float] = None
+    """The epoch at which the save request has been submitted."""
+    updated_at: float = 0.0
+    """The epoch at which the entry has last been updated."""
+    completed_at: t.Optional[float] = None
+    """The epoch at which the save task has completed, or `None` if it has not completed."""
+
+    @property
+    def resumable(self) -> bool:
+        """
+        Whether the save request has been submitted, but its save task has not been seen to complete,
+        so that checking its status can be resumed without submitting it again.
+        """
+        return self.task_id is not None and self.completed_at is None
+
+    def succeeded_within(self, seconds: float, now: t.Optional[float] = None) -> bool:
+        """
+        Checks whether the save has succeeded within the given number of seconds.
+
+        :param float seconds: The freshness window in seconds.
+        :param float now: The current epoch, defaults to the current time of the system clock.
+        :return: Whether the save has succeeded within the window.
+        :rtype: bool
+        """
+        if self.outcome != 'succeeded' or self.completed_at is None:
+            return False
+        return (SYSTEM_CLOCK.time() if now is None else now) - self.completed_at <= seconds
+
+
+class SaveJournal:
+    """
+    A persistent journal of save requests, backed by an SQLite database.
+
+    The journal records the request status, task id, timestamps and final visit status of each saved origin,
+    so that an interrupted bulk save can be resumed: already submitted save tasks can be polled again instead of
+    being submitted again, and origins that have recently been saved can be skipped.
+    See :meth:`~pyswh.swh.SwhClient.save_many`.
+
+    The database uses write-ahead logging, and writes are committed in batches, either when `batch_size` changes have
+    accumulated, or when the oldest uncommitted change is older than `flush_interval` seconds.
+    Uncommitted changes are visible to the journal's readers, and are committed when the journal is closed.
+    The journal can be shared between threads.
+
+    :param str path: The path of the SQLite database file.
+    :param int batch_size: The number of changes after which to commit.
+    :param float flush_interval: The maximum number of seconds for which changes remain uncommitted,
+        as long as the journal is being written to.
+    :param Clock clock: The clock to timestamp the changes with, usually the clock of the client that saves the
+        origins. Defaults to the system clock.
+    """
+
+    def __init__(self, path: str, batch_size: int = _DEFAULT_BATCH_SIZE,
+                 flush_interval: float = _DEFAULT_FLUSH_INTERVAL, clock: t.Optional[Clock] = None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self._lock = threading.Lock()
+        self._pending: t.Dict[t.Tuple[str, str], JournalEntry] = {}
+        self._oldest_pending: t.Optional[float] = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+    def __enter__(self) -> 'SaveJournal':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Commits all changes, and closes the database.
+        """
+        with self._lock:
+            if self._connection is None:
+                return
+            self._flush()
+            self._connection.close()
+            self._connection = None
+
+    def flush(self):
+        """
+        Commits all changes to the database.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """
+        Commits all changes to the database. Must be called while holding the lock.
+        """
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(_UPSERT, list(self._pending.values()))
+        _log.debug(f'Committed {len(self._pending)} changes to the save journal.')
+        self._pending.clear()
+        self._oldest_pending = None
+
+    def get(self, origin_url: str, visit_type: str = 'git') -> t.Optional[JournalEntry]:
+        """
+        Retrieves the journaled state of saving an origin.
+
+        :param str origin_url: The URL of the origin.
+        :param str visit_type: The visit type of the save request.
+        :return: The journal entry, or `None` if the origin has not been journaled.
+        :rtype: t.Optional[JournalEntry]
+        """
+        with self._lock:
+            entry = self._pending.get((origin_url, visit_type))
+            if entry is not None:
+                return entry
+            row = self._connection.execute(f'SELECT {", ".join(_COLUMNS)} FROM saves '
+                                           f'WHERE origin_url = ? AND visit_type = ?',
+                                           (origin_url, visit_type)).fetchone()
+        return JournalEntry(*row) if row is not None else None
+
+    def entries(self) -> t.Iterator[JournalEntry]:
+        """
+        Iterates over all journal entries, after committing all changes.
+
+        :return: An iterator over the journal entries.
+        :rtype: t.Iterator[JournalEntry]
+        """
+        with self._lock:
+            self._flush()
+            rows = self._connection.execute(f'SELECT {", ".join(_COLUMNS)} FROM saves').fetchall()
+        return (JournalEntry(*row) for row in rows)
+
+    def _update(self, origin_url: str, visit_type: str, **changes):
+        """
+        Applies changes to the entry for an origin, and commits if a batch is complete.
+        """
+        now = self.clock.time()
+        key = (origin_url, visit_type)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                row = self._connection.execute(f'SELECT {", ".join(_COLUMNS)} FROM saves '
+                                               f'WHERE origin_url = ? AND visit_type = ?', key).fetchone()
+                entry = JournalEntry(*row) if row is not None else JournalEntry(origin_url, visit_type)
+            self._pending[key] = entry._replace(updated_at=now, **changes)
+            if self._oldest_pending is None:
+                self._oldest_pending = now
+            if len(self._pending) >= self.batch_size or now - self._oldest_pending >= self.flush_interval:
+                self._flush()
+
+    def record_submitted(self, origin_url: str, task_id: str, request_status: t.Optional[str],
+                         visit_type: str = 'git'):
+        """
+        Records that a save request has been submitted.
+
+        :param str origin_url: The URL of the origin.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param str request_status: The status of the save request.
+        :param str visit_type: The visit type of the save request.
+        """
+        self._update(origin_url, visit_type, task_id=task_id, request_status=request_status, task_status=None,
+                     visit_status=None, outcome=None, error=None, submitted_at=self.clock.time(), completed_at=None)
+
+    def record_result(self, origin_url: str, outcome: str, status: t.Optional[t.Mapping[str, t.Any]],
+                      error: t.Optional[str], completed: bool, visit_type: str = 'git'):
+        """
+        Records the result of a save.
+
+        :param str origin_url: The URL of the origin.
+        :param str outcome: The outcome of the save, e.g., `succeeded`.
+        :param status: The last JSON object returned by the API for the save request, if any.
+        :param str error: The error message if the save has not succeeded.
+        :param bool completed: Whether the save task has completed in the archive. Saves that have failed locally,
+            e.g., because of a timeout, may still complete in the archive, and can be resumed.
+        :param str visit_type: The visit type of the save request.
+        """
+        status = status or {}
+        self._update(origin_url, visit_type, outcome=outcome, error=error,
+                     request_status=status.get('save_request_status'),
+                     task_status=status.get('save_task_status'),
+                     visit_status=status.get('visit_status'),
+                     completed_at=self.clock.time() if completed else None)
@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import itertools
+import re
+import typing as t
+
+KNOWN_MAX_BATCH_SIZE = 1000
+"""The maximum number of SWHIDs that the known endpoint of the API checks in one request."""
+
+_SWHID = re.compile(r'swh:1:(?:cnt|dir|rev|rel|snp):[0-9a-f]{40}')
+_POPCOUNT = bytes(bin(byte).count('1') for byte in range(256))
+
+
+def validate_swhid(swhid: str) -> str:
+    """
+    Checks that a string is a core SWHID, i.e., a SWHID of a content, directory, revision, release or snapshot
+    without qualifiers, such as `swh:1:cnt:94a9ed024d3859793618152ea559a168bbcbb5e2`.
+
+    :param str swhid: The SWHID to check.
+    :return: The SWHID.
+    :rtype: str
+    :raises ValueError: if the string is not a core SWHID.
+    """
+    if not isinstance(swhid, str) or _SWHID.fullmatch(swhid) is None:
+        raise ValueError(f'Invalid core SWHID: {swhid!r}')
+    return swhid
+
+
+def _batches(swhids: t.Iterable[str], batch_size: int) -> t.Iterator[t.List[str]]:
+    """
+    Splits a stream of SWHIDs into validated batches.
+
+    :param t.Iterable[str] swhids: The SWHIDs.
+    :param int batch_size: The maximum number of SWHIDs per batch.
+    :return: An iterator over the batches, in order.
+    :rtype: t.Iterator[t.List[str]]
+    :raises ValueError: if a SWHID is invalid.
+    """
+    iterator = iter(swhids)
+    while True:
+        batch = [validate_swhid(swhid) for swhid in itertools.islice(iterator, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+class SwhidBitmap:
+    """
+    The result of checking which of many SWHIDs are known to the archive, as one bit per SWHID.
+
+    Bit `i` is set if the `i`-th SWHID that has been checked is known, so that the result for ten million SWHIDs
+    takes 1.25 MB. The SWHIDs themselves are not kept: look them up by index in the checked sequence.
+    """
+    __slots__ = ('_bits', '_size')
+
+    def __init__(self, size: int = 0):
+        self._bits = bytearray((size + 7) // 8)
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> bool:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('SwhidBitmap index out of range')
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def __iter__(self) -> t.Iterator[bool]:
+        return (self[index] for index in range(self._size))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SwhidBitmap):
+            return NotImplemented
+        return self._size == other._size and self._bits == other._bits
+
+    def __repr__(self) -> str:
+        return f'<SwhidBitmap {self.count()} of {self._size} known>'
+
+    def count(self) -> int:
+        """
+        Counts the known SWHIDs.
+
+        :return: The number of set bits.
+        :rtype: int
+        """
+        return sum(self._bits.translate(_POPCOUNT))
+
+    def indices(self, known: bool = True) -> t.Iterator[int]:
+        """
+        Iterates over the indices of the known, or of the unknown SWHIDs.
+
+        :param bool known: Whether to iterate over the known SWHIDs, rather than the unknown ones.
+        :return: An iterator over the indices, in ascending order.
+        :rtype: t.Iterator[int]
+        """
+        for position, byte in enumerate(self._bits):
+            if not known:
+                byte = ~byte & 0xff
+            if not byte:
+                continue
+            for bit in range(8):
+                index = position * 8 + bit
+                if byte & (1 << bit) and index < self._size:
+                    yield index
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the bits, e.g., to store them. Bit `i` is bit `i % 8` (least significant first) of byte `i // 8`.
+
+        :return: The bits.
+        :rtype: bytes
+        """
+        return bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, size: int) -> 'SwhidBitmap':
+        """
+        Restores a bitmap from the result of :meth:`to_bytes`.
+
+        :param bytes data: The bits.
+        :param int size: The number of SWHIDs.
+        :return: The bitmap.
+        :rtype: SwhidBitmap
+        :raises ValueError: if the number of bytes does not match the size.
+        """
+        if len(data) != (size + 7) // 8:
+            raise ValueError(f'{len(data)} bytes do not hold a bitmap of {size} bits.')
+        bitmap = cls()
+        bitmap._bits = bytearray(data)
+        bitmap._size = size
+        return bitmap
+
+    def _set_batch(self, offset: int, flags: t.Sequence[bool]):
+        """
+        Stores the results for a batch of SWHIDs, and grows the bitmap as needed.
+
+        :param int offset: The index of the first SWHID of the batch.
+        :param t.Sequence[bool] flags: Whether each SWHID of the batch is known.
+        """
+        end = offset + len(flags)
+        if end > self._size:
+            self._bits.extend(bytes((end + 7) // 8 - len(self._bits)))
+            self._size = end
+        bits = self._bits
+        for index, flag in enumerate(flags, offset):
+            if flag:
+                bits[index >> 3] |= 1 << (index & 7)
@@ -0,0 +1,254 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import bisect
+from collections import Counter
+import math
+import threading
+import typing as t
+
+from pyswh.result import compact_status
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from pyswh.polling import Poll
+
+STAGES = ('submitted', 'pending', 'accepted', 'scheduled', 'running', 'succeeded', 'failed', 'rejected')
+"""The stages of a save in its lifecycle, in the order in which they are reached."""
+
+SLEEP_POLL = 'poll'
+"""A wait between two status checks of a save."""
+SLEEP_RATE_LIMIT = 'rate_limit'
+"""A wait until the rate limit is reset."""
+SLEEP_PROBE = 'probe'
+"""A wait for another thread to learn the rate limit."""
+SLEEP_RETRY = 'retry'
+"""A wait before retrying a request that has failed transiently."""
+SLEEP_CIRCUIT = 'circuit'
+"""A wait for the API to come back up, while the circuit breaker is open."""
+SLEEP_DEBOUNCE = 'debounce'
+"""A wait for further saves of the same origin, which are merged into one."""
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0, 21600.0)
+
+
+class Metrics:
+    """
+    Receives measurements from pyswh clients, rate limiters and pollers.
+
+    This base class discards all measurements, and is the default. To export measurements, e.g., to Prometheus or a
+    tracing system, subclass it and override the methods of interest, or use :py:class:`MetricsRecorder`.
+    Methods are called from the threads or the event loop that make requests and wait for saves, so they must be
+    thread-safe and return quickly.
+    """
+
+    def request(self, endpoint: str, method: str, status: t.Optional[int], latency: float,
+                remaining: t.Optional[int]):
+        """
+        Called after each HTTP request to the API, including requests that are retried after a 429 response.
+
+        :param str endpoint: The API endpoint, e.g., `ping`, `save`, `status` or `visit`.
+        :param str method: The HTTP method.
+        :param int status: The HTTP status code, or `None` if no response has been received.
+        :param float latency: The number of seconds until the response has been received.
+        :param int remaining: The remaining rate limit reported by the response, or `None` if it is not reported.
+        """
+
+    def save_stage(self, origin_url: str, stage: str, elapsed: float, duration: float):
+        """
+        Called when a save enters a stage of its lifecycle (see :py:data:`STAGES`).
+        `succeeded`, `failed` and `rejected` are final stages.
+
+        :param str origin_url: The URL of the origin that is being saved.
+        :param str stage: The stage that the save has entered.
+        :param float elapsed: The number of seconds since the save has started.
+        :param float duration: The number of seconds that the save has spent in its previous stage.
+        """
+
+    def slept(self, reason: str, seconds: float):
+        """
+        Called after waiting, e.g., between status checks or until the rate limit is reset.
+
+        :param str reason: The reason for waiting: :py:data:`SLEEP_POLL`, :py:data:`SLEEP_RATE_LIMIT`,
+            :py:data:`SLEEP_PROBE`, :py:data:`SLEEP_RETRY`, :py:data:`SLEEP_CIRCUIT` or :py:data:`SLEEP_DEBOUNCE`.
+        :param float seconds: The number of seconds waited.
+        """
+
+
+NULL_METRICS = Metrics()
+"""The shared default :py:class:`Metrics`, which discards all measurements."""
+
+
+class Histogram:
+    """
+    A histogram of observations with cumulative buckets, as used by Prometheus.
+
+    :param t.Sequence[float] buckets: The sorted upper bounds of the buckets, without the implicit `+Inf` bucket.
+    """
+
+    def __init__(self, buckets: t.Sequence[float]):
+        self.bounds = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        """
+        The number of observations.
+        """
+        return sum(self.counts)
+
+    def observe(self, value: float):
+        """
+        Adds an observation.
+
+        :param float value: The observed value.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def cumulative(self) -> t.Iterator[t.Tuple[float, int]]:
+        """
+        Iterates over the buckets with the number of observations less than or equal to their upper bounds.
+
+        :return: An iterator over the upper bounds and the cumulative counts.
+        :rtype: t.Iterator[t.Tuple[float, int]]
+        """
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRecorder(Metrics):
+    """
+    Aggregates measurements in memory as counters, gauges and histograms, and renders them in the Prometheus text
+    exposition format, e.g., to be served by an exporter or written to a file for the node exporter's textfile
+    collector.
+
+    A recorder is thread-safe.
+
+    :param str prefix: The prefix of the metric names.
+    """
+
+    def __init__(self, prefix: str = 'pyswh'):
+        self.prefix = prefix
+        self.requests: t.Counter[t.Tuple[str, str, str]] = Counter()
+        """The number of requests by endpoint, method and status (`error` if no response has been received)."""
+        self.latencies: t.Dict[str, Histogram] = {}
+        """The histogram of request latencies by endpoint."""
+        self.remaining: t.Optional[int] = None
+        """The remaining rate limit reported by the latest response."""
+        self.stages: t.Counter[str] = Counter()
+        """The number of saves that have entered each stage."""
+        self.stage_elapsed: t.Dict[str, Histogram] = {}
+        """The histogram of seconds from the start of a save until it has entered each stage."""
+        self.sleep_seconds: t.Dict[str, float] = {}
+        """The total number of seconds waited by reason."""
+        self._lock = threading.Lock()
+
+    def request(self, endpoint: str, method: str, status: t.Optional[int], latency: float,
+                remaining: t.Optional[int]):
+        with self._lock:
+            self.requests[(endpoint, method, str(status) if status is not None else 'error')] += 1
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = Histogram(_LATENCY_BUCKETS)
+            self.latencies[endpoint].observe(latency)
+            if remaining is not None:
+                self.remaining = remaining
+
+    def save_stage(self, origin_url: str, stage: str, elapsed: float, duration: float):
+        with self._lock:
+            self.stages[stage] += 1
+            if stage not in self.stage_elapsed:
+                self.stage_elapsed[stage] = Histogram(_STAGE_BUCKETS)
+            self.stage_elapsed[stage].observe(elapsed)
+
+    def slept(self, reason: str, seconds: float):
+        with self._lock:
+            self.sleep_seconds[reason] = self.sleep_seconds.get(reason, 0.0) + seconds
+
+    def render(self) -> str:
+        """
+        Renders the recorded measurements in the Prometheus text exposition format.
+
+        :return: The metrics, one sample per line.
+        :rtype: str
+        """
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines += [f'# HELP {p}_requests_total Requests to the Software Heritage API.',
+                      f'# TYPE {p}_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'{p}_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} '
+                             f'{count}')
+            lines += [f'# HELP {p}_request_seconds Latency of requests to the Software Heritage API.',
+                      f'# TYPE {p}_request_seconds histogram']
+            for endpoint, histogram in sorted(self.latencies.items()):
+                lines += _histogram_lines(f'{p}_request_seconds', f'endpoint="{endpoint}"', histogram)
+            if self.remaining is not None:
+                lines += [f'# HELP {p}_rate_limit_remaining Remaining rate limit reported by the latest response.',
+                          f'# TYPE {p}_rate_limit_remaining gauge',
+                          f'{p}_rate_limit_remaining {self.remaining}']
+            lines += [f'# HELP {p}_save_stages_total Saves that have entered each stage.',
+                      f'# TYPE {p}_save_stages_total counter']
+            for stage in _ordered_stages(self.stages):
+                lines.append(f'{p}_save_stages_total{{stage="{stage}"}} {self.stages[stage]}')
+            lines += [f'# HELP {p}_save_stage_seconds Seconds from the start of a save until it has entered a stage.',
+                      f'# TYPE {p}_save_stage_seconds histogram']
+            for stage in _ordered_stages(self.stage_elapsed):
+                lines += _histogram_lines(f'{p}_save_stage_seconds', f'stage="{stage}"', self.stage_elapsed[stage])
+            lines += [f'# HELP {p}_sleep_seconds_total Seconds spent waiting.',
+                      f'# TYPE {p}_sleep_seconds_total counter']
+            for reason, seconds in sorted(self.sleep_seconds.items()):
+                lines.append(f'{p}_sleep_seconds_total{{reason="{reason}"}} {seconds}')
+        return '\n'.join(lines) + '\n'
+
+
+def _ordered_stages(stages: t.Iterable[str]) -> t.List[str]:
+    return sorted(stages, key=lambda stage: STAGES.index(stage) if stage in STAGES else len(STAGES))
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> t.List[str]:
+    lines = []
+    for bound, count in histogram.cumulative():
+        le = '+Inf' if bound == math.inf else repr(bound)
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def _status_stage(status: t.Mapping[str, t.Any]) -> str:
+    """
+    Maps the JSON object for a save request to the stage of the save.
+    """
+    request_status = status.get('save_request_status')
+    if request_status in ('pending', 'rejected'):
+        return request_status
+    task_status = status.get('save_task_status')
+    if task_status in ('scheduled', 'running', 'succeeded', 'failed'):
+        return task_status
+    return 'accepted'  # The task has not been created or scheduled yet
+
+
+def _trace_stage(metrics: Metrics, poll: 'Poll', stage: str):
+    """
+    Reports that a save has entered a stage, unless it already is in that stage.
+    """
+    if poll.stage == stage:
+        return
+    now = poll.clock.monotonic()
+    duration = now - poll.stage_entered
+    poll.stage, poll.stage_entered = stage, now
+    metrics.save_stage(poll.origin_url, stage, now - poll.started, duration)
+
+
+def _trace_status(metrics: Metrics, poll: 'Poll', status: t.Mapping[str, t.Any]):
+    """
+    Keeps the fields of the last JSON object for a save request in its poll, and reports the stage of the save.
+    """
+    poll.status = compact_status(status)
+    _trace_stage(metrics, poll, _status_stage(status))
@@ -0,0 +1,216 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import re
+import typing as t
+from urllib.parse import urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_SCP_LIKE = re.compile(r'^(?:[\w.-]+@)?(?P<host>[\w.-]+):(?!//)(?P<path>[^/].*)$')
+_SLASHES = re.compile(r'/{2,}')
+
+
+class Forge(t.NamedTuple):
+    """
+    The rules by which URLs of repositories on a code hosting platform (a forge) are canonicalized.
+    """
+    path_segments: t.Optional[int] = None
+    """The number of path segments that identify a repository, e.g., `2` for `/owner/repo`.
+    Further segments, such as `/tree/main`, are dropped. `None` keeps all segments."""
+    separator: t.Optional[str] = None
+    """A path segment after which the path no longer identifies the repository, such as GitLab's `-`."""
+    case_insensitive: bool = True
+    """Whether the forge treats the paths of repositories case-insensitively."""
+
+
+FORGES: t.Dict[str, Forge] = {
+    'github.com': Forge(path_segments=2),
+    'bitbucket.org': Forge(path_segments=2),
+    'codeberg.org': Forge(path_segments=2),
+    'gitlab.com': Forge(separator='-'),
+}
+"""The canonicalization rules for well-known forges by host name."""
+
+
+def canonicalize(origin_url: str, forges: t.Optional[t.Mapping[str, Forge]] = None) -> str:
+    """
+    Brings the URL of an origin into a canonical form, so that equivalent spellings of the same origin become equal.
+
+    For all URLs, the scheme and the host are lowercased, user information and default ports are dropped, repeated
+    slashes are collapsed, and trailing slashes and fragments are removed. URLs on known forges are rewritten further:
+    they use `https`, SCP-like `git@host:owner/repo` addresses become URLs, `www.` is dropped from the host,
+    the `.git` suffix and the query are removed, and the path is cut to the segments that identify the repository.
+    Other hosts may serve distinct repositories at `repo` and `repo.git`, or over `http` and `https`,
+    so these are kept. Strings that are not URLs are only stripped of whitespace.
+
+    :param str origin_url: The URL of the origin.
+    :param forges: The rules for forges by host name. Defaults to :py:data:`FORGES`.
+    :return: The canonical URL of the origin.
+    :rtype: str
+    """
+    url, forge, _ = _canonicalize(origin_url, FORGES if forges is None else forges)
+    return url
+
+
+def origin_key(origin_url: str, forges: t.Optional[t.Mapping[str, Forge]] = None) -> str:
+    """
+    Returns the key under which equivalent spellings of the URL of an origin are equal. The key is the canonical URL
+    (see :func:`canonicalize`), with the path lowercased on forges that treat paths case-insensitively.
+
+    :param str origin_url: The URL of the origin.
+    :param forges: The rules for forges by host name. Defaults to :py:data:`FORGES`.
+    :return: The key of the origin.
+    :rtype: str
+    """
+    return _key(*_canonicalize(origin_url, FORGES if forges is None else forges))
+
+
+def _canonicalize(origin_url: str, forges: t.Mapping[str, Forge]) -> t.Tuple[str, t.Optional[Forge], int]:
+    """
+    Canonicalizes the URL of an origin, and returns the canonical URL, the rules of its forge, if any,
+    and the length of its scheme and authority.
+    """
+    url = origin_url.strip()
+    scp = _SCP_LIKE.match(url)
+    if scp is not None and _forge(scp.group('host').lower(), forges)[1] is not None:
+        url = f'https://{scp.group("host")}/{scp.group("path")}'
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url, None, len(url)
+    if not parts.scheme or not parts.hostname:
+        return url, None, len(url)
+    scheme = parts.scheme.lower()
+    host, forge = _forge(parts.hostname.lower(), forges)
+    path = _SLASHES.sub('/', parts.path).rstrip('/')
+    query = parts.query
+    if forge is not None:
+        scheme, port, query = 'https', None, ''
+        segments = path.split('/')[1:]
+        if forge.separator is not None and forge.separator in segments:
+            segments = segments[:segments.index(forge.separator)]
+        if forge.path_segments is not None:
+            segments = segments[:forge.path_segments]
+        if segments and segments[-1].lower().endswith('.git'):
+            segments[-1] = segments[-1][:-len('.git')]
+        path = '/'.join([''] + segments)
+    netloc = host if port is None or port == _DEFAULT_PORTS.get(scheme) else f'{host}:{port}'
+    authority = len(scheme) + len('://') + len(netloc)
+    return urlunsplit((scheme, netloc, path, query, '')), forge, authority
+
+
+def _key(url: str, forge: t.Optional[Forge], authority: int) -> str:
+    """
+    Returns the key of a canonical URL, given the rules of its forge and the length of its scheme and authority.
+    """
+    if forge is not None and forge.case_insensitive:
+        return url[:authority] + url[authority:].lower()
+    return url
+
+
+def _forge(host: str, forges: t.Mapping[str, Forge]) -> t.Tuple[str, t.Optional[Forge]]:
+    """
+    Looks up the rules of the forge for a lowercase host name, also without a `www.` prefix.
+    """
+    if host not in forges and host.startswith('www.') and host[len('www.'):] in forges:
+        host = host[len('www.'):]
+    return host, forges.get(host)
+
+
+_R = t.TypeVar('_R')  # A named tuple with an `origin_url` field, such as BulkSaveResult
+
+
+class OriginDeduplicator(t.Generic[_R]):
+    """
+    A streaming front-end for bulk saves, which saves equivalent origins only once.
+
+    :meth:`unique` passes on the canonical URL of the first spelling of each origin (see :func:`origin_key`), and
+    holds back later spellings as aliases. :meth:`fan_out` (or :meth:`fan_out_async`) then turns the result for each
+    saved origin into one result for every alias, with the alias as its `origin_url`, as soon as the result is
+    available. Aliases that appear after the origin has been saved receive its result along with the next result.
+
+    A deduplicator remembers the result for each distinct origin, and is meant for a single bulk save::
+
+        deduplicator = OriginDeduplicator()
+        for result in deduplicator.fan_out(client.save_many(deduplicator.unique(origins))):
+            ...
+
+    :param forges: The rules for forges by host name. Defaults to :py:data:`FORGES`.
+    """
+
+    def __init__(self, forges: t.Optional[t.Mapping[str, Forge]] = None):
+        self.forges = FORGES if forges is None else forges
+        self._keys: t.Dict[str, str] = {}
+        """The key of each canonical URL that has been passed on."""
+        self._aliases: t.Dict[str, t.List[str]] = {}
+        """The aliases by key, for origins whose save has not completed yet."""
+        self._results: t.Dict[str, _R] = {}
+        """The results by key, for origins whose save has completed."""
+        self._ready: t.List[_R] = []
+        self.duplicates = 0
+        """The number of origins that have been held back as an alias of an origin seen before."""
+
+    def unique(self, origins: t.Iterable[str]) -> t.Iterator[str]:
+        """
+        Streams the canonical URLs of the distinct origins in `origins`, in the order of their first appearance.
+
+        :param t.Iterable[str] origins: The URLs of the origins, with any number of spellings of the same origin.
+        :return: An iterator over the canonical URLs of the distinct origins.
+        :rtype: t.Iterator[str]
+        """
+        for origin_url in origins:
+            url, forge, authority = _canonicalize(origin_url, self.forges)
+            key = _key(url, forge, authority)
+            if key in self._results:
+                self.duplicates += 1
+                self._ready.append(self._results[key]._replace(origin_url=origin_url))
+            elif key in self._aliases:
+                self.duplicates += 1
+                self._aliases[key].append(origin_url)
+            else:
+                self._keys[url] = key
+                self._aliases[key] = [origin_url]
+                yield url
+
+    def _fan_out(self, result: _R) -> t.List[_R]:
+        """
+        Returns the results for all aliases of the origin of a result, and the results for late aliases.
+        """
+        key = self._keys.pop(result.origin_url, None)
+        if key is None:
+            results = [result]  # Not passed on by unique()
+        else:
+            self._results[key] = result
+            results = [result._replace(origin_url=alias) for alias in self._aliases.pop(key)]
+        results += self._ready
+        self._ready = []
+        return results
+
+    def fan_out(self, results: t.Iterable[_R]) -> t.Iterator[_R]:
+        """
+        Streams the results of a bulk save of the origins passed on by :meth:`unique`, with one result for every alias.
+
+        :param results: The results of the bulk save, which have an `origin_url` field.
+        :return: An iterator over the results for all aliases.
+        """
+        for result in results:
+            yield from self._fan_out(result)
+        yield from self._ready
+        self._ready = []
+
+    async def fan_out_async(self, results: t.AsyncIterable[_R]) -> t.AsyncIterator[_R]:
+        """
+        Streams the results of an async bulk save of the origins passed on by :meth:`unique`,
+        with one result for every alias.
+
+        :param results: The results of the bulk save, which have an `origin_url` field.
+        :return: An async iterator over the results for all aliases.
+        """
+        async for result in results:
+            for fanned_out in self._fan_out(result):
+                yield fanned_out
+        for fanned_out in self._ready:
+            yield fanned_out
+        self._ready = []
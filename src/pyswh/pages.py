@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import re
+import typing as t
+
+_LINK = re.compile(r'<([^>]*)>((?:\s*;\s*[^;,]+)*)')
+_LINK_PARAM = re.compile(r';\s*([^=;,\s]+)\s*=\s*"?([^";,]*)"?')
+
+Page = t.Tuple[t.Any, t.Optional[str]]
+"""The JSON content of a page, and the URL of the next page, or `None` for the last page."""
+
+
+def parse_link_header(value: t.Optional[str]) -> t.Dict[str, str]:
+    """
+    Parses a `Link` header, as used by the Software Heritage API for pagination.
+
+    :param str value: The value of the header, e.g., `<https://archive.softwareheritage.org/api/1/...>; rel="next"`.
+    :return: The URL of each link by its relation, e.g., `next`.
+    :rtype: t.Dict[str, str]
+    """
+    links = {}
+    for match in _LINK.finditer(value or ''):
+        url, params = match.groups()
+        for name, param in _LINK_PARAM.findall(params):
+            if name.lower() == 'rel':
+                for rel in param.split():
+                    links.setdefault(rel.lower(), url)
+    return links
+
+
+def paginate(fetch: t.Callable[[str], Page], url: str, prefetch: bool = True) -> t.Iterator[t.Any]:
+    """
+    Iterates over the pages of a paginated resource, following the links to the next pages lazily.
+
+    With `prefetch`, the next page is fetched on a background thread while the caller consumes the current one, so that
+    at most two pages are held in memory. The background fetch of the next page is cancelled, if it has not started,
+    when the iterator is closed.
+
+    :param fetch: A callable that fetches the page at a URL.
+    :param str url: The URL of the first page.
+    :param bool prefetch: Whether to fetch the next page in the background.
+    :return: An iterator over the JSON content of the pages.
+    :rtype: t.Iterator[t.Any]
+    """
+    if not prefetch:
+        next_url: t.Optional[str] = url
+        while next_url is not None:
+            content, next_url = fetch(next_url)
+            yield content
+        return
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyswh-page') as executor:
+        future: t.Optional[Future] = executor.submit(fetch, url)
+        try:
+            while future is not None:
+                content, next_url = future.result()
+                future = executor.submit(fetch, next_url) if next_url is not None else None
+                yield content
+        finally:
+            if future is not None:
+                future.cancel()
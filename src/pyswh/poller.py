@@ -0,0 +1,350 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import logging
+import threading
+import typing as t
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.metrics import _trace_status
+from pyswh.polling import Poll
+from pyswh.transport import TransportConnectionError, TransportError
+
+_DEFAULT_MAX_WORKERS = 4
+
+_log = logging.getLogger(__name__)
+
+
+class StatusWatch:
+    """
+    A save task whose status is watched by a :py:class:`StatusPoller`.
+
+    :param str origin_url: The URL of the origin that is being saved.
+    :param str task_id: The task id of the save task, provided by the SWH API.
+    :param Poll poll: The state of polling for this save.
+    """
+
+    def __init__(self, origin_url: str, task_id: str, poll: Poll):
+        self.origin_url = origin_url
+        self.task_id = task_id
+        self.poll = poll
+        self.response_json: t.Any = None
+        """The JSON object for the save task when it has succeeded."""
+        self.error: t.Optional[SwhSaveError] = None
+        """The error that made the save fail, if any."""
+        self._event = threading.Event()
+        self._callbacks: t.List[t.Callable[['StatusWatch'], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the save task has completed, successfully or not.
+        """
+        return self._event.is_set()
+
+    def wait(self, timeout: t.Optional[float] = None) -> bool:
+        """
+        Waits until the save task has completed.
+
+        :param float timeout: The maximum number of seconds to wait, or `None` to wait indefinitely.
+        :return: Whether the save task has completed.
+        :rtype: bool
+        """
+        return self._event.wait(timeout)
+
+    def add_done_callback(self, callback: t.Callable[['StatusWatch'], None]):
+        """
+        Registers a callable that is called with the watch once the save task has completed.
+        If the task has already completed, the callable is called immediately.
+
+        :param callback: The callable to call.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _resolve(self, response_json: t.Any = None, error: t.Optional[SwhSaveError] = None,
+                 before: t.Optional[t.Callable[[], None]] = None) -> bool:
+        """
+        Marks the save task as completed, and notifies waiters and callbacks.
+
+        :param t.Any response_json: The JSON object for the succeeded save task.
+        :param SwhSaveError error: The error that made the save fail.
+        :param before: An optional callable to call before waiters are notified, if the watch is resolved.
+        :return: Whether the watch has been resolved, i.e., whether it had not been resolved before.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            if before is not None:
+                before()
+            self.response_json = response_json
+            self.error = error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:  # A failing callback must not break the poller
+                _log.exception(f'Callback for the save task of {self.origin_url} has failed.')
+        return True
+
+
+class _OriginState:
+    """
+    The save tasks for a single origin that are watched by a :py:class:`StatusPoller`.
+    """
+    __slots__ = ('auth_token', 'watches', 'due', 'in_flight')
+
+    def __init__(self, auth_token: str):
+        self.auth_token = auth_token
+        self.watches: t.List[StatusWatch] = []
+        self.due: t.Optional[float] = None
+        self.in_flight: t.List[StatusWatch] = []
+
+
+class StatusPoller:
+    """
+    A central poller for the status of many save tasks.
+
+    The poller keeps a priority queue of the origins with pending save tasks, ordered by the time at which their
+    status is due to be checked next. When an origin is due, the poller makes one request for the status of its save
+    requests, which the API returns as a list for all save requests for the origin, and resolves every watched task of
+    the origin from that single response. The number of status requests hence grows with the number of distinct
+    origins, rather than with the number of save tasks.
+
+    Each watched task follows the :py:class:`~pyswh.polling.Poll` it has been registered with; an origin is due when
+    the earliest of its tasks is due. The poller tells the time and waits for due origins with the client's
+    :py:class:`~pyswh.clock.Clock`.
+
+    :param swh.SwhClient client: The client to make status requests with.
+    :param int max_workers: The maximum number of status requests to make at the same time.
+    """
+
+    def __init__(self, client: 'swh.SwhClient', max_workers: int = _DEFAULT_MAX_WORKERS):
+        self._client = client
+        self._clock = client.clock
+        self._max_workers = max_workers
+        self._condition = threading.Condition()
+        self._origins: t.Dict[str, _OriginState] = {}
+        self._queue: t.List[t.Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._thread: t.Optional[threading.Thread] = None
+        self._executor: t.Optional[ThreadPoolExecutor] = None
+        self._closed = False
+        self.requests = 0
+        """The number of status requests the poller has made."""
+
+    def watch(self, origin_url: str, task_id: str, auth_token: str, poll: Poll) -> StatusWatch:
+        """
+        Starts watching the status of a save task.
+
+        :param str origin_url: The URL of the origin that is being saved.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param str auth_token: An optional Software Heritage API authentication token.
+        :param Poll poll: The state of polling for this save, which counts the status checks.
+        :return: The watch, which completes when the save task has completed.
+        :rtype: StatusWatch
+        """
+        watch = StatusWatch(origin_url, task_id, poll)
+        with self._condition:
+            if self._closed:
+                raise SwhSaveError('The status poller has been closed.')
+            self._start()
+            state = self._origins.get(origin_url)
+            if state is None:
+                state = self._origins[origin_url] = _OriginState(auth_token)
+            state.watches.append(watch)
+            if not state.in_flight:
+                self._schedule(origin_url, state, self._clock.monotonic())
+        return watch
+
+    def unwatch(self, watch: StatusWatch) -> bool:
+        """
+        Stops watching the status of a save task. The watch is not resolved.
+
+        :param StatusWatch watch: The watch to remove.
+        :return: Whether the watch has been removed, i.e., whether it was still being watched.
+        :rtype: bool
+        """
+        with self._condition:
+            state = self._origins.get(watch.origin_url)
+            if state is None or not any(w is watch for w in state.watches):
+                return False
+            state.watches = [w for w in state.watches if w is not watch]
+            if not state.watches and not state.in_flight:
+                del self._origins[watch.origin_url]
+            return True
+
+    def close(self):
+        """
+        Stops the poller. Watched save tasks that have not completed are resolved with an error.
+        """
+        with self._condition:
+            self._closed = True
+            watches = [watch for state in self._origins.values() for watch in state.watches]
+            self._origins.clear()
+            self._queue.clear()
+            self._condition.notify_all()
+        for watch in watches:
+            watch._resolve(error=SwhSaveError(f'The status poller has been closed before saving '
+                                              f'{watch.origin_url} has completed.'))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _start(self):
+        """
+        Starts the scheduler thread, if it is not running yet. Must be called while holding the lock.
+        """
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='pyswh-poll')
+            self._thread = threading.Thread(target=self._run, name='pyswh-poller', daemon=True)
+            self._thread.start()
+
+    def _schedule(self, origin_url: str, state: _OriginState, due: float):
+        """
+        Schedules the next status request for an origin, unless one is scheduled earlier.
+        Must be called while holding the lock.
+        """
+        if state.due is not None and state.due <= due:
+            return
+        state.due = due
+        heapq.heappush(self._queue, (due, next(self._counter), origin_url))
+        self._condition.notify()
+
+    def _run(self):
+        """
+        Takes due origins from the queue, and hands their status requests to the workers.
+        """
+        with self._condition:
+            while not self._closed:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                due, _, origin_url = self._queue[0]
+                wait = due - self._clock.monotonic()
+                if wait > 0 and self._clock.wait(self._condition, wait):
+                    continue  # The queue has changed in the meantime
+                heapq.heappop(self._queue)
+                state = self._origins.get(origin_url)
+                if state is None or state.due != due:
+                    continue  # Superseded by an earlier schedule, or no longer watched
+                state.due = None
+                state.in_flight = list(state.watches)
+                self._executor.submit(self._fetch, origin_url, state)
+
+    def _fetch(self, origin_url: str, state: _OriginState):
+        """
+        Requests the status of all save requests for an origin, and resolves the watched tasks.
+        Unexpected errors fail the watched tasks, rather than getting lost in the executor and leaving them pending.
+        """
+        try:
+            self._check(origin_url, state)
+        except Exception as e:
+            _log.exception(f'Checking the status of saving {origin_url} has failed unexpectedly.')
+            error = SwhSaveError(f'Failed to check the status of saving {origin_url}: {e!r}')
+            self._finish(origin_url, state, [(watch, None, error) for watch in state.in_flight], [])
+
+    def _check(self, origin_url: str, state: _OriginState):
+        """
+        Makes the status request for an origin, and dispatches its response to the watched tasks.
+        """
+        response = error = None
+        try:
+            response = self._client._request(swh._RequestMethod.GET, origin_url, state.auth_token)
+            swh._raise_for_status_check(origin_url, response.status_code)
+            tasks = swh._find_current_results(response.text, [(watch.task_id, watch.poll) for watch in state.in_flight])
+        except TransportConnectionError:
+            error = SwhSaveError('Could not connect to the Software Heritage API during progress check. '
+                                 'Are you connected to the internet?')
+        except SwhSaveError as sse:
+            error = sse
+        except (TransportError, ValueError) as e:
+            error = SwhSaveError(f'Failed to check the status of saving {origin_url}: {e!r}')
+        with self._condition:
+            self.requests += 1
+        if error is None:
+            self._dispatch(origin_url, state, response, tasks)
+        else:
+            self._finish(origin_url, state, [(watch, None, error) for watch in state.in_flight], [])
+
+    def _dispatch(self, origin_url: str, state: _OriginState, response: t.Any, tasks: t.Mapping[str, t.Any]):
+        """
+        Resolves the watched tasks of an origin from a single status response, whose JSON objects for the watched
+        tasks have been found by task id.
+        """
+        resolved = []
+        delays = []
+        raw = self._client._raw(response)
+        for watch in state.in_flight:
+            watch.poll.polls += 1
+            task = tasks.get(watch.task_id)
+            if task is not None:
+                _trace_status(self._client.metrics, watch.poll, task)
+            try:
+                outcome = self._evaluate(watch, task, raw)
+                if outcome is None:
+                    delay = watch.poll.next_delay()
+            except SwhSaveError as sse:
+                resolved.append((watch, None, swh._with_result(sse, watch.poll)))
+                continue
+            if outcome is None:
+                _log.info(f'The save task for {origin_url} is {task.get("save_task_status")}. '
+                          f'Waiting for {delay:.1f} sec. before checking the status again.')
+                delays.append(delay)
+            else:
+                resolved.append((watch, outcome, None))
+        self._finish(origin_url, state, resolved, delays)
+
+    @staticmethod
+    def _evaluate(watch: StatusWatch, task: t.Any, raw: t.Optional[bytes]) -> t.Any:
+        """
+        Evaluates the status of a single save task.
+
+        :param StatusWatch watch: The watch for the save task.
+        :param t.Any task: The JSON object for the save task, or `None` if it is missing from the status response.
+        :param bytes raw: The body of the status response to keep in errors, if any.
+        :return: The JSON object for the task if it has succeeded, or `None` if it has not completed yet.
+        :raises SwhSaveError: if the task cannot be found, has been rejected, or has failed.
+        """
+        origin_url = watch.origin_url
+        if task is None:
+            raise swh._task_not_found_error(origin_url, raw)
+        if task.get('save_request_status') == 'rejected':
+            raise swh._rejected_error(origin_url, task, raw)
+        save_status = task.get('save_task_status')
+        if save_status == 'failed':
+            raise swh._failed_error(origin_url, task, raw)
+        elif save_status == 'succeeded':
+            _log.info(f'Saving {origin_url} has succeeded with visit status {task.get("visit_status")}!')
+            return task
+        return None
+
+    def _finish(self, origin_url: str, state: _OriginState,
+                resolved: t.List[t.Tuple[StatusWatch, t.Any, t.Optional[SwhSaveError]]], delays: t.List[float]):
+        """
+        Removes resolved tasks, reschedules the origin if tasks are left, and notifies the waiters.
+        """
+        with self._condition:
+            done = {id(watch) for watch, _, _ in resolved}
+            in_flight = {id(watch) for watch in state.in_flight}
+            state.watches = [watch for watch in state.watches if id(watch) not in done]
+            added = any(id(watch) not in in_flight for watch in state.watches)
+            state.in_flight = []
+            if state.watches and not self._closed:
+                # Tasks that have been added during the request are due immediately
+                delay = 0 if added or not delays else min(delays)
+                self._schedule(origin_url, state, self._clock.monotonic() + delay)
+            elif self._origins.get(origin_url) is state:
+                del self._origins[origin_url]
+        for watch, response_json, error in resolved:
+            watch._resolve(response_json, error)
@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import random
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.errors import SwhSaveTimeoutError
+
+
+class PollingStrategy:
+    """
+    A strategy for polling the status of save requests with exponential backoff and jitter.
+
+    The first wait before checking a status again takes `initial_delay` seconds. Each following wait grows by
+    `factor`, up to `max_delay` seconds. Every wait is spread randomly by up to `jitter` times its length,
+    so that many saves started at the same time do not poll the API in lockstep.
+
+    :param float initial_delay: The number of seconds to wait before the first repeated status check.
+    :param float factor: The factor by which the wait grows after each status check.
+    :param float max_delay: The maximum number of seconds to wait between two status checks.
+    :param float jitter: The fraction of each wait by which it is randomly shortened or lengthened, between 0 and 1.
+    :param float timeout: The maximum number of seconds to wait for a save to complete,
+        or `None` to wait indefinitely.
+    :raises ValueError: if a parameter is out of range.
+    """
+
+    def __init__(self,
+                 initial_delay: float = 1.0,
+                 factor: float = 1.5,
+                 max_delay: float = 60.0,
+                 jitter: float = 0.1,
+                 timeout: t.Optional[float] = None):
+        if initial_delay < 0 or max_delay < initial_delay:
+            raise ValueError('Delays must satisfy 0 <= initial_delay <= max_delay.')
+        if factor < 1:
+            raise ValueError('The growth factor must be at least 1.')
+        if not 0 <= jitter <= 1:
+            raise ValueError('The jitter must be between 0 and 1.')
+        if timeout is not None and timeout < 0:
+            raise ValueError('The timeout must not be negative.')
+        self.initial_delay = initial_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.timeout = timeout
+
+    def delay(self, attempt: int) -> float:
+        """
+        Computes the wait before a repeated status check.
+
+        :param int attempt: The number of waits before this one.
+        :return: The number of seconds to wait.
+        :rtype: float
+        """
+        try:
+            delay = min(self.max_delay, self.initial_delay * self.factor ** attempt)
+        except OverflowError:
+            delay = self.max_delay
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def start(self, origin_url: str, clock: t.Optional[Clock] = None) -> 'Poll':
+        """
+        Starts polling the status of a save.
+
+        :param str origin_url: The URL of the origin that is being saved.
+        :param Clock clock: The clock to measure the time spent polling with. Defaults to the system clock.
+        :return: The state of polling for this save.
+        :rtype: Poll
+        """
+        return Poll(self, origin_url, clock)
+
+
+class Poll:
+    """
+    The state of polling the status of a single save, following a :py:class:`PollingStrategy`.
+
+    :param PollingStrategy strategy: The polling strategy to follow.
+    :param str origin_url: The URL of the origin that is being saved.
+    :param Clock clock: The clock to measure the time spent polling with. Defaults to the system clock.
+    """
+
+    def __init__(self, strategy: PollingStrategy, origin_url: str, clock: t.Optional[Clock] = None):
+        self.strategy = strategy
+        self.origin_url = origin_url
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.polls = 0
+        """The number of status checks made so far."""
+        self.task_id: t.Optional[str] = None
+        """The task id of the save task, once the save request has been submitted."""
+        self.status: t.Optional[t.Mapping[str, t.Any]] = None
+        """The fields of the JSON object for the save request that the API has returned last,
+        see :py:func:`~pyswh.result.compact_status`."""
+        self.position: t.Optional[int] = None
+        """The offset at which the save request has last been found in the JSON text of a status response."""
+        self.started = self.clock.monotonic()
+        self.started_at = self.clock.time()
+        """The epoch at which polling has started."""
+        self.stage: t.Optional[str] = None
+        """The stage of the save in its lifecycle, e.g., `submitted`, `scheduled` or `succeeded`."""
+        self.stage_entered = self.started
+        """The monotonic time at which the save has entered its current stage."""
+        self._attempt = 0
+
+    @property
+    def elapsed(self) -> float:
+        """
+        The number of seconds since polling has started.
+        """
+        return self.clock.monotonic() - self.started
+
+    def next_delay(self) -> float:
+        """
+        Computes the wait before the next status check.
+
+        :return: The number of seconds to wait.
+        :rtype: float
+        :raises SwhSaveTimeoutError: if the save would not complete before the timeout of the strategy.
+        """
+        delay = self.strategy.delay(self._attempt)
+        self._attempt += 1
+        timeout = self.strategy.timeout
+        if timeout is not None and self.elapsed + delay > timeout:
+            raise SwhSaveTimeoutError(f'Saving {self.origin_url} has not completed within {timeout} seconds '
+                                      f'({self.polls} status checks).')
+        return delay
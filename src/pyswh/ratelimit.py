@@ -0,0 +1,595 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import contextlib
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.errors import SwhRateLimitError
+from pyswh.metrics import NULL_METRICS, SLEEP_PROBE, SLEEP_RATE_LIMIT, Metrics
+
+_HEADER_LIMIT = 'X-RateLimit-Limit'
+_HEADER_REMAINING = 'X-RateLimit-Remaining'
+_HEADER_RESET = 'X-RateLimit-Reset'
+
+_DEFAULT_MARGIN = 2  # Extra seconds to wait after the reset time, to be on the safe side
+_DEFAULT_BACK_OFF = 60  # Seconds to wait after a 429 response that does not say when the rate limit is reset
+_NEEDS_PROBE = -1
+_AWAIT_PROBE = -2
+_PROBE_POLL_INTERVAL = 0.05  # Seconds between checks whether a concurrent ping has completed
+_PROBE_TIMEOUT = 60.0  # Seconds after which a ping by another process is assumed to have been abandoned
+_SHARED_BUSY_TIMEOUT = 30.0  # Seconds to wait for another process to release the shared state file
+
+_SHARED_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name TEXT PRIMARY KEY,
+    rate_limit INTEGER,
+    remaining INTEGER,
+    reset INTEGER,
+    probe_started REAL
+)
+'''
+
+_log = logging.getLogger(__name__)
+
+
+def _sleep(metrics: Metrics, seconds: float, reason: str, clock: Clock = SYSTEM_CLOCK):
+    clock.sleep(seconds)
+    metrics.slept(reason, seconds)
+
+
+async def _sleep_async(metrics: Metrics, seconds: float, reason: str, clock: Clock = SYSTEM_CLOCK):
+    await clock.sleep_async(seconds)
+    metrics.slept(reason, seconds)
+
+
+def _int_header(headers: t.Mapping[str, str], name: str) -> t.Optional[int]:
+    """
+    Reads an integer value from response headers.
+
+    :param t.Mapping[str, str] headers: The (case-insensitive) response headers.
+    :param str name: The name of the header.
+    :return: The integer value of the header, or `None` if the header is missing or not an integer.
+    :rtype: t.Optional[int]
+    """
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    A local token bucket that mirrors the Software Heritage API rate limit.
+
+    The bucket is filled from the `X-RateLimit-*` headers of every API response that is passed to :meth:`update`,
+    and each request takes one token from it with :meth:`acquire`. Only when the limiter knows nothing about the
+    current rate limit does it ask for a ping of the API to learn it. When the bucket is empty, the limiter either
+    waits until the rate limit is reset, or - if it was created with `block=False` - fails fast with a
+    :py:class:`~pyswh.errors.SwhRateLimitError`. Once the reset time has passed, the bucket is refilled to the last
+    known limit.
+
+    A rate limiter is thread-safe, so that one limiter can hold the rate budget for all threads using a client.
+
+    :param bool block: Whether to wait until the rate limit is reset when the budget is used up,
+        rather than raising :py:class:`~pyswh.errors.SwhRateLimitError`.
+    :param int margin: Extra seconds to wait after the reset time.
+    :param int default_back_off: Seconds to back off after a 429 response without an `X-RateLimit-Reset` header.
+    :param Metrics metrics: The metrics to report the time spent waiting to.
+    :param Clock clock: The clock to tell the time and wait with. Defaults to the system clock.
+    """
+
+    def __init__(self, block: bool = True, margin: int = _DEFAULT_MARGIN, default_back_off: int = _DEFAULT_BACK_OFF,
+                 metrics: t.Optional[Metrics] = None, clock: t.Optional[Clock] = None):
+        self.block = block
+        self.margin = margin
+        self.default_back_off = default_back_off
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.limit: t.Optional[int] = None
+        self.remaining: t.Optional[int] = None
+        self.reset: t.Optional[int] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> t.ContextManager:
+        """
+        Guards the rate limit state. While the returned context is active, the attributes of the limiter hold the
+        current state, and changes to them are kept when the context exits.
+
+        :return: The context manager guarding the state.
+        :rtype: t.ContextManager
+        """
+        return self._lock
+
+    @property
+    def has_state(self) -> bool:
+        """
+        Whether the limiter knows enough about the rate limit to decide if a request can be made without a ping.
+        """
+        with self._state():
+            return self._has_state()
+
+    def _has_state(self) -> bool:
+        if self.remaining is None:
+            return False
+        return self.remaining > 0 or self.reset is not None
+
+    def update(self, headers: t.Mapping[str, str]):
+        """
+        Updates the limiter from the rate limit headers of an API response.
+        Responses without rate limit headers leave the limiter unchanged.
+
+        :param t.Mapping[str, str] headers: The headers of a response from the Software Heritage API.
+        """
+        limit = _int_header(headers, _HEADER_LIMIT)
+        remaining = _int_header(headers, _HEADER_REMAINING)
+        reset = _int_header(headers, _HEADER_RESET)
+        with self._state():
+            if reset is not None and self.reset is not None and reset < self.reset:
+                return  # A late response from a previous rate limit window
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None and reset is not None and reset == self.reset and self.remaining is not None:
+                # Concurrent requests may report their remaining budgets out of order,
+                # so never grow the budget within the same rate limit window.
+                remaining = min(remaining, self.remaining)
+            if reset is not None:
+                self.reset = reset
+            if remaining is not None:
+                self.remaining = remaining
+
+    def _refill(self, now: float):
+        """
+        Refills the bucket if the reset time of the current rate limit window has passed.
+        Must be called while holding the lock.
+        """
+        if self.reset is not None and now >= self.reset + self.margin:
+            # A new window has started. Without a known limit, allow at least one request, whose response will
+            # tell us the actual budget.
+            self.remaining = self.limit if self.limit else 1
+            self.reset = None
+
+    def _take(self) -> int:
+        """
+        Tries to take one token from the bucket.
+
+        :return: `0` if a token has been taken, :py:data:`_NEEDS_PROBE` if the limiter has no rate limit state
+            and the caller should ping the API, :py:data:`_AWAIT_PROBE` if another caller is already pinging the API,
+            or otherwise the number of seconds to wait before trying again.
+        :rtype: int
+        """
+        with self._state():
+            self._refill(self.clock.time())
+            if not self._has_state():
+                if self._probing:
+                    return _AWAIT_PROBE
+                self._probing = True
+                return _NEEDS_PROBE
+            if self.remaining > 0:
+                self.remaining -= 1
+                return 0
+            return self.reset - int(self.clock.time()) + self.margin
+
+    def _learn(self, status_code: int, headers: t.Mapping[str, str]) -> int:
+        """
+        Learns the current rate limit from the response to a ping of the API.
+
+        :param int status_code: The HTTP status code of the ping response.
+        :param t.Mapping[str, str] headers: The headers of the ping response.
+        :return: The number of seconds to back off, which is `0` unless the API responded with a 429.
+        :rtype: int
+        """
+        if status_code == 429:
+            _log.info('Too many requests! Backing off.')
+            return self._exhaust(headers)
+        self.update(headers)
+        with self._state():
+            if self.remaining is None:
+                # The API did not report a rate limit, so assume one request can be made.
+                self.remaining = 1
+        return 0
+
+    def _end_probe(self):
+        """
+        Lets other callers ping the API again, if the limiter has still no rate limit state after a ping.
+        """
+        with self._state():
+            self._probing = False
+
+    def _exhaust(self, headers: t.Mapping[str, str]) -> int:
+        """
+        Marks the rate limit as used up until the reset time reported in the headers of a 429 response.
+
+        :param t.Mapping[str, str] headers: The headers of the 429 response.
+        :return: The number of seconds to wait until the rate limit is reset, plus the safety margin.
+        :rtype: int
+        """
+        reset = _int_header(headers, _HEADER_RESET)
+        with self._state():
+            if reset is None:
+                reset = int(self.clock.time()) + self.default_back_off
+            self.remaining = 0
+            self.reset = reset
+        return reset - int(self.clock.time()) + self.margin
+
+    def _must_wait(self, sleep_time: int) -> bool:
+        """
+        Checks whether the limiter must wait before the next request.
+
+        :param int sleep_time: The number of seconds until the rate limit is reset, plus the safety margin.
+        :return: Whether to wait.
+        :rtype: bool
+        :raises SwhRateLimitError: if the limiter must wait, but does not block.
+        """
+        if sleep_time <= 0:
+            return False
+        if not self.block:
+            raise SwhRateLimitError(f'Rate limit exceeded. The rate limit will be reset in {sleep_time} seconds.',
+                                    reset_time=self.reset)
+        _log.info(f'Rate limit exceeded. Waiting {sleep_time} seconds before retrying.')
+        return True
+
+    def acquire(self, probe: t.Callable[[], t.Tuple[int, t.Mapping[str, str]]]):
+        """
+        Takes one token from the bucket, and waits or fails if the bucket is empty.
+
+        :param probe: A callable that pings the API and returns the status code and headers of the response.
+            It is only called if the limiter has no rate limit state yet.
+        :raises SwhRateLimitError: if the rate limit is used up, and the limiter does not block.
+        """
+        while True:
+            sleep_time = self._take()
+            if sleep_time == 0:
+                return
+            if sleep_time == _AWAIT_PROBE:
+                _sleep(self.metrics, _PROBE_POLL_INTERVAL, SLEEP_PROBE, self.clock)
+                continue
+            if sleep_time == _NEEDS_PROBE:
+                try:
+                    sleep_time = self._learn(*probe())
+                finally:
+                    self._end_probe()
+            else:
+                _log.info('Rate limit exceeded. Backing off.')
+            if self._must_wait(sleep_time):
+                _sleep(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    async def acquire_async(self, probe: t.Callable[[], t.Awaitable[t.Tuple[int, t.Mapping[str, str]]]]):
+        """
+        Takes one token from the bucket like :meth:`acquire`, but waits without blocking the event loop.
+
+        :param probe: A coroutine function that pings the API and returns the status code and headers of the
+            response. It is only called if the limiter has no rate limit state yet.
+        :raises SwhRateLimitError: if the rate limit is used up, and the limiter does not block.
+        """
+        while True:
+            sleep_time = await self._call_async(self._take)
+            if sleep_time == 0:
+                return
+            if sleep_time == _AWAIT_PROBE:
+                await _sleep_async(self.metrics, _PROBE_POLL_INTERVAL, SLEEP_PROBE, self.clock)
+                continue
+            if sleep_time == _NEEDS_PROBE:
+                try:
+                    sleep_time = await self._call_async(self._learn, *await probe())
+                finally:
+                    await self._call_async(self._end_probe)
+            else:
+                _log.info('Rate limit exceeded. Backing off.')
+            if self._must_wait(sleep_time):
+                await _sleep_async(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    def back_off(self, headers: t.Mapping[str, str]):
+        """
+        Marks the rate limit as used up after a 429 (Too many requests) response, and backs off from making further
+        API calls until the rate limit is reset.
+
+        :param t.Mapping[str, str] headers: The headers of the 429 response.
+        :raises SwhRateLimitError: if the limiter does not block.
+        """
+        sleep_time = self._exhaust(headers)
+        if self._must_wait(sleep_time):
+            # Wait until the reset time, and an extra margin to be on the safe side.
+            _sleep(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    async def back_off_async(self, headers: t.Mapping[str, str]):
+        """
+        Backs off like :meth:`back_off`, but waits without blocking the event loop.
+
+        :param t.Mapping[str, str] headers: The headers of the 429 response.
+        :raises SwhRateLimitError: if the limiter does not block.
+        """
+        sleep_time = await self._call_async(self._exhaust, headers)
+        if self._must_wait(sleep_time):
+            await _sleep_async(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    async def update_async(self, headers: t.Mapping[str, str]):
+        """
+        Updates the limiter like :meth:`update`, but without blocking the event loop.
+
+        :param t.Mapping[str, str] headers: The headers of a response from the Software Heritage API.
+        """
+        await self._call_async(self.update, headers)
+
+    async def _call_async(self, function: t.Callable[..., t.Any], *args: t.Any) -> t.Any:
+        """
+        Calls a method that accesses the rate limit state from a coroutine. The state is only guarded by a lock
+        that is held briefly, so the method is called directly.
+        """
+        return function(*args)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    A :py:class:`RateLimiter` whose state is shared by all processes on a host through an SQLite state file.
+
+    Processes that use shared rate limiters with the same `path` and `name` draw from a single rate budget, so that
+    together they do not exceed the rate limit. The back-off state is shared as well: when one process receives a 429
+    response, all processes wait until the same reset time, and only one process at a time pings the API to learn a
+    rate limit that is unknown. Each access to the state is an exclusive transaction on the state file, so that the
+    file lock of SQLite serializes the processes.
+
+    A shared rate limiter is thread-safe, and can be used again in a process that has been forked after using it.
+    Coroutines, e.g., of an :py:class:`~pyswh.aio.AsyncSwhClient`, access the state file in the default executor of
+    the event loop, so that waiting for other processes does not block the loop.
+
+    :param str path: The path of the SQLite state file, which is created if it does not exist.
+    :param str name: The name of the rate budget in the state file, e.g., to keep separate budgets for different
+        authentication tokens in one file.
+    :param bool block: Whether to wait until the rate limit is reset when the budget is used up,
+        rather than raising :py:class:`~pyswh.errors.SwhRateLimitError`.
+    :param int margin: Extra seconds to wait after the reset time.
+    :param int default_back_off: Seconds to back off after a 429 response without an `X-RateLimit-Reset` header.
+    :param Metrics metrics: The metrics to report the time spent waiting to.
+    :param Clock clock: The clock to tell the time and wait with. Defaults to the system clock.
+    """
+
+    def __init__(self, path: str, name: str = 'default', block: bool = True, margin: int = _DEFAULT_MARGIN,
+                 default_back_off: int = _DEFAULT_BACK_OFF, metrics: t.Optional[Metrics] = None,
+                 clock: t.Optional[Clock] = None):
+        super().__init__(block, margin, default_back_off, metrics, clock)
+        self.path = path
+        self.name = name
+        self._connection: t.Optional[sqlite3.Connection] = None
+        self._pid: t.Optional[int] = None
+        self._probe_started: t.Optional[float] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens the state file for the current process. Must be called while holding the lock.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            # A connection must not be used across a fork, so each process opens its own
+            self._connection = sqlite3.connect(self.path, timeout=_SHARED_BUSY_TIMEOUT, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute(_SHARED_SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    @contextlib.contextmanager
+    def _state(self) -> t.Iterator[None]:
+        """
+        Loads the shared state into the attributes of the limiter within an exclusive transaction on the state file,
+        and writes changes back when the context exits.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute('SELECT rate_limit, remaining, reset, probe_started FROM rate_limits '
+                                         'WHERE name = ?', (self.name,)).fetchone()
+                self.limit, self.remaining, self.reset, self._probe_started = row or (None, None, None, None)
+                now = self.clock.time()
+                self._probing = self._probe_started is not None and now - self._probe_started < _PROBE_TIMEOUT
+                probing = self._probing
+                yield
+                if self._probing and not probing:
+                    self._probe_started = now
+                elif not self._probing:
+                    self._probe_started = None
+                connection.execute('INSERT OR REPLACE INTO rate_limits (name, rate_limit, remaining, reset, '
+                                   'probe_started) VALUES (?, ?, ?, ?, ?)',
+                                   (self.name, self.limit, self.remaining, self.reset, self._probe_started))
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    async def _call_async(self, function: t.Callable[..., t.Any], *args: t.Any) -> t.Any:
+        """
+        Calls a method that accesses the shared state from a coroutine in the default executor of the event loop,
+        because a transaction on the state file may wait for other processes to release it.
+        """
+        import asyncio  # Only needed by the asyncio API, and slow to import
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args))
+
+    def close(self):
+        """
+        Closes the state file. It is opened again when the limiter is used again.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+class TokenPool:
+    """
+    A pool of Software Heritage API authentication tokens, each with its own rate budget.
+
+    A token pool can be passed wherever an `auth_token` is accepted. Each token has its own
+    :py:class:`RateLimiter`, which is updated from the rate limit headers of the responses to the requests made with
+    the token. Every request is made with the token that has the most remaining budget; tokens whose rate limit is
+    unknown are tried first, so that their budget is learned. A token whose budget is used up rests until its rate
+    limit is reset, while requests go on with the other tokens. Only when all tokens are used up does the pool wait
+    for the earliest reset, or - if it was created with `block=False` - fail fast with a
+    :py:class:`~pyswh.errors.SwhRateLimitError`.
+
+    A token pool is thread-safe.
+
+    :param t.Iterable[str] tokens: The Software Heritage API authentication tokens.
+    :param bool block: Whether to wait until a rate limit is reset when the budgets of all tokens are used up,
+        rather than raising :py:class:`~pyswh.errors.SwhRateLimitError`.
+    :param int margin: Extra seconds to wait after the reset time.
+    :param int default_back_off: Seconds to rest a token after a 429 response without an `X-RateLimit-Reset` header.
+    :param Metrics metrics: The metrics to report the time spent waiting to.
+    :param Clock clock: The clock to tell the time and wait with. Defaults to the system clock.
+    :raises ValueError: if no tokens are given.
+    """
+
+    def __init__(self, tokens: t.Iterable[str], block: bool = True, margin: int = _DEFAULT_MARGIN,
+                 default_back_off: int = _DEFAULT_BACK_OFF, metrics: t.Optional[Metrics] = None,
+                 clock: t.Optional[Clock] = None):
+        self.block = block
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.limiters: t.Dict[str, RateLimiter] = {token: RateLimiter(True, margin, default_back_off, clock=self.clock)
+                                                   for token in tokens}
+        """The rate limiter for each token."""
+        if not self.limiters:
+            raise ValueError('A token pool needs at least one token.')
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.limiters)
+
+    def __repr__(self) -> str:
+        # Never show the tokens themselves
+        return f'<TokenPool of {len(self)} tokens>'
+
+    def _select(self) -> t.Tuple[t.Optional[str], int]:
+        """
+        Selects the token with the most remaining budget, and takes one request from its budget.
+
+        :return: The selected token and `0`, or the selected token and :py:data:`_NEEDS_PROBE` if the token's rate
+            limit is unknown and the caller should ping the API with it. If no token can be used, `None` and either
+            :py:data:`_AWAIT_PROBE` if pings are in progress, or the number of seconds until the earliest reset.
+        :rtype: t.Tuple[t.Optional[str], int]
+        """
+        now = self.clock.time()
+        with self._lock:
+            best: t.Optional[str] = None
+            best_budget = 0.0
+            probing = False
+            sleep_time: t.Optional[int] = None
+            for token, limiter in self.limiters.items():
+                with limiter._state():
+                    limiter._refill(now)
+                    if not limiter._has_state():
+                        if limiter._probing:
+                            probing = True
+                            continue
+                        budget = float('inf')
+                    elif limiter.remaining > 0:
+                        budget = limiter.remaining
+                    else:
+                        wait = limiter.reset - int(now) + limiter.margin
+                        sleep_time = wait if sleep_time is None else min(sleep_time, wait)
+                        continue
+                if budget > best_budget:
+                    best, best_budget = token, budget
+            if best is not None:
+                return best, self.limiters[best]._take()
+        return None, _AWAIT_PROBE if probing else sleep_time
+
+    def _must_wait(self, sleep_time: int) -> bool:
+        """
+        Checks whether the pool must wait before the next request, because the budgets of all tokens are used up.
+
+        :param int sleep_time: The number of seconds until the earliest reset, plus the safety margin.
+        :return: Whether to wait.
+        :rtype: bool
+        :raises SwhRateLimitError: if the pool must wait, but does not block.
+        """
+        if sleep_time <= 0:
+            return False
+        if not self.block:
+            raise SwhRateLimitError(f'Rate limit exceeded for all {len(self)} tokens. The earliest rate limit will be '
+                                    f'reset in {sleep_time} seconds.', reset_time=int(self.clock.time()) + sleep_time)
+        _log.info(f'Rate limit exceeded for all {len(self)} tokens. Waiting {sleep_time} seconds before retrying.')
+        return True
+
+    def acquire(self, probe: t.Callable[[str], t.Tuple[int, t.Mapping[str, str]]]) -> str:
+        """
+        Takes one request from the budget of the token with the most remaining budget,
+        and waits or fails if the budgets of all tokens are used up.
+
+        :param probe: A callable that pings the API with the given token, and returns the status code and headers of
+            the response. It is only called for tokens whose rate limit is not known yet.
+        :return: The token to make the request with.
+        :rtype: str
+        :raises SwhRateLimitError: if the budgets of all tokens are used up, and the pool does not block.
+        """
+        while True:
+            token, sleep_time = self._select()
+            if token is not None:
+                if sleep_time == 0:
+                    return token
+                if sleep_time == _NEEDS_PROBE:
+                    limiter = self.limiters[token]
+                    try:
+                        limiter._learn(*probe(token))
+                    finally:
+                        limiter._end_probe()
+                continue
+            if sleep_time == _AWAIT_PROBE:
+                _sleep(self.metrics, _PROBE_POLL_INTERVAL, SLEEP_PROBE, self.clock)
+            elif self._must_wait(sleep_time):
+                _sleep(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    async def acquire_async(self, probe: t.Callable[[str], t.Awaitable[t.Tuple[int, t.Mapping[str, str]]]]) -> str:
+        """
+        Takes one request from the budget of a token like :meth:`acquire`, but waits without blocking the event loop.
+
+        :param probe: A coroutine function that pings the API with the given token, and returns the status code and
+            headers of the response. It is only called for tokens whose rate limit is not known yet.
+        :return: The token to make the request with.
+        :rtype: str
+        :raises SwhRateLimitError: if the budgets of all tokens are used up, and the pool does not block.
+        """
+        while True:
+            token, sleep_time = self._select()
+            if token is not None:
+                if sleep_time == 0:
+                    return token
+                if sleep_time == _NEEDS_PROBE:
+                    limiter = self.limiters[token]
+                    try:
+                        limiter._learn(*await probe(token))
+                    finally:
+                        limiter._end_probe()
+                continue
+            if sleep_time == _AWAIT_PROBE:
+                await _sleep_async(self.metrics, _PROBE_POLL_INTERVAL, SLEEP_PROBE, self.clock)
+            elif self._must_wait(sleep_time):
+                await _sleep_async(self.metrics, sleep_time, SLEEP_RATE_LIMIT, self.clock)
+
+    def update(self, token: str, headers: t.Mapping[str, str]):
+        """
+        Updates the rate limiter of a token from the rate limit headers of an API response.
+
+        :param str token: The token that the request has been made with.
+        :param t.Mapping[str, str] headers: The headers of a response from the Software Heritage API.
+        """
+        self.limiters[token].update(headers)
+
+    def back_off(self, token: str, headers: t.Mapping[str, str]):
+        """
+        Rests a token after a 429 (Too many requests) response until its rate limit is reset.
+        Unlike :meth:`RateLimiter.back_off`, this does not wait, as other tokens may still have budget.
+
+        :param str token: The token that the request has been made with.
+        :param t.Mapping[str, str] headers: The headers of the 429 response.
+        """
+        _log.info('Too many requests! Resting the token until its rate limit is reset.')
+        self.limiters[token]._exhaust(headers)
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from pyswh.polling import Poll
+
+STATUS_FIELDS = ('origin_url', 'save_request_status', 'save_task_status', 'visit_status', 'loading_task_id', 'note')
+"""The fields of the JSON object for a save request that are kept while its status is polled."""
+
+
+def compact_status(status: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+    """
+    Reduces the JSON object for a save request to the fields that are needed to follow the save.
+
+    :param t.Mapping[str, t.Any] status: The JSON object for the save request, as returned by the API.
+    :return: The fields of the object that are listed in :py:data:`STATUS_FIELDS`, if present.
+    :rtype: t.Dict[str, t.Any]
+    """
+    return {field: status[field] for field in STATUS_FIELDS if field in status}
+
+
+class SaveResult:
+    """
+    The result of saving an origin, as returned by :meth:`~pyswh.swh.SwhClient.save`,
+    and carried by :py:class:`~pyswh.errors.SwhSaveError`.
+
+    Results only keep the statuses of the save, not the responses of the API, so that many of them can be kept.
+
+    :param str origin_url: The URL of the origin.
+    :param str visit_type: The visit type of the save request, e.g., `git`.
+    :param str request_status: The last known status of the save request, e.g., `accepted`.
+    :param str task_status: The last known status of the save task, e.g., `succeeded`.
+    :param str visit_status: The last known visit status, e.g., `full`.
+    :param str task_id: The task id of the save task, provided by the SWH API.
+    :param float started_at: The epoch at which the save has started. Defaults to the time of `clock`.
+    :param float duration: The number of seconds that the save has taken.
+    :param int polls: The number of status checks made for the save.
+    :param Clock clock: The clock to tell the start time with, if it is not given. Defaults to the system clock.
+    """
+    __slots__ = ('origin_url', 'visit_type', 'request_status', 'task_status', 'visit_status', 'task_id',
+                 'started_at', 'duration', 'polls')
+
+    def __init__(self,
+                 origin_url: str,
+                 visit_type: str = 'git',
+                 request_status: t.Optional[str] = None,
+                 task_status: t.Optional[str] = None,
+                 visit_status: t.Optional[str] = None,
+                 task_id: t.Optional[str] = None,
+                 started_at: t.Optional[float] = None,
+                 duration: float = 0.0,
+                 polls: int = 0,
+                 clock: t.Optional[Clock] = None):
+        self.origin_url = origin_url
+        self.visit_type = visit_type
+        self.request_status = request_status
+        self.task_status = task_status
+        self.visit_status = visit_status
+        self.task_id = task_id
+        if started_at is None:
+            started_at = (clock if clock is not None else SYSTEM_CLOCK).time()
+        self.started_at = started_at
+        self.duration = duration
+        self.polls = polls
+
+    @classmethod
+    def from_poll(cls, poll: 'Poll', visit_type: str = 'git') -> 'SaveResult':
+        """
+        Creates the result of a save from the state of polling its status.
+
+        :param Poll poll: The state of polling for the save.
+        :param str visit_type: The visit type of the save request.
+        :return: The result of the save.
+        :rtype: SaveResult
+        """
+        status = poll.status or {}
+        return cls(poll.origin_url, visit_type, status.get('save_request_status'), status.get('save_task_status'),
+                   status.get('visit_status'), poll.task_id or status.get('loading_task_id'), poll.started_at,
+                   poll.elapsed, poll.polls)
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        Whether the save task is known to have succeeded.
+        """
+        return self.task_status == 'succeeded'
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        """
+        Converts the result to a dictionary, e.g., to serialize it as JSON.
+
+        :return: The fields of the result by name.
+        :rtype: t.Dict[str, t.Any]
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: t.Any) -> bool:
+        if not isinstance(other, SaveResult):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return (f'SaveResult(origin_url={self.origin_url!r}, visit_type={self.visit_type!r}, '
+                f'request_status={self.request_status!r}, task_status={self.task_status!r}, '
+                f'visit_status={self.visit_status!r}, task_id={self.task_id!r}, polls={self.polls})')
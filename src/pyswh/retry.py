@@ -0,0 +1,266 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import threading
+import time
+import typing as t
+
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.metrics import NULL_METRICS, SLEEP_CIRCUIT, Metrics
+
+_HEADER_RETRY_AFTER = 'Retry-After'
+_TRIAL_POLL_INTERVAL = 0.5  # Seconds between checks whether the trial request of a half-open circuit has completed
+
+_log = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    A policy for retrying requests to the API that have failed transiently, i.e., with a connection error or a timeout,
+    or with one of the HTTP status codes in `statuses`, such as 503 (Service unavailable).
+
+    Status checks and other `GET` requests are idempotent and are always retried. Save requests (`POST`) are retried
+    when the connection could not be established, as the request has not reached the API then. Otherwise, they are
+    only retried if `resubmit` is set: the API answers a repeated save request for an origin with the pending request,
+    so that resubmitting is safe, but a request may be counted twice against the rate limit.
+
+    The first retry waits `initial_delay` seconds, and each following retry waits `factor` times longer, up to
+    `max_delay` seconds, spread randomly by up to `jitter` times the wait. If the API sends a `Retry-After` header,
+    it is followed instead, up to `max_retry_after` seconds.
+
+    :param int max_attempts: The maximum number of attempts per request, including the first one.
+        `1` disables retries.
+    :param float initial_delay: The number of seconds to wait before the first retry.
+    :param float factor: The factor by which the wait grows after each retry.
+    :param float max_delay: The maximum number of seconds to wait between two attempts.
+    :param float jitter: The fraction of each wait by which it is randomly shortened or lengthened, between 0 and 1.
+    :param t.Collection[int] statuses: The HTTP status codes of responses to retry.
+    :param bool resubmit: Whether save requests may be resubmitted after they may have reached the API.
+    :param float max_retry_after: The maximum number of seconds to wait as requested by a `Retry-After` header.
+    :raises ValueError: if a parameter is out of range.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 4,
+                 initial_delay: float = 0.5,
+                 factor: float = 2.0,
+                 max_delay: float = 30.0,
+                 jitter: float = 0.1,
+                 statuses: t.Collection[int] = (500, 502, 503, 504),
+                 resubmit: bool = True,
+                 max_retry_after: float = 120.0):
+        if max_attempts < 1:
+            raise ValueError('There must be at least one attempt.')
+        if initial_delay < 0 or max_delay < initial_delay:
+            raise ValueError('Delays must satisfy 0 <= initial_delay <= max_delay.')
+        if factor < 1:
+            raise ValueError('The growth factor must be at least 1.')
+        if not 0 <= jitter <= 1:
+            raise ValueError('The jitter must be between 0 and 1.')
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.resubmit = resubmit
+        self.max_retry_after = max_retry_after
+
+    def is_transient(self, status: int) -> bool:
+        """
+        Checks whether a response signals a transient failure of the API.
+
+        :param int status: The HTTP status code of the response.
+        :return: Whether the status code is one of the policy's `statuses`.
+        :rtype: bool
+        """
+        return status in self.statuses
+
+    def should_retry(self, method: str, attempt: int, reached_api: bool = True,
+                     idempotent: t.Optional[bool] = None) -> bool:
+        """
+        Decides whether to retry a request that has failed transiently.
+
+        :param str method: The HTTP method of the request.
+        :param int attempt: The number of attempts made so far.
+        :param bool reached_api: Whether the request may have reached the API,
+            which is not the case if the connection could not be established.
+        :param bool idempotent: Whether repeating the request has no further effect, such as for queries that are
+            sent with `POST`. Defaults to whether the method is not `POST`.
+        :return: Whether to make another attempt.
+        :rtype: bool
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if idempotent is None:
+            idempotent = method != 'POST'
+        return idempotent or self.resubmit or not reached_api
+
+    def delay(self, attempt: int, headers: t.Optional[t.Mapping[str, str]] = None,
+              now: t.Optional[float] = None) -> float:
+        """
+        Computes the wait before retrying a request.
+
+        :param int attempt: The number of attempts made so far.
+        :param t.Mapping[str, str] headers: The headers of the failed response, if any,
+            whose `Retry-After` header takes precedence.
+        :param float now: The current epoch, to which a `Retry-After` date is compared. Defaults to the system time.
+        :return: The number of seconds to wait.
+        :rtype: float
+        """
+        retry_after = _retry_after(headers, now) if headers is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        try:
+            delay = min(self.max_delay, self.initial_delay * self.factor ** (attempt - 1))
+        except OverflowError:
+            delay = self.max_delay
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+"""A :py:class:`RetryPolicy` that does not retry requests."""
+
+
+def _retry_after(headers: t.Mapping[str, str], now: t.Optional[float] = None) -> t.Optional[float]:
+    """
+    Reads the number of seconds to wait from a `Retry-After` header, which holds either seconds or an HTTP date.
+
+    :param t.Mapping[str, str] headers: The (case-insensitive) response headers.
+    :param float now: The current epoch, to which a date is compared. Defaults to the system time.
+    :return: The number of seconds to wait, or `None` if the header is missing or invalid.
+    :rtype: t.Optional[float]
+    """
+    value = headers.get(_HEADER_RETRY_AFTER)
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (time.time() if now is None else now))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker that pauses all requests of one or more clients while the API is down.
+
+    The circuit is closed while requests succeed. After `failure_threshold` consecutive transient failures
+    (see :py:class:`RetryPolicy`), it opens, and all requests wait for `reset_timeout` seconds, instead of failing or
+    retrying on their own. Then, the circuit is half-open: a single trial request is let through, while the other
+    requests keep waiting. If the trial succeeds, the circuit closes, and all requests continue; otherwise, it opens
+    again.
+
+    Any response other than a transient failure counts as a success, as it shows that the API is up.
+    A circuit breaker is thread-safe, and can be shared by several clients.
+
+    :param int failure_threshold: The number of consecutive transient failures after which the circuit opens.
+    :param float reset_timeout: The number of seconds for which the circuit stays open before a trial request.
+    :param Metrics metrics: The metrics to report the time spent waiting for the circuit to close to.
+        Defaults to discarding all measurements.
+    :param Clock clock: The clock to tell the time and wait with. Defaults to the system clock.
+    :raises ValueError: if a parameter is out of range.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, metrics: t.Optional[Metrics] = None,
+                 clock: t.Optional[Clock] = None):
+        if failure_threshold < 1:
+            raise ValueError('The failure threshold must be at least 1.')
+        if reset_timeout < 0:
+            raise ValueError('The reset timeout must not be negative.')
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.state = CircuitBreaker.CLOSED
+        """The state of the circuit: :py:attr:`CLOSED`, :py:attr:`OPEN` or :py:attr:`HALF_OPEN`."""
+        self.failures = 0
+        """The number of consecutive transient failures."""
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self) -> float:
+        """
+        Computes how long a request must wait before it may be made, and lets the trial request of a half-open
+        circuit through.
+
+        :return: The number of seconds to wait, or `0` if the request may be made now.
+        :rtype: float
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return 0
+            now = self.clock.monotonic()
+            if self.state == CircuitBreaker.OPEN:
+                remaining = self._opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining
+                _log.info('Making a trial request to check whether the Software Heritage API is up again.')
+                self.state = CircuitBreaker.HALF_OPEN
+                self._trial_started = now
+                return 0
+            if now - self._trial_started >= max(self.reset_timeout, _TRIAL_POLL_INTERVAL):
+                # The trial request has been abandoned, let another one through
+                self._trial_started = now
+                return 0
+            return _TRIAL_POLL_INTERVAL
+
+    def wait(self):
+        """
+        Waits until a request may be made.
+        """
+        while True:
+            wait_time = self._wait_time()
+            if wait_time == 0:
+                return
+            self.clock.sleep(wait_time)
+            self.metrics.slept(SLEEP_CIRCUIT, wait_time)
+
+    async def wait_async(self):
+        """
+        Waits until a request may be made, without blocking the event loop.
+        """
+        while True:
+            wait_time = self._wait_time()
+            if wait_time == 0:
+                return
+            await self.clock.sleep_async(wait_time)
+            self.metrics.slept(SLEEP_CIRCUIT, wait_time)
+
+    def record_success(self):
+        """
+        Records a response that shows that the API is up, and closes the circuit.
+        """
+        with self._lock:
+            self.failures = 0
+            if self.state != CircuitBreaker.CLOSED:
+                _log.info('The Software Heritage API is up again. Resuming requests.')
+                self.state = CircuitBreaker.CLOSED
+
+    def record_failure(self):
+        """
+        Records a transient failure, and opens the circuit after `failure_threshold` consecutive failures,
+        or if the trial request of a half-open circuit has failed.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or (self.state == CircuitBreaker.CLOSED
+                                                          and self.failures >= self.failure_threshold):
+                _log.warning(f'The Software Heritage API seems to be down after {self.failures} failed requests. '
+                             f'Pausing requests for {self.reset_timeout:.0f} sec.')
+                self.state = CircuitBreaker.OPEN
+                self._opened_at = self.clock.monotonic()
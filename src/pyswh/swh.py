@@ -2,21 +2,70 @@
 #
 # SPDX-License-Identifier: MIT
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, Future, wait
+from datetime import datetime, timezone
 from enum import Enum
+import functools
+import json
 import logging
-import time
+import os
+import threading
 import typing as t
+from urllib.parse import quote
 
-import requests
-from requests import exceptions as request_exceptions
+from pyswh.cache import VisitCache
+from pyswh.clock import SYSTEM_CLOCK, Clock
+from pyswh.errors import SwhError, SwhSaveError, SwhSaveRejectedError, SwhVaultError
+from pyswh.flight import SingleFlight
+from pyswh.journal import JournalEntry, SaveJournal
+from pyswh.known import KNOWN_MAX_BATCH_SIZE, SwhidBitmap, _batches
+from pyswh.metrics import NULL_METRICS, SLEEP_POLL, SLEEP_RETRY, Metrics, _trace_stage, _trace_status
+from pyswh.origins import OriginDeduplicator, origin_key
+from pyswh.pages import Page, paginate, parse_link_header
+from pyswh.polling import Poll, PollingStrategy
+from pyswh.ratelimit import _HEADER_REMAINING, RateLimiter, SharedRateLimiter, TokenPool, _int_header, _sleep
+from pyswh.result import SaveResult, compact_status
+from pyswh.retry import CircuitBreaker, RetryPolicy
+from pyswh.transport import (Response, StreamedResponse, Transport, TransportConnectionError, TransportError,
+                             create_transport)
+from pyswh.vault import (DEFAULT_CHUNK_SIZE, DEFAULT_VAULT_POLLING, BundleVerifier, VaultResult, parse_content_range,
+                         resolve_bundle_type)
 
-from pyswh.errors import SwhSaveError
+if t.TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+    from pyswh.handle import SaveHandle
+    from pyswh.poller import StatusPoller
 
 _API_ROOT_URL = 'https://archive.softwareheritage.org/api/1/'
+_API_ENDPOINT_PING = 'ping/'
 _API_ENDPOINT_SAVE = 'origin/save/'
+_API_ENDPOINT_ORIGIN = 'origin/'
+_API_ENDPOINT_KNOWN = 'known/'
+_API_ENDPOINT_VAULT = 'vault/'
+_API_PATH_RAW = 'raw/'
+_API_ENDPOINT_SNAPSHOT = 'snapshot/'
+_API_ENDPOINT_SEARCH = 'origin/search/'
+_API_PATH_VISITS = '/visits/'
+_API_PATH_LATEST_VISIT = '/visit/latest/?require_snapshot=true'
 _API_URL_PATH = '/url/'
 _visit_type = 'git'  # TODO Add bzr, hg, svn
 
+_DEFAULT_POOL_CONNECTIONS = 10
+_DEFAULT_POOL_MAXSIZE = 10
+_DEFAULT_TIMEOUT = (10.0, 60.0)  # (connect, read) in seconds
+_DEFAULT_MAX_WORKERS = 8
+_DEFAULT_KNOWN_WORKERS = 4
+_DEFAULT_VAULT_WORKERS = 4
+_DEFAULT_MAX_RESUMES = 5
+_DEFAULT_PAGE_SIZE = 1000
+_ENV_RATE_LIMIT_FILE = 'PYSWH_RATE_LIMIT_FILE'
+_ENV_TRANSPORT = 'PYSWH_TRANSPORT'
+_DEFAULT_TRANSPORT = 'requests'
+
+AuthToken = t.Union[str, TokenPool, None]
+"""A Software Heritage API authentication token, or a pool of tokens."""
+
 _log = logging.getLogger(__name__)
 
 
@@ -28,6 +77,1435 @@ class _RequestMethod(Enum):
     GET = 'GET'
 
 
+class SaveOutcome(Enum):
+    """
+    An enum representing the outcome of saving a single origin in a bulk save.
+    """
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    REJECTED = 'rejected'
+    SKIPPED = 'skipped'
+
+
+class BulkSaveResult(t.NamedTuple):
+    """
+    The result of saving a single origin with :meth:`SwhClient.save_many`.
+    """
+    origin_url: str
+    """The URL of the origin that should have been saved."""
+    outcome: SaveOutcome
+    """Whether saving the origin has succeeded, failed, been rejected by the API, or been skipped."""
+    error: t.Optional[SwhSaveError] = None
+    """The error that made saving the origin fail, or `None` if saving has succeeded."""
+    polls: int = 0
+    """The number of status checks made for the save."""
+    result: t.Optional[SaveResult] = None
+    """The result of the save with its last known statuses, or `None` if the save has been skipped."""
+
+
+class SwhClient:
+    """
+    A client for the Software Heritage API that reuses HTTP connections across requests.
+
+    All requests made by a client go through a single pool of keep-alive connections, so that consecutive pings,
+    save requests and status checks do not each pay for a new TCP and TLS handshake.
+    A client can be shared between threads, as all requests go through its thread-safe
+    :py:class:`~pyswh.transport.Transport`. The transport is created on first use, so that creating a client
+    does not import an HTTP library.
+
+    :param str api_root_url: The root URL of the Software Heritage API, e.g., to use a staging instance.
+    :param int pool_connections: The number of hosts for which connection pools are cached.
+    :param int pool_maxsize: The maximum number of connections kept alive per host.
+    :param bool pool_block: Whether to block when all connections of a pool are in use,
+        rather than opening (and discarding) additional connections.
+    :param timeout: The timeout for each request in seconds, either as a single value,
+        or as a `(connect, read)` tuple.
+    :param bool keep_alive: Whether to keep connections open between requests.
+    :param RateLimiter rate_limiter: The rate limiter that holds the rate budget for all requests made by the client.
+        Defaults to a new blocking :py:class:`~pyswh.ratelimit.RateLimiter` that reports to the client's metrics.
+    :param PollingStrategy polling: The strategy for polling the status of saves.
+        Defaults to a :py:class:`~pyswh.polling.PollingStrategy` with exponential backoff from one second,
+        and without a timeout.
+    :param bool multiplex_polling: Whether the status of saves should be checked by the client's central
+        :py:class:`~pyswh.poller.StatusPoller`, which makes one request per origin for all save tasks of the origin,
+        rather than by each save on its own.
+    :param VisitCache visit_cache: The cache for the latest visits of origins, which are looked up by saves with a
+        `min_age`. Defaults to a new in-memory :py:class:`~pyswh.cache.VisitCache`.
+    :param Metrics metrics: The metrics to report requests, the stages of saves and the time spent waiting to.
+        Defaults to discarding all measurements.
+    :param Transport transport: The transport to send requests with, which is not closed with the client.
+        Defaults to a transport with the given pool settings for the backend named in the environment variable
+        `PYSWH_TRANSPORT`, `requests` (:py:class:`~pyswh.transport.RequestsTransport`) if it is not set, or
+        `urllib3` (:py:class:`~pyswh.transport.Urllib3Transport`).
+    :param RetryPolicy retry: The policy for retrying requests that have failed transiently.
+        Defaults to a :py:class:`~pyswh.retry.RetryPolicy` with up to four attempts per request;
+        pass :py:data:`~pyswh.retry.NO_RETRY` to disable retries.
+    :param CircuitBreaker circuit_breaker: The circuit breaker that pauses all requests while the API is down,
+        which may be shared with other clients. Defaults to a new :py:class:`~pyswh.retry.CircuitBreaker`
+        that reports to the client's metrics.
+    :param bool keep_raw_responses: Whether errors should keep the body of the API response that caused them in
+        :py:attr:`~pyswh.errors.SwhSaveError.raw`, e.g., for debugging. By default, only the statuses are kept.
+    :param bool single_flight: Whether concurrent calls of :meth:`save` for the same origin should be coalesced:
+        a save that is started while an identical save is in flight attaches to it, rather than submitting another
+        save request and polling its status, and gets the same result or error.
+    :param float debounce: The number of seconds that a coalesced save waits before it submits its save request,
+        so that a burst of saves of the same origin is merged into one. Only used with `single_flight`.
+    :param Clock clock: The clock that the client tells the time and waits with, e.g., between status checks,
+        and that the default rate limiter and circuit breaker use. Defaults to the system clock;
+        pass a :py:class:`~pyswh.clock.VirtualClock` to simulate waits.
+    """
+
+    def __init__(self,
+                 api_root_url: str = _API_ROOT_URL,
+                 pool_connections: int = _DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = _DEFAULT_POOL_MAXSIZE,
+                 pool_block: bool = False,
+                 timeout: t.Union[float, t.Tuple[float, float], None] = _DEFAULT_TIMEOUT,
+                 keep_alive: bool = True,
+                 rate_limiter: t.Optional[RateLimiter] = None,
+                 polling: t.Optional[PollingStrategy] = None,
+                 multiplex_polling: bool = False,
+                 visit_cache: t.Optional[VisitCache] = None,
+                 metrics: t.Optional[Metrics] = None,
+                 transport: t.Optional[Transport] = None,
+                 retry: t.Optional[RetryPolicy] = None,
+                 circuit_breaker: t.Optional[CircuitBreaker] = None,
+                 keep_raw_responses: bool = False,
+                 single_flight: bool = False,
+                 debounce: float = 0.0,
+                 clock: t.Optional[Clock] = None):
+        self.api_root_url = _prepare_url(api_root_url)
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.rate_limiter = (rate_limiter if rate_limiter is not None
+                             else RateLimiter(metrics=self.metrics, clock=self.clock))
+        self.polling = polling if polling is not None else PollingStrategy()
+        self.multiplex_polling = multiplex_polling
+        self.visit_cache = visit_cache if visit_cache is not None else VisitCache(clock=self.clock)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.circuit_breaker = (circuit_breaker if circuit_breaker is not None
+                                else CircuitBreaker(metrics=self.metrics, clock=self.clock))
+        self.keep_raw_responses = keep_raw_responses
+        self.flights: t.Optional[SingleFlight[t.Tuple[str, str, bool], SaveResult]] = None
+        """The saves in flight by origin key, visit type and `post_only`, if saves are coalesced."""
+        if single_flight:
+            self.flights = SingleFlight(debounce, self.metrics, self.clock)
+        self._poller = None
+        self._pool_settings = (pool_connections, pool_maxsize, pool_block)
+        self._transport = transport
+        self._owns_transport = transport is None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'SwhClient':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connections of this client's transport, unless the transport has been passed to the client,
+        and stops its status poller. A persistent visit cache is written to its file.
+        """
+        self.visit_cache.save()
+        if self._poller is not None:
+            self._poller.close()
+            self._poller = None
+        with self._lock:
+            if self._owns_transport and self._transport is not None:
+                self._transport.close()
+                self._transport = None
+
+    @property
+    def poller(self) -> 'StatusPoller':
+        """
+        The client's central :py:class:`~pyswh.poller.StatusPoller`, which is started on first use.
+        """
+        if self._poller is None:
+            from pyswh.poller import StatusPoller
+            with self._lock:
+                if self._poller is None:
+                    self._poller = StatusPoller(self)
+        return self._poller
+
+    @property
+    def transport(self) -> Transport:
+        """
+        The :py:class:`~pyswh.transport.Transport` that the client sends requests with, which is created on first use.
+        """
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    self._transport = create_transport(os.environ.get(_ENV_TRANSPORT) or _DEFAULT_TRANSPORT,
+                                                       *self._pool_settings, self.keep_alive)
+        return self._transport
+
+    @property
+    def session(self) -> 'requests.Session':
+        """
+        The :py:class:`requests.Session` for the current thread, if the client uses a
+        :py:class:`~pyswh.transport.RequestsTransport`.
+        """
+        return self.transport.session
+
+    def _raw(self, response: Response) -> t.Optional[bytes]:
+        """
+        Returns the body of a response to keep in an error, if the client keeps raw responses.
+
+        :param Response response: The response.
+        :return: The body of the response, or `None`.
+        :rtype: t.Optional[bytes]
+        """
+        return response.content if self.keep_raw_responses else None
+
+    def _build_request_url(self, origin_url: str) -> str:
+        """
+        Constructs a valid request URL to use with the Software Heritage API from its parts.
+
+        :param str origin_url: The URL for the origin source code repository that should be saved.
+        :return: A valid request URL
+        :rtype: str
+        """
+        return _prepare_url(self.api_root_url + _API_ENDPOINT_SAVE + _visit_type + _API_URL_PATH + origin_url)
+
+    def _ping(self, auth_token: t.Optional[str] = None) -> t.Tuple[int, t.Mapping[str, str]]:
+        """
+        Pings the SWH API.
+
+        :param str auth_token: An optional SWH auth token, whose rate limit should be reported.
+        :return: The status code and the headers of the ping response, which contain rate limit information.
+        :rtype: t.Tuple[int, t.Mapping[str, str]]
+        """
+        headers = {'Authorization': f'Bearer {auth_token}'} if auth_token else {}
+        started = self.clock.monotonic()
+        try:
+            response = self.transport.request('GET', self.api_root_url + _API_ENDPOINT_PING, headers, self.timeout)
+        except TransportError:
+            _report_request(self.metrics, 'ping', 'GET', started, clock=self.clock)
+            raise
+        _report_request(self.metrics, 'ping', 'GET', started, response.status_code, response.headers, self.clock)
+        return response.status_code, response.headers
+
+    def _check_rate_limit(self):
+        """
+        Takes one request from the rate budget of the client's :py:class:`~pyswh.ratelimit.RateLimiter`,
+        and backs off if the rate limit is exceeded.
+        The API is only pinged for rate limit information if the rate limiter does not know the current rate limit.
+        """
+        self.rate_limiter.acquire(self._ping)
+
+    def _request(self, method: _RequestMethod, origin_url: str, auth_token: AuthToken) -> Response:
+        """
+        Makes a rate limit-safe request to the save endpoint of the SWH API and returns the
+        :py:class:`~pyswh.transport.Response`.
+
+        :param _RequestMethod method: The request method to use for the request.
+        :param str origin_url: The origin URL to use for construction of the request URL.
+        :param auth_token: An optional SWH auth token, or a pool of tokens.
+        :return: The response returned for the request.
+        :rtype: Response
+        """
+        endpoint = 'save' if method is _RequestMethod.POST else 'status'
+        return self._api_request(method, self._build_request_url(origin_url), auth_token, endpoint)
+
+    def _api_request(self, method: _RequestMethod, request_url: str, auth_token: AuthToken, endpoint: str,
+                     body: t.Any = None, idempotent: t.Optional[bool] = None,
+                     headers: t.Optional[t.Mapping[str, str]] = None,
+                     stream: bool = False) -> t.Union[Response, StreamedResponse]:
+        """
+        Makes a rate limit-safe request to the SWH API and returns the :py:class:`~pyswh.transport.Response`,
+        or a :py:class:`~pyswh.transport.StreamedResponse` whose body has not been read yet if `stream` is set.
+
+        The rate limit headers of the response are used to update the client's rate limiter, or the rate limiter of
+        the token that has been taken from a :py:class:`~pyswh.ratelimit.TokenPool`.
+        If the API responds with HTTP status code 429 (Too many requests), the request is repeated after backing off,
+        or with another token from the pool. Requests that fail transiently are retried according to the client's
+        :py:class:`~pyswh.retry.RetryPolicy`, and all requests wait while the client's
+        :py:class:`~pyswh.retry.CircuitBreaker` is open. If the last attempt has been answered with a transient
+        failure status, that response is returned.
+
+        :param _RequestMethod method: The request method to use for the request.
+        :param str request_url: The URL to request.
+        :param auth_token: An optional SWH auth token, or a pool of tokens.
+        :param str endpoint: The name of the endpoint to report to the client's metrics.
+        :param body: An optional JSON object to send as the body of the request.
+        :param bool idempotent: Whether the request may be repeated without further effect, which the retry policy
+            assumes for all methods but `POST` by default.
+        :param t.Mapping[str, str] headers: Additional request headers, e.g., `Range`.
+        :param bool stream: Whether to return as soon as the response headers have been read.
+        :return: The response returned for the request, which must be closed if it is streamed.
+        :rtype: t.Union[Response, StreamedResponse]
+        :raises TransportError: if the last attempt has failed with a connection error or a timeout.
+        """
+        pool = auth_token if isinstance(auth_token, TokenPool) else None
+        send = self.transport.stream if stream else self.transport.request
+        request_headers = {'Accept': 'application/json', **(headers or {})}
+        content = None
+        if body is not None:
+            content = json.dumps(body).encode('utf-8')
+            request_headers['Content-Type'] = 'application/json'
+        attempts = 0
+        while True:
+            self.circuit_breaker.wait()
+            try:
+                auth_token = self._authorize(pool, auth_token, request_headers)
+                response = self._send(send, method, request_url, request_headers, content, endpoint)
+            except TransportError as te:
+                attempts += 1
+                if not self._retry_after_error(method, request_url, attempts, te, idempotent):
+                    raise
+                continue
+            if self._learn_rate_limit(response, pool, auth_token):
+                continue
+            if not self.retry.is_transient(response.status_code):
+                self.circuit_breaker.record_success()
+                return response
+            attempts += 1
+            if not self._retry_after_status(method, request_url, attempts, response, idempotent):
+                return response
+
+    def _authorize(self, pool: t.Optional[TokenPool], auth_token: AuthToken,
+                   request_headers: t.Dict[str, str]) -> t.Optional[str]:
+        """
+        Takes one request from the rate budget, and sets the `Authorization` header of a request.
+
+        :param TokenPool pool: The pool to take a token from, or `None` to use `auth_token`
+            and the client's rate limiter.
+        :param auth_token: An optional SWH auth token.
+        :param t.Dict[str, str] request_headers: The headers of the request, which are updated.
+        :return: The token that the request is made with, if any.
+        :rtype: t.Optional[str]
+        """
+        if pool is not None:
+            auth_token = pool.acquire(self._ping)
+        else:
+            self._check_rate_limit()
+        if auth_token:
+            request_headers['Authorization'] = f'Bearer {auth_token}'
+            _log.debug('Making authenticated requests (authorization token).')
+        else:
+            _log.debug('Making anonymous requests.')
+        return auth_token
+
+    def _send(self, send: t.Callable[..., t.Union[Response, StreamedResponse]], method: _RequestMethod,
+              request_url: str, request_headers: t.Mapping[str, str], content: t.Optional[bytes],
+              endpoint: str) -> t.Union[Response, StreamedResponse]:
+        """
+        Sends a single request with the client's transport, and reports it to the client's metrics.
+
+        :return: The response returned for the request.
+        :rtype: t.Union[Response, StreamedResponse]
+        :raises TransportError: if the request has failed with a connection error or a timeout.
+        """
+        started = self.clock.monotonic()
+        try:
+            response = send(method.value, request_url, request_headers, self.timeout, content)
+        except TransportError:
+            _report_request(self.metrics, endpoint, method.value, started, clock=self.clock)
+            raise
+        _report_request(self.metrics, endpoint, method.value, started, response.status_code, response.headers,
+                        self.clock)
+        return response
+
+    def _learn_rate_limit(self, response: Response, pool: t.Optional[TokenPool], auth_token: t.Optional[str]) -> bool:
+        """
+        Updates the rate limiter of the client, or of the token from the pool, from the headers of a response,
+        and backs off if the API has responded with HTTP status code 429 (Too many requests).
+
+        :param Response response: The response to a request.
+        :param TokenPool pool: The pool that the token has been taken from, or `None` to use the client's rate limiter.
+        :param str auth_token: The token that the request has been made with, if any.
+        :return: Whether the request has been answered with HTTP status code 429, and should be repeated.
+        :rtype: bool
+        """
+        if response.status_code == 429:
+            _discard(response)
+            self.circuit_breaker.record_success()
+            if pool is not None:
+                pool.back_off(auth_token, response.headers)
+            else:
+                self.rate_limiter.back_off(response.headers)
+            return True
+        if pool is not None:
+            pool.update(auth_token, response.headers)
+        else:
+            self.rate_limiter.update(response.headers)
+        return False
+
+    def _retry_after_error(self, method: _RequestMethod, request_url: str, attempts: int, error: TransportError,
+                           idempotent: t.Optional[bool]) -> bool:
+        """
+        Records a request that has failed with a connection error or a timeout,
+        and waits before retrying it, as long as the client's retry policy says.
+
+        :return: Whether the request should be retried.
+        :rtype: bool
+        """
+        self.circuit_breaker.record_failure()
+        reached_api = not isinstance(error, TransportConnectionError)
+        if not self.retry.should_retry(method.value, attempts, reached_api, idempotent):
+            return False
+        self._wait_to_retry(request_url, attempts, error)
+        return True
+
+    def _retry_after_status(self, method: _RequestMethod, request_url: str, attempts: int,
+                            response: t.Union[Response, StreamedResponse], idempotent: t.Optional[bool]) -> bool:
+        """
+        Records a request that has been answered with a transient failure status,
+        and waits before retrying it, as long as the client's retry policy says.
+
+        :return: Whether the request should be retried. If not, the response is kept open to be returned.
+        :rtype: bool
+        """
+        self.circuit_breaker.record_failure()
+        if not self.retry.should_retry(method.value, attempts, idempotent=idempotent):
+            return False
+        _discard(response)
+        self._wait_to_retry(request_url, attempts, f'HTTP status {response.status_code}', response.headers)
+        return True
+
+    def _wait_to_retry(self, request_url: str, attempts: int, failure: t.Any,
+                       headers: t.Optional[t.Mapping[str, str]] = None):
+        """
+        Waits before retrying a request that has failed transiently, as long as the client's retry policy says.
+
+        :param str request_url: The URL of the request.
+        :param int attempts: The number of attempts made so far.
+        :param failure: The error or the HTTP status that the request has failed with.
+        :param t.Mapping[str, str] headers: The headers of the failed response, if any.
+        """
+        delay = self.retry.delay(attempts, headers, self.clock.time())
+        _log.warning(f'Request to {request_url} failed ({failure}). '
+                     f'Retrying in {delay:.1f} sec. (attempt {attempts + 1} of {self.retry.max_attempts}).')
+        _sleep(self.metrics, delay, SLEEP_RETRY, self.clock)
+
+    def _init_save(self, origin_url: str, auth_token: str) -> Response:
+        """
+        Requests the initial save action in the Software Heritage API.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :return: The response returned for the request.
+        :rtype: Response
+        :raises SwhSaveError: if no connection to the internet exists, or if the request has failed.
+        """
+        try:
+            return self._request(_RequestMethod.POST, origin_url, auth_token)
+        except TransportConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        except TransportError as te:
+            raise SwhSaveError(f'Request to the Software Heritage API failed for {origin_url}: {te}') from te
+
+    def _get_status(self, origin_url: str, auth_token: str, task_id: str,
+                    poll: Poll) -> t.Tuple[Response, t.Any]:
+        """
+        Requests the current status of a save task.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param Poll poll: The state of polling for this save, which counts the status check.
+        :return: The response, and the JSON object for the save task.
+        :rtype: t.Tuple[Response, t.Any]
+        :raises SwhSaveError: if no connection to the internet exists, or if the status cannot be retrieved.
+        """
+        try:
+            response = self._request(_RequestMethod.GET, origin_url, auth_token)
+        except TransportConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API during progress check. '
+                               'Are you connected to the internet?')
+        except TransportError as te:
+            raise SwhSaveError(f'Request to the Software Heritage API failed during progress check for {origin_url}: '
+                               f'{te}') from te
+        poll.polls += 1
+        _raise_for_status_check(origin_url, response.status_code)
+        _trace_status(self.metrics, poll, _find_current_result(response.text, task_id, poll, self._raw(response)))
+        return response, poll.status
+
+    def _check_save_progress(self, origin_url: str, auth_token: str, task_id: str, poll: Poll = None) -> int:
+        """
+        Checks on the progress of the save action until it has completed, and reports its results.
+
+        :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param Poll poll: The state of polling for this save. Polling starts anew if it is not provided.
+        :return: The number of status checks made for the save.
+        :rtype: int
+        :raises SwhSaveError: if no connection to the internet exists, or if the save action was unsuccessful.
+        :raises SwhSaveTimeoutError: if the save action has not completed within the timeout of the polling strategy.
+        """
+        if poll is None:
+            poll = self.polling.start(origin_url, self.clock)
+        while True:
+            response, response_json = self._get_status(origin_url, auth_token, task_id, poll)
+            save_status = response_json['save_task_status']
+            if save_status == 'failed':
+                raise _failed_error(origin_url, response_json, self._raw(response))
+            elif save_status == 'succeeded':
+                _log.info(f'Saving {origin_url} has succeeded with visit status {response_json["visit_status"]}!')
+                return poll.polls
+            # One of not created, not yet scheduled, scheduled
+            delay = poll.next_delay()
+            _log.info(f'The save task for {origin_url} is {save_status}. '
+                      f'Waiting for {delay:.1f} sec. before checking the status again.')
+            _sleep(self.metrics, delay, SLEEP_POLL, self.clock)
+
+    def _check_status(self, response: Response, auth_token: str, task_id: str, poll: Poll = None) -> int:
+        """
+        Checks the status of the save action as reported by the :py:class:`~pyswh.transport.Response`,
+        waits until the save request has been accepted or rejected, and then checks on the progress of the save.
+
+        :param Response response: The response of the initial save request.
+        :param str auth_token: An optional SWH auth token.
+        :param str task_id: The task id of the current save task.
+        :param Poll poll: The state of polling for this save. Polling starts anew if it is not provided.
+        :return: The number of status checks made for the save.
+        :rtype: int
+        :raises SwhSaveError: if the save request has been rejected.
+        """
+
+        # First, check the overall requests status (accepted, rejected, pending)
+        response_json = _find_current_result(response.text, task_id, poll, self._raw(response))
+        origin_url = response_json['origin_url']
+        if poll is None:
+            poll = self.polling.start(origin_url, self.clock)
+        poll.task_id = task_id
+        _trace_status(self.metrics, poll, response_json)
+        if self.multiplex_polling and response_json['save_request_status'] != 'rejected':
+            watch = self.poller.watch(origin_url, task_id, auth_token, poll)
+            watch.wait()
+            if watch.error is not None:
+                raise watch.error
+            return poll.polls
+        while response_json['save_request_status'] == 'pending':
+            delay = poll.next_delay()
+            _log.info(f'The request to save {origin_url} is still pending. '
+                      f'Waiting for {delay:.1f} sec. before checking the status again.')
+            _sleep(self.metrics, delay, SLEEP_POLL, self.clock)
+            response, response_json = self._get_status(origin_url, auth_token, task_id, poll)
+        if response_json['save_request_status'] == 'rejected':
+            raise _rejected_error(origin_url, response_json, self._raw(response))
+
+        # Request status is accepted, check for save progress
+        return self._check_save_progress(origin_url, auth_token, task_id, poll)
+
+    def latest_visit(self, origin_url: str, auth_token: AuthToken = None) -> t.Optional[t.Dict[str, t.Any]]:
+        """
+        Retrieves the latest visit of an origin that has produced a snapshot.
+
+        This method wraps the `/api/1/origin/visit/latest/
+        <https://archive.softwareheritage.org/api/1/origin/visit/latest/doc/>`_ endpoint. Visits are looked up in the
+        client's :py:class:`~pyswh.cache.VisitCache` first, and responses are stored in it,
+        including the absence of a visit.
+
+        :param str origin_url: The URL of the origin.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :return: The JSON object for the latest visit, or `None` if the origin has not been visited.
+        :rtype: t.Optional[t.Dict[str, t.Any]]
+        :raises SwhSaveError: if no connection to the internet exists, or if the visit cannot be retrieved.
+        """
+        found, visit = self.visit_cache.lookup(origin_url)
+        if found:
+            _log.debug(f'Found the latest visit of {origin_url} in the cache.')
+            return visit
+        request_url = self.api_root_url + _API_ENDPOINT_ORIGIN + origin_url + _API_PATH_LATEST_VISIT
+        try:
+            response = self._api_request(_RequestMethod.GET, request_url, auth_token, 'visit')
+        except TransportConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        if response.status_code == 404:
+            visit = None
+        elif response.status_code == 200:
+            visit = response.json()
+        else:
+            raise SwhSaveError(f'Could not retrieve the latest visit of {origin_url} '
+                               f'(HTTP status {response.status_code}).')
+        self.visit_cache.put(origin_url, visit)
+        return visit
+
+    def _recently_archived(self, origin_url: str, auth_token: str, min_age: float) -> bool:
+        """
+        Checks whether an origin has been visited within the given number of seconds.
+        If the latest visit cannot be retrieved, the origin is considered not to have been archived recently.
+
+        :param str origin_url: The URL of the origin.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param float min_age: The age in seconds that the latest visit must have for the origin to be saved again.
+        :return: Whether the latest visit is younger than `min_age`.
+        :rtype: bool
+        """
+        try:
+            visit = self.latest_visit(origin_url, auth_token)
+        except (SwhSaveError, TransportError, ValueError) as e:
+            _log.warning(f'Could not check the latest visit of {origin_url}, saving it anyway: {e}')
+            return False
+        if visit is None:
+            return False
+        age = _visit_age(visit, self.clock.time())
+        if age is None or age >= min_age:
+            return False
+        _log.info(f'Skipping {origin_url}, which has last been visited {age:.0f} sec. ago at {visit["date"]}.')
+        return True
+
+    def _save(self, origin_url: str, post_only: bool, auth_token: str, poll: Poll,
+              journal: t.Optional[SaveJournal] = None):
+        """
+        Attempts to save code in the Software Heritage Archive, and counts the status checks in the given poll.
+
+        :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API and return.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param Poll poll: The state of polling for this save.
+        :param SaveJournal journal: An optional journal to record the submitted save request in.
+        :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+        """
+        init_response = self._init_save(origin_url, auth_token)
+        if init_response.status_code == 200:
+            _trace_stage(self.metrics, poll, 'submitted')
+        if post_only and journal is None:
+            if init_response.status_code == 200:
+                _keep_submitted(poll, init_response)
+            return
+        if init_response.status_code == 200:
+            # The API promises exactly one object as content of the POST response, so we can safely get the task ID
+            response_json = init_response.json()
+            task_id = response_json['loading_task_id']
+            if journal is not None:
+                journal.record_submitted(origin_url, task_id, response_json.get('save_request_status'), _visit_type)
+            if post_only:
+                _keep_submitted(poll, init_response)
+            else:
+                self._check_status(init_response, auth_token, task_id, poll)
+        elif not post_only:
+            _raise_for_init_status(origin_url, init_response.status_code, self._raw(init_response))
+
+    def _resume(self, origin_url: str, auth_token: str, task_id: str, poll: Poll):
+        """
+        Resumes checking the status of a save request that has been submitted before.
+
+        :param str origin_url: The URL of the origin (source code repository) that is being saved in the archive.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param str task_id: The task id of the save task, provided by the SWH API.
+        :param Poll poll: The state of polling for this save.
+        :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+        """
+        _log.info(f'Resuming the status checks for the save request for {origin_url} (task {task_id}).')
+        response, _ = self._get_status(origin_url, auth_token, task_id, poll)
+        self._check_status(response, auth_token, task_id, poll)
+
+    def save(self, origin_url: str, post_only: bool, auth_token: AuthToken,
+             min_age: t.Optional[float] = None) -> SaveResult:
+        """
+        Attempts to save code in the Software Heritage Archive.
+
+        This method wraps the `/api/1/origin/save/ <https://archive.softwareheritage.org/1/origin/save/doc/>`_
+        endpoint. The status of the save is checked following the client's :py:class:`~pyswh.polling.PollingStrategy`.
+
+        If `min_age` is given, the latest visit of the origin is looked up first (see :meth:`latest_visit`),
+        and the origin is not saved if it has been visited less than `min_age` seconds ago.
+
+        If the client coalesces saves (`single_flight`), a save of an origin whose key (see
+        :func:`~pyswh.origins.origin_key`) equals that of a save in flight with the same `post_only` waits for that
+        save, and returns its result, which has the origin URL of the first save.
+
+        :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API and return,
+            without checking for the success of the save operation.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param float min_age: The minimum age in seconds of the latest visit of the origin for it to be saved again,
+            or `None` to always save it.
+        :return: The result of the save, without statuses if the origin has been skipped.
+        :rtype: SaveResult
+        :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
+            The error carries the result of the save up to the error.
+        :raises SwhSaveTimeoutError: if the save has not completed within the timeout of the polling strategy.
+        """
+        if self.flights is not None:
+            return self.flights.do((origin_key(origin_url), _visit_type, post_only),
+                                   functools.partial(self._save_result, origin_url, post_only, auth_token, min_age))
+        return self._save_result(origin_url, post_only, auth_token, min_age)
+
+    def _save_result(self, origin_url: str, post_only: bool, auth_token: AuthToken,
+                     min_age: t.Optional[float]) -> SaveResult:
+        """
+        Saves a single origin, see :meth:`save`.
+        """
+        if min_age is not None and self._recently_archived(origin_url, auth_token, min_age):
+            return SaveResult(origin_url, _visit_type, clock=self.clock)
+        poll = self.polling.start(origin_url, self.clock)
+        try:
+            self._save(origin_url, post_only, auth_token, poll)
+        except SwhSaveError as sse:
+            raise _with_result(sse, poll)
+        self.visit_cache.discard(origin_url)
+        return SaveResult.from_poll(poll, _visit_type)
+
+    def submit(self, origin_url: str, auth_token: AuthToken = None) -> 'SaveHandle':
+        """
+        Submits a request to save code in the Software Heritage Archive, and returns without waiting for the save.
+
+        The status of the save is tracked in the background by the client's :py:class:`~pyswh.poller.StatusPoller`,
+        following the client's :py:class:`~pyswh.polling.PollingStrategy`. The returned handle can be used to wait for
+        the result of the save, or to register a callback that is called when the save has completed.
+
+        :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :return: A handle for the submitted save.
+        :rtype: SaveHandle
+        :raises SwhSaveError: if the save request could not be submitted, or has been rejected.
+        """
+        from pyswh.handle import SaveHandle
+        poll = self.polling.start(origin_url, self.clock)
+        init_response = self._init_save(origin_url, auth_token)
+        if init_response.status_code != 200:
+            _raise_for_init_status(origin_url, init_response.status_code, self._raw(init_response))
+        _trace_stage(self.metrics, poll, 'submitted')
+        response_json = init_response.json()
+        task_id = response_json['loading_task_id']
+        poll.task_id = task_id
+        _trace_status(self.metrics, poll, response_json)
+        if response_json['save_request_status'] == 'rejected':
+            raise _rejected_error(origin_url, response_json, self._raw(init_response))
+        watch = self.poller.watch(origin_url, task_id, auth_token, poll)
+        watch.add_done_callback(lambda w: self.visit_cache.discard(origin_url) if w.error is None else None)
+        return SaveHandle(self.poller, watch)
+
+    def _save_one(self, origin_url: str, post_only: bool, auth_token: str,
+                  journal: t.Optional[SaveJournal] = None, resume_task_id: t.Optional[str] = None,
+                  min_age: t.Optional[float] = None) -> BulkSaveResult:
+        """
+        Saves a single origin, and captures the outcome instead of raising an error.
+
+        :param str origin_url: The URL of the origin that should be saved in the archive.
+        :param bool post_only: Whether the URL should simply be posted to the API.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param SaveJournal journal: An optional journal to record the save in.
+        :param str resume_task_id: The task id of a save request that has been submitted before,
+            whose status checks should be resumed instead of submitting the request again.
+        :param float min_age: The minimum age in seconds of the latest visit of the origin for it to be saved again.
+        :return: The result of the save.
+        :rtype: BulkSaveResult
+        """
+        if resume_task_id is None and min_age is not None and self._recently_archived(origin_url, auth_token, min_age):
+            return BulkSaveResult(origin_url, SaveOutcome.SKIPPED)
+        poll = self.polling.start(origin_url, self.clock)
+        try:
+            if resume_task_id is not None:
+                self._resume(origin_url, auth_token, resume_task_id, poll)
+            else:
+                self._save(origin_url, post_only, auth_token, poll, journal)
+        except SwhSaveRejectedError as sre:
+            outcome, error = SaveOutcome.REJECTED, sre
+        except SwhSaveError as sse:
+            outcome, error = SaveOutcome.FAILED, sse
+        except TransportError as re:
+            outcome = SaveOutcome.FAILED
+            error = SwhSaveError(f'Request to the Software Heritage API failed for {origin_url}: {re}')
+        else:
+            outcome, error = SaveOutcome.SUCCEEDED, None
+            self.visit_cache.discard(origin_url)
+        save_result = _with_result(error, poll).result if error is not None else SaveResult.from_poll(poll, _visit_type)
+        result = BulkSaveResult(origin_url, outcome, error, poll.polls, save_result)
+        if journal is not None and not (post_only and result.outcome is SaveOutcome.SUCCEEDED):
+            _record_result(journal, result, poll)
+        return result
+
+    def save_many(self, origins: t.Iterable[str], auth_token: AuthToken = None, max_workers: int = _DEFAULT_MAX_WORKERS,
+                  post_only: bool = False, journal: t.Optional[SaveJournal] = None,
+                  freshness: t.Optional[float] = None, min_age: t.Optional[float] = None,
+                  dedupe: bool = False) -> t.Iterator[BulkSaveResult]:
+        """
+        Attempts to save many origins in the Software Heritage Archive concurrently.
+
+        The origins are saved by a bounded pool of worker threads, which share the client's connection pool and
+        rate limiter. Origins are taken lazily from the iterable, so that it may be a stream of arbitrary length.
+        Errors do not end the bulk save: the result for each origin is yielded as soon as its save has completed,
+        including the :py:class:`~pyswh.errors.SwhSaveError` for origins that could not be saved.
+
+        To reuse connections, `max_workers` should not exceed the client's `pool_maxsize`.
+
+        If a :py:class:`~pyswh.journal.SaveJournal` is given, the progress of each save is recorded in it, so that an
+        interrupted bulk save can be resumed by running it again with the same journal: the status checks for save
+        requests that have been submitted before are resumed instead of submitting the requests again, and origins
+        that have been saved successfully within the last `freshness` seconds are skipped with the outcome
+        :py:attr:`SaveOutcome.SKIPPED`. Origins that have been visited by the archive less than `min_age` seconds
+        ago are skipped as well, see :meth:`save`.
+
+        With `dedupe`, the origin URLs are canonicalized (see :func:`~pyswh.origins.canonicalize`), and equivalent
+        spellings of an origin, such as `http://github.com/Org/Repo.git` and `https://github.com/org/repo/`,
+        are saved only once, under the canonical URL of their first spelling. Each spelling still gets a result,
+        with the spelling as its `origin_url`. Journal entries are recorded under the canonical URLs.
+
+        :param t.Iterable[str] origins: The URLs of the origins that should be saved in the archive.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int max_workers: The maximum number of origins to save at the same time.
+        :param bool post_only: Whether the URLs should simply be posted to the API,
+            without checking for the success of the save operations.
+        :param SaveJournal journal: An optional journal to record the saves in, and to resume them from.
+        :param float freshness: The number of seconds for which a journaled successful save is considered fresh,
+            or `None` to save all origins that have not been saved before.
+        :param float min_age: The minimum age in seconds of the latest visit of an origin for it to be saved again,
+            or `None` to always save it.
+        :param bool dedupe: Whether to save equivalent origin URLs only once.
+        :return: An iterator over the results of the saves, in the order in which they complete.
+        :rtype: t.Iterator[BulkSaveResult]
+        """
+        if dedupe:
+            deduplicator: OriginDeduplicator[BulkSaveResult] = OriginDeduplicator()
+            return deduplicator.fan_out(self._save_many(deduplicator.unique(origins), auth_token, max_workers,
+                                                        post_only, journal, freshness, min_age))
+        return self._save_many(origins, auth_token, max_workers, post_only, journal, freshness, min_age)
+
+    def _save_many(self, origins: t.Iterable[str], auth_token: AuthToken, max_workers: int, post_only: bool,
+                   journal: t.Optional[SaveJournal], freshness: t.Optional[float],
+                   min_age: t.Optional[float]) -> t.Iterator[BulkSaveResult]:
+        """
+        Saves many origins concurrently, see :meth:`save_many`.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pyswh-save') as executor:
+            pending: t.Set[Future] = set()
+            try:
+                for origin_url in origins:
+                    now = self.clock.time()
+                    skip, resume_task_id = _journal_lookup(journal, origin_url, post_only, freshness, now)
+                    if skip:
+                        yield BulkSaveResult(origin_url, SaveOutcome.SKIPPED)
+                        continue
+                    pending.add(executor.submit(self._save_one, origin_url, post_only, auth_token, journal,
+                                                resume_task_id, min_age))
+                    # Only queue a few origins ahead of the workers, so that the iterable is consumed lazily
+                    if len(pending) >= 2 * max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                # Don't start saves that are still queued when the caller stops consuming the results
+                for future in pending:
+                    future.cancel()
+                if journal is not None:
+                    journal.flush()
+
+    def _known_batch(self, batch: t.List[str], auth_token: AuthToken) -> t.List[bool]:
+        """
+        Checks which SWHIDs of a batch are known to the archive with one request.
+
+        :param t.List[str] batch: The SWHIDs, at most :py:data:`~pyswh.known.KNOWN_MAX_BATCH_SIZE`.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :return: Whether each SWHID is known, in the order of the batch.
+        :rtype: t.List[bool]
+        :raises SwhSaveError: if no connection to the internet exists, or if the API has not answered the request.
+        """
+        request_url = self.api_root_url + _API_ENDPOINT_KNOWN
+        try:
+            response = self._api_request(_RequestMethod.POST, request_url, auth_token, 'known', body=batch,
+                                         idempotent=True)
+        except TransportConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        if response.status_code != 200:
+            raise SwhSaveError(f'Failed to check whether {len(batch)} SWHIDs are known '
+                               f'(HTTP status {response.status_code}).')
+        known = response.json()
+        return [bool(known.get(swhid, {}).get('known')) for swhid in batch]
+
+    def _known_batches(self, swhids: t.Iterable[str], auth_token: AuthToken, batch_size: int,
+                       max_workers: int) -> t.Iterator[t.Tuple[int, t.List[str], t.List[bool]]]:
+        """
+        Checks batches of SWHIDs concurrently, see :meth:`known`.
+
+        :return: An iterator over the offset of each batch in `swhids`, its SWHIDs, and whether each of them is known,
+            in the order in which the batches complete.
+        :rtype: t.Iterator[t.Tuple[int, t.List[str], t.List[bool]]]
+        """
+        if not 1 <= batch_size <= KNOWN_MAX_BATCH_SIZE:
+            raise ValueError(f'The batch size must be between 1 and {KNOWN_MAX_BATCH_SIZE}.')
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pyswh-known') as executor:
+            pending: t.Dict[Future, t.Tuple[int, t.List[str]]] = {}
+            try:
+                offset = 0
+                for batch in _batches(swhids, batch_size):
+                    pending[executor.submit(self._known_batch, batch, auth_token)] = offset, batch
+                    offset += len(batch)
+                    # Only read a few batches ahead of the workers, so that the iterable is consumed lazily
+                    if len(pending) >= 2 * max_workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield (*pending.pop(future), future.result())
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield (*pending.pop(future), future.result())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def known(self, swhids: t.Iterable[str], auth_token: AuthToken = None, batch_size: int = KNOWN_MAX_BATCH_SIZE,
+              max_workers: int = _DEFAULT_KNOWN_WORKERS) -> SwhidBitmap:
+        """
+        Checks which of many SWHIDs are known to the archive.
+
+        This method wraps the `/api/1/known/ <https://archive.softwareheritage.org/api/1/known/doc/>`_ endpoint.
+        The SWHIDs are taken lazily from the iterable and sent in batches of up to `batch_size`, by a bounded pool of
+        worker threads that share the client's connection pool and rate limiter, so that each batch takes one request
+        from the rate budget. The result holds one bit per SWHID, rather than the SWHIDs themselves.
+
+        :param t.Iterable[str] swhids: The core SWHIDs to check, such as `swh:1:rev:<sha1_git>`.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int batch_size: The number of SWHIDs to check per request,
+            at most :py:data:`~pyswh.known.KNOWN_MAX_BATCH_SIZE`.
+        :param int max_workers: The maximum number of requests in flight at the same time.
+        :return: Whether each SWHID is known, by its index in `swhids`.
+        :rtype: SwhidBitmap
+        :raises ValueError: if a SWHID is invalid, or the batch size is out of range.
+        :raises SwhSaveError: if no connection to the internet exists, or if the API has not answered a request.
+        """
+        bitmap = SwhidBitmap()
+        for offset, _, flags in self._known_batches(swhids, auth_token, batch_size, max_workers):
+            bitmap._set_batch(offset, flags)
+        return bitmap
+
+    def iter_known(self, swhids: t.Iterable[str], auth_token: AuthToken = None,
+                   batch_size: int = KNOWN_MAX_BATCH_SIZE,
+                   max_workers: int = _DEFAULT_KNOWN_WORKERS) -> t.Iterator[t.Tuple[str, bool]]:
+        """
+        Checks which of many SWHIDs are known to the archive like :meth:`known`, but streams the results batch by
+        batch, as soon as each batch has been checked.
+
+        :param t.Iterable[str] swhids: The core SWHIDs to check, such as `swh:1:rev:<sha1_git>`.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int batch_size: The number of SWHIDs to check per request,
+            at most :py:data:`~pyswh.known.KNOWN_MAX_BATCH_SIZE`.
+        :param int max_workers: The maximum number of requests in flight at the same time.
+        :return: An iterator over each SWHID and whether it is known, in the order in which the batches complete.
+        :rtype: t.Iterator[t.Tuple[str, bool]]
+        :raises ValueError: if a SWHID is invalid, or the batch size is out of range.
+        :raises SwhSaveError: if no connection to the internet exists, or if the API has not answered a request.
+        """
+        for _, batch, flags in self._known_batches(swhids, auth_token, batch_size, max_workers):
+            yield from zip(batch, flags)
+
+    def _get_page(self, request_url: str, auth_token: AuthToken, endpoint: str, what: str) -> Page:
+        """
+        Retrieves a page of a paginated resource.
+
+        :param str request_url: The URL of the page.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param str endpoint: The name of the endpoint to report to the client's metrics.
+        :param str what: A description of the resource for error messages.
+        :return: The JSON content of the page, and the URL of the next page from the `Link` header, if any.
+        :rtype: Page
+        :raises SwhSaveError: if no connection to the internet exists, or if the page cannot be retrieved.
+        """
+        try:
+            response = self._api_request(_RequestMethod.GET, request_url, auth_token, endpoint)
+        except TransportConnectionError:
+            raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        if response.status_code != 200:
+            raise SwhSaveError(f'Could not retrieve {what} (HTTP status {response.status_code}).')
+        return response.json(), parse_link_header(response.headers.get('Link')).get('next')
+
+    def _pages(self, request_url: str, auth_token: AuthToken, endpoint: str, what: str,
+               prefetch: bool) -> t.Iterator[t.Any]:
+        """
+        Iterates over the pages of a paginated resource, see :func:`~pyswh.pages.paginate`.
+        """
+        return paginate(functools.partial(self._get_page, auth_token=auth_token, endpoint=endpoint, what=what),
+                        request_url, prefetch)
+
+    def iter_visits(self, origin_url: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                    prefetch: bool = True) -> t.Iterator[t.Dict[str, t.Any]]:
+        """
+        Iterates over the visits of an origin, newest first.
+
+        This method wraps the `/api/1/origin/visits/ <https://archive.softwareheritage.org/api/1/origin/visits/doc/>`_
+        endpoint. Pages of `per_page` visits are requested lazily, following the `Link` headers of the API, through the
+        client's connection pool and rate limiter. With `prefetch`, the next page is requested in the background while
+        the current one is consumed.
+
+        :param str origin_url: The URL of the origin.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int per_page: The number of visits to request per page.
+        :param bool prefetch: Whether to request the next page in the background.
+        :return: An iterator over the JSON objects for the visits.
+        :rtype: t.Iterator[t.Dict[str, t.Any]]
+        :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved,
+            e.g., because the origin is not in the archive.
+        """
+        request_url = f'{self.api_root_url}{_API_ENDPOINT_ORIGIN}{origin_url}{_API_PATH_VISITS}?per_page={per_page}'
+        for page in self._pages(request_url, auth_token, 'visits', f'the visits of {origin_url}', prefetch):
+            yield from page
+
+    def iter_snapshot_branches(self, snapshot: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                               prefetch: bool = True) -> t.Iterator[t.Tuple[str, t.Optional[t.Dict[str, t.Any]]]]:
+        """
+        Iterates over the branches of a snapshot, in the order of their names. See :meth:`iter_visits` for paging.
+
+        This method wraps the `/api/1/snapshot/ <https://archive.softwareheritage.org/api/1/snapshot/doc/>`_ endpoint.
+
+        :param str snapshot: The SWHID or the hex identifier of the snapshot, e.g., the `snapshot` of a visit.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int per_page: The number of branches to request per page.
+        :param bool prefetch: Whether to request the next page in the background.
+        :return: An iterator over the name of each branch and its target, a JSON object with `target` and
+            `target_type`, or `None` for a dangling branch.
+        :rtype: t.Iterator[t.Tuple[str, t.Optional[t.Dict[str, t.Any]]]]
+        :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved.
+        """
+        snapshot_id = snapshot.rsplit(':', 1)[-1]
+        request_url = f'{self.api_root_url}{_API_ENDPOINT_SNAPSHOT}{snapshot_id}/?branches_count={per_page}'
+        for page in self._pages(request_url, auth_token, 'snapshot', f'the snapshot {snapshot_id}', prefetch):
+            yield from page['branches'].items()
+
+    def search_origins(self, query: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                       prefetch: bool = True) -> t.Iterator[t.Dict[str, t.Any]]:
+        """
+        Iterates over the origins whose URLs match a query. See :meth:`iter_visits` for paging.
+
+        This method wraps the `/api/1/origin/search/ <https://archive.softwareheritage.org/api/1/origin/search/doc/>`_
+        endpoint.
+
+        :param str query: The words to search for in origin URLs.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int per_page: The number of origins to request per page.
+        :param bool prefetch: Whether to request the next page in the background.
+        :return: An iterator over the JSON objects for the origins, which hold their `url`.
+        :rtype: t.Iterator[t.Dict[str, t.Any]]
+        :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved.
+        """
+        request_url = f'{self.api_root_url}{_API_ENDPOINT_SEARCH}{quote(query, safe="")}/?limit={per_page}'
+        for page in self._pages(request_url, auth_token, 'search', f'the origins matching {query!r}', prefetch):
+            yield from page
+
+    def _vault_request(self, method: _RequestMethod, request_url: str, auth_token: AuthToken,
+                       swhid: str) -> t.Dict[str, t.Any]:
+        """
+        Requests the cooking of a bundle, or its status.
+
+        :param _RequestMethod method: `POST` to request cooking, `GET` for the status.
+        :param str request_url: The URL of the bundle in the vault.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param str swhid: The SWHID of the object that is cooked.
+        :return: The JSON object for the cooking task.
+        :rtype: t.Dict[str, t.Any]
+        :raises SwhVaultError: if no connection to the internet exists, or if the API has not answered the request.
+        """
+        try:
+            # Requesting a bundle that is being cooked, or has been cooked, has no further effect
+            response = self._api_request(method, request_url, auth_token, 'vault', idempotent=True)
+        except TransportConnectionError:
+            raise SwhVaultError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        if response.status_code != 200:
+            raise SwhVaultError(f'Failed to request the cooking of {swhid} (HTTP status {response.status_code}).')
+        return response.json()
+
+    def cook(self, swhid: str, bundle_type: t.Optional[str] = None, auth_token: AuthToken = None,
+             polling: t.Optional[PollingStrategy] = None) -> t.Dict[str, t.Any]:
+        """
+        Requests the cooking of a bundle of an archived object in the Software Heritage Vault, and waits until the
+        bundle is ready.
+
+        This method wraps the `/api/1/vault/ <https://archive.softwareheritage.org/api/1/vault/flat/doc/>`_ endpoints.
+        The status of cooking is polled with exponential backoff following `polling`. The backoff starts anew when the
+        status changes, e.g., from `new` to `pending` once the bundle is being cooked.
+
+        :param str swhid: The core SWHID of the object, a directory or a revision.
+        :param str bundle_type: The type of the bundle, see :py:data:`~pyswh.vault.BUNDLE_TYPES`, or `None` for
+            `flat` for directories and `gitfast` for revisions.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param PollingStrategy polling: The strategy for polling the status of cooking.
+            Defaults to :py:data:`~pyswh.vault.DEFAULT_VAULT_POLLING`.
+        :return: The JSON object for the cooked bundle, including its `fetch_url`.
+        :rtype: t.Dict[str, t.Any]
+        :raises ValueError: if the SWHID is invalid, or the object cannot be cooked into a bundle of the type.
+        :raises SwhVaultError: if cooking has failed, or has not completed within the timeout of `polling`.
+        """
+        bundle_type = resolve_bundle_type(swhid, bundle_type)
+        polling = polling if polling is not None else DEFAULT_VAULT_POLLING
+        request_url = self._vault_url(swhid, bundle_type)
+        status = self._vault_request(_RequestMethod.POST, request_url, auth_token, swhid)
+        started = self.clock.monotonic()
+        attempt = 0
+        while True:
+            state = status.get('status')
+            if state == 'done':
+                return status
+            if state == 'failed':
+                raise SwhVaultError(f'Cooking {swhid} has failed: {status.get("progress_message")}')
+            delay = polling.delay(attempt)
+            if polling.timeout is not None and self.clock.monotonic() - started + delay > polling.timeout:
+                raise SwhVaultError(f'Cooking {swhid} has not completed within {polling.timeout} seconds.')
+            _log.info(f'The bundle of {swhid} is {state}. Waiting for {delay:.1f} sec. before checking again.')
+            _sleep(self.metrics, delay, SLEEP_POLL, self.clock)
+            status = self._vault_request(_RequestMethod.GET, request_url, auth_token, swhid)
+            attempt = 0 if status.get('status') != state else attempt + 1
+
+    def _vault_url(self, swhid: str, bundle_type: str) -> str:
+        """
+        Constructs the URL of a bundle in the vault.
+
+        :param str swhid: The SWHID of the object.
+        :param str bundle_type: The type of the bundle.
+        :return: The URL.
+        :rtype: str
+        """
+        return f'{self.api_root_url}{_API_ENDPOINT_VAULT}{bundle_type}/{swhid}/'
+
+    def download(self, swhid: str, path: str, bundle_type: t.Optional[str] = None, auth_token: AuthToken = None,
+                 fetch_url: t.Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_resumes: int = _DEFAULT_MAX_RESUMES) -> int:
+        """
+        Downloads a cooked bundle from the vault to a file, without holding it in memory.
+
+        The bundle is streamed to `<path>.part` in chunks of `chunk_size` bytes, and is verified while it is written
+        (see :py:class:`~pyswh.vault.BundleVerifier`). If the download is interrupted, it is resumed with an HTTP
+        `Range` request from the end of the partial file, up to `max_resumes` times. A partial file left by an earlier
+        run is verified and resumed as well. The file is renamed to `path` once the bundle is complete.
+
+        :param str swhid: The core SWHID of the object, a directory or a revision.
+        :param str path: The path to write the bundle to.
+        :param str bundle_type: The type of the bundle, or `None` for the default type of the object, see :meth:`cook`.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param str fetch_url: The URL to download the bundle from, as returned by :meth:`cook`, or `None` to derive it.
+        :param int chunk_size: The number of bytes to read and write at a time.
+        :param int max_resumes: The maximum number of times to resume an interrupted download.
+        :return: The size of the bundle in bytes.
+        :rtype: int
+        :raises ValueError: if the SWHID is invalid, or the object cannot be cooked into a bundle of the type.
+        :raises SwhVaultError: if the bundle cannot be downloaded, or is corrupt.
+        """
+        if fetch_url is None:
+            fetch_url = self._vault_url(swhid, resolve_bundle_type(swhid, bundle_type)) + _API_PATH_RAW
+        part_path = f'{path}.part'
+        verifier = BundleVerifier()
+        try:
+            with open(part_path, 'a+b') as f:
+                if not _verify_partial(f, verifier, chunk_size):
+                    _log.warning(f'Discarding the corrupt partial download of {swhid} in {part_path}.')
+                    f.truncate(0)
+                    verifier = BundleVerifier()
+                resumes = 0
+                while True:
+                    failure = self._download_part(swhid, fetch_url, auth_token, f, verifier, chunk_size)
+                    if failure is None:
+                        break
+                    if isinstance(failure, BundleVerifier):
+                        # The server sends the bundle from the start
+                        verifier = failure
+                        continue
+                    resumes += 1
+                    if resumes > max_resumes:
+                        raise SwhVaultError(f'Downloading the bundle of {swhid} has failed after {verifier.size} '
+                                            f'bytes and {max_resumes} resumes: {failure}')
+                    delay = self.retry.delay(resumes, now=self.clock.time())
+                    _log.warning(f'Downloading the bundle of {swhid} has been interrupted after {verifier.size} '
+                                 f'bytes ({failure}). Resuming in {delay:.1f} sec.')
+                    _sleep(self.metrics, delay, SLEEP_RETRY, self.clock)
+            verifier.finish()
+        except SwhVaultError:
+            if verifier.failed:
+                os.remove(part_path)
+            raise
+        os.replace(part_path, path)
+        return verifier.size
+
+    def _download_part(self, swhid: str, fetch_url: str, auth_token: AuthToken, f: t.BinaryIO,
+                       verifier: BundleVerifier, chunk_size: int) -> t.Union[None, str, BundleVerifier]:
+        """
+        Downloads the rest of a bundle, from the end of the partial file on.
+
+        :param str swhid: The SWHID of the object.
+        :param str fetch_url: The URL of the bundle.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param t.BinaryIO f: The partial file, positioned at its end.
+        :param BundleVerifier verifier: The verifier that has seen the partial file.
+        :param int chunk_size: The number of bytes to read and write at a time.
+        :return: `None` if the bundle is complete, the reason if the download has been interrupted, or a new verifier
+            if the download should start over because the server has ignored the range.
+        :rtype: t.Union[None, str, BundleVerifier]
+        :raises SwhVaultError: if no connection to the internet exists, if the bundle cannot be downloaded,
+            or if it is corrupt.
+        """
+        offset = verifier.size
+        headers = {'Accept': '*/*'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        try:
+            response = self._api_request(_RequestMethod.GET, fetch_url, auth_token, 'vault_download', headers=headers,
+                                         stream=True)
+        except TransportConnectionError:
+            raise SwhVaultError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+        except TransportError as te:
+            return str(te)
+        with response:
+            done, outcome = _check_range(swhid, response, offset, f)
+            if done:
+                return outcome
+            interrupted = _write_bundle(response, f, verifier, chunk_size)
+        f.flush()
+        return interrupted if interrupted is not None else _check_complete(response, offset, verifier)
+
+    def fetch(self, swhid: str, path: str, bundle_type: t.Optional[str] = None, auth_token: AuthToken = None,
+              polling: t.Optional[PollingStrategy] = None) -> int:
+        """
+        Cooks a bundle of an archived object with :meth:`cook`, and downloads it to a file with :meth:`download`.
+
+        :param str swhid: The core SWHID of the object, a directory or a revision.
+        :param str path: The path to write the bundle to.
+        :param str bundle_type: The type of the bundle, or `None` for the default type of the object, see :meth:`cook`.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param PollingStrategy polling: The strategy for polling the status of cooking.
+        :return: The size of the bundle in bytes.
+        :rtype: int
+        :raises ValueError: if the SWHID is invalid, or the object cannot be cooked into a bundle of the type.
+        :raises SwhVaultError: if the bundle cannot be cooked or downloaded, or is corrupt.
+        """
+        bundle_type = resolve_bundle_type(swhid, bundle_type)
+        status = self.cook(swhid, bundle_type, auth_token, polling)
+        return self.download(swhid, path, bundle_type, auth_token, status.get('fetch_url'))
+
+    def _fetch_one(self, swhid: str, path: str, bundle_type: t.Optional[str], auth_token: AuthToken,
+                   polling: t.Optional[PollingStrategy]) -> VaultResult:
+        """
+        Fetches a single bundle, and captures the outcome instead of raising an error.
+
+        :return: The result of the fetch.
+        :rtype: VaultResult
+        """
+        try:
+            return VaultResult(swhid, path, self.fetch(swhid, path, bundle_type, auth_token, polling))
+        except SwhError as se:
+            return VaultResult(swhid, path, error=se)
+        except (TransportError, OSError, ValueError) as e:
+            return VaultResult(swhid, path, error=SwhVaultError(f'Fetching the bundle of {swhid} has failed: {e}'))
+
+    def fetch_many(self, bundles: t.Iterable[t.Tuple[str, str]], auth_token: AuthToken = None,
+                   max_workers: int = _DEFAULT_VAULT_WORKERS, bundle_type: t.Optional[str] = None,
+                   polling: t.Optional[PollingStrategy] = None) -> t.Iterator[VaultResult]:
+        """
+        Cooks and downloads many bundles concurrently, see :meth:`fetch`.
+
+        The bundles are fetched by a bounded pool of worker threads, which share the client's connection pool and
+        rate limiter, so that one bundle can be downloaded while others are still being cooked.
+        Errors do not end the run: the result for each bundle is yielded as soon as it has been fetched or has failed.
+
+        :param bundles: The SWHID of each object, and the path to write its bundle to.
+        :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+        :param int max_workers: The maximum number of bundles to fetch at the same time.
+        :param str bundle_type: The type of the bundles, or `None` for the default type of each object.
+        :param PollingStrategy polling: The strategy for polling the status of cooking.
+        :return: An iterator over the results, in the order in which they complete.
+        :rtype: t.Iterator[VaultResult]
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pyswh-vault') as executor:
+            pending: t.Set[Future] = set()
+            try:
+                for swhid, path in bundles:
+                    pending.add(executor.submit(self._fetch_one, swhid, path, bundle_type, auth_token, polling))
+                    if len(pending) >= 2 * max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def _visit_age(visit: t.Mapping[str, t.Any], now: t.Optional[float] = None) -> t.Optional[float]:
+    """
+    Computes the age of a visit.
+
+    :param visit: The JSON object for the visit.
+    :param float now: The current epoch. Defaults to the current time.
+    :return: The number of seconds since the visit, or `None` if the visit has no valid date.
+    :rtype: t.Optional[float]
+    """
+    try:
+        date = datetime.fromisoformat(visit['date'].replace('Z', '+00:00'))
+    except (KeyError, AttributeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    current = datetime.now(timezone.utc) if now is None else datetime.fromtimestamp(now, timezone.utc)
+    return (current - date).total_seconds()
+
+
+def _verify_partial(f: t.BinaryIO, verifier: BundleVerifier, chunk_size: int) -> bool:
+    """
+    Verifies the partial download of a bundle, and positions the file at its end.
+
+    :param t.BinaryIO f: The partial file.
+    :param BundleVerifier verifier: A new verifier, which sees the content of the file.
+    :param int chunk_size: The number of bytes to read at a time.
+    :return: Whether the partial download is valid so far.
+    :rtype: bool
+    """
+    f.seek(0)
+    try:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            verifier.update(chunk)
+    except SwhVaultError:
+        return False
+    return True
+
+
+def _check_range(swhid: str, response: StreamedResponse, offset: int,
+                 f: t.BinaryIO) -> t.Tuple[bool, t.Optional[BundleVerifier]]:
+    """
+    Checks whether the server has answered the request for the rest of a bundle with the requested range.
+
+    :param str swhid: The SWHID of the object.
+    :param StreamedResponse response: The response to the download request.
+    :param int offset: The size of the partial file, from which the range has been requested.
+    :param t.BinaryIO f: The partial file, which is emptied if the download should start over.
+    :return: Whether the download is over, and, if so, `None` if the bundle is complete,
+        or a new verifier if the download should start over.
+    :rtype: t.Tuple[bool, t.Optional[BundleVerifier]]
+    :raises SwhVaultError: if the bundle cannot be downloaded.
+    """
+    status = response.status_code
+    start, total = parse_content_range(response.headers.get('Content-Range'))
+    if status == 416 and offset and total == offset:
+        return True, None
+    if status == 416 or (status == 200 and offset) or (status == 206 and start != offset):
+        f.truncate(0)
+        return True, BundleVerifier()
+    if status not in (200, 206):
+        raise SwhVaultError(f'Failed to download the bundle of {swhid} (HTTP status {status}).')
+    return False, None
+
+
+def _write_bundle(response: StreamedResponse, f: t.BinaryIO, verifier: BundleVerifier,
+                  chunk_size: int) -> t.Optional[str]:
+    """
+    Writes the body of a download response to a file, and verifies it.
+
+    :param StreamedResponse response: The response to the download request.
+    :param t.BinaryIO f: The file to write to.
+    :param BundleVerifier verifier: The verifier that sees the body.
+    :param int chunk_size: The number of bytes to read and write at a time.
+    :return: The reason if the download has been interrupted, otherwise `None`.
+    :rtype: t.Optional[str]
+    :raises SwhVaultError: if the bundle is corrupt.
+    """
+    try:
+        for chunk in response.iter_content(chunk_size):
+            f.write(chunk)
+            verifier.update(chunk)
+    except TransportError as te:
+        return str(te)
+    return None
+
+
+def _check_complete(response: StreamedResponse, offset: int, verifier: BundleVerifier) -> t.Optional[str]:
+    """
+    Checks whether a download has received as many bytes as the response has announced.
+
+    :param StreamedResponse response: The response to the download request.
+    :param int offset: The size of the partial file before the download.
+    :param BundleVerifier verifier: The verifier that has seen the bundle.
+    :return: The number of missing bytes as the reason why the download is incomplete, or `None` if it is complete.
+    :rtype: t.Optional[str]
+    """
+    length = _int_header(response.headers, 'Content-Length')
+    expected = offset + length if length is not None else parse_content_range(response.headers.get('Content-Range'))[1]
+    if expected is not None and verifier.size < expected:
+        return f'{expected - verifier.size} bytes missing'
+    return None
+
+
+def _journal_lookup(journal: t.Optional[SaveJournal], origin_url: str, post_only: bool,
+                    freshness: t.Optional[float], now: float) -> t.Tuple[bool, t.Optional[str]]:
+    """
+    Looks up an origin in the journal of a bulk save, to decide whether it must be saved again.
+
+    :param SaveJournal journal: The journal of the bulk save, if any.
+    :param str origin_url: The URL of the origin.
+    :param bool post_only: Whether the URLs are simply posted to the API.
+    :param float freshness: The freshness window in seconds, see :meth:`SwhClient.save_many`.
+    :param float now: The current epoch, as told by the client's clock.
+    :return: Whether the origin should be skipped, and the task id of a save request whose status checks should be
+        resumed, if any.
+    :rtype: t.Tuple[bool, t.Optional[str]]
+    """
+    entry = journal.get(origin_url, _visit_type) if journal is not None else None
+    if entry is None:
+        return False, None
+    if _is_fresh(entry, freshness, now):
+        _log.info(f'Skipping {origin_url}, which has been saved at {entry.completed_at}.')
+        return True, None
+    if entry.resumable:
+        # With post_only, the save request has been posted already
+        return post_only, entry.task_id
+    return False, None
+
+
+def _is_fresh(entry: JournalEntry, freshness: t.Optional[float], now: float) -> bool:
+    """
+    Checks whether a journaled save has succeeded recently enough to be skipped.
+
+    :param JournalEntry entry: The journal entry for the origin.
+    :param float freshness: The freshness window in seconds, or `None` to consider all successful saves fresh.
+    :param float now: The current epoch.
+    :return: Whether the save can be skipped.
+    :rtype: bool
+    """
+    if freshness is None:
+        return entry.outcome == SaveOutcome.SUCCEEDED.value
+    return entry.succeeded_within(freshness, now)
+
+
+def _record_result(journal: SaveJournal, result: BulkSaveResult, poll: Poll):
+    """
+    Records the result of a save in a journal.
+
+    Saves that have failed locally, e.g., because of a timeout or a lost connection, are not recorded as completed,
+    as their save tasks may still complete in the archive.
+
+    :param SaveJournal journal: The journal to record the result in.
+    :param BulkSaveResult result: The result of the save.
+    :param Poll poll: The state of polling for the save.
+    """
+    task_status = (poll.status or {}).get('save_task_status')
+    completed = result.outcome in (SaveOutcome.SUCCEEDED, SaveOutcome.REJECTED) or task_status == 'failed'
+    journal.record_result(result.origin_url, result.outcome.value, poll.status,
+                          str(result.error) if result.error is not None else None, completed, _visit_type)
+
+
+_default_client: t.Optional[SwhClient] = None
+_default_client_lock = threading.Lock()
+
+
+def _get_default_client() -> SwhClient:
+    """
+    Returns the shared client that the module-level functions use, and creates it on first use.
+
+    If the environment variable `PYSWH_RATE_LIMIT_FILE` is set, the default client uses a
+    :py:class:`~pyswh.ratelimit.SharedRateLimiter` with that state file, so that all processes on a host that set
+    the variable to the same path share one rate budget.
+
+    :return: The default client.
+    :rtype: SwhClient
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                state_file = os.environ.get(_ENV_RATE_LIMIT_FILE)
+                rate_limiter = SharedRateLimiter(state_file) if state_file else None
+                _default_client = SwhClient(rate_limiter=rate_limiter)
+    return _default_client
+
+
 def _build_request_url(origin_url: str) -> str:
     """
     Constructs a valid request URL to use with the Software Heritage API from its parts.
@@ -36,151 +1514,348 @@ def _build_request_url(origin_url: str) -> str:
     :return: A valid request URL
     :rtype: str
     """
-    return _prepare_url(_API_ROOT_URL + _API_ENDPOINT_SAVE + _visit_type + _API_URL_PATH + origin_url)
+    return _get_default_client()._build_request_url(origin_url)
 
 
 def _check_rate_limit():
     """
-    Pings the SWH API to receive a response with rate limit information in the header,
-    and triggers a backoff if the rate limit is exceeded, or an HTTP status code 429 (Too many requests) is encountered.
-    :return:
+    Takes one request from the rate budget of the default client, and backs off if the rate limit is exceeded.
     """
-    response = requests.get('https://archive.softwareheritage.org/api/1/ping/')
-    if response.status_code == 429:
-        _log.info('Too many requests! Backing off.')
-        _back_off(response)
-        return
-
-    if int(response.headers['X-RateLimit-Remaining']) > 0:
-        return
-    else:
-        _log.info('Rate limit exceeded. Backing off.')
-        _back_off(response)
+    _get_default_client()._check_rate_limit()
 
 
-def _request(method: _RequestMethod, origin_url: str, auth_token: str) -> requests.Response:
+def _request(method: _RequestMethod, origin_url: str, auth_token: str) -> Response:
     """
-    Makes a rate limit-safe request to the SWH API and returns the :py:class:`requests.Response`.
+    Makes a rate limit-safe request to the SWH API and returns the :py:class:`~pyswh.transport.Response`.
 
     :param _RequestMethod method: The request method to use for the request.
     :param str origin_url: The origin URL to use for construction of the request URL.
     :param str auth_token: An optional SWH auth token.
     :return: The response returned for the request.
-    :rtype: requests.Response
-    """
-    _check_rate_limit()
-    request_url = _build_request_url(origin_url)
-    headers = {'Accept': 'application/json'}
-    if auth_token:
-        _log.debug('Making authenticated requests (authorization token).')
-        headers['Authorization'] = f'Bearer {auth_token}'
-    else:
-        _log.debug('Making anonymous requests.')
-    if method is _RequestMethod.POST:
-        return requests.post(request_url, headers=headers)
-    elif method is _RequestMethod.GET:
-        return requests.get(request_url, headers=headers)
+    :rtype: Response
+    """
+    return _get_default_client()._request(method, origin_url, auth_token)
 
 
-def _init_save(origin_url: str, auth_token: str) -> requests.Response:
+def _init_save(origin_url: str, auth_token: str) -> Response:
     """
     Requests the initial save action in the Software Heritage API.
 
     :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
     :param str auth_token: An optional SWH auth token.
     :return: The response returned for the request.
-    :rtype: requests.Response
+    :rtype: Response
     :raises SwhSaveError: if no connection to the internet exists.
     """
-    """"""
-    try:
-        return _request(_RequestMethod.POST, origin_url, auth_token)
-    except request_exceptions.ConnectionError:
-        raise SwhSaveError('Could not connect to the Software Heritage API. Are you connected to the internet?')
+    return _get_default_client()._init_save(origin_url, auth_token)
 
 
-def _check_save_progress(origin_url: str, auth_token: str, task_id: str):
+def _check_save_progress(origin_url: str, auth_token: str, task_id: str) -> int:
     """
-    Checks on the progress of the save action, and reports its results.
+    Checks on the progress of the save action until it has completed, and reports its results.
 
     :param str origin_url: The URL for the origin source code repository to save in the Software Heritage Archive.
     :param str auth_token: An optional SWH auth token.
     :param str task_id: The task id of the save task, provided by the SWH API.
+    :return: The number of status checks made for the save.
+    :rtype: int
     :raises SwhSaveError: if no connection to the internet exists, or if the save action was unsuccessful.
     """
-    try:
-        response = _request(_RequestMethod.GET, origin_url, auth_token)
-    except request_exceptions.ConnectionError:
-        raise SwhSaveError('Could not connect to the Software Heritage API during progress check. '
-                           'Are you connected to the internet?')
+    return _get_default_client()._check_save_progress(origin_url, auth_token, task_id)
+
 
-    response_json = response.json()
+_json_decoder = json.JSONDecoder()
+_JSON_WHITESPACE = ' \t\n\r'
 
-    if type(response_json) == list:
-        response_json = _get_current_result(response_json, task_id)
 
-    save_status = response_json['save_task_status']
-    if save_status == 'failed':
-        raise SwhSaveError(f'Saving "{origin_url}" has failed with visit status "{response_json["visit_status"]}"!'
-                           f'\nFull response: {response.text}')
-    elif save_status == 'succeeded':
-        _log.info(f'Saving {origin_url} has succeeded with visit status {response_json["visit_status"]}!')
-    else:  # One of not created, not yet scheduled, scheduled
-        _log.info(f'The save task for {origin_url} is {save_status}. '
-                  f'Waiting for 1 sec. before checking the status again.')
-        time.sleep(1)
-        _check_save_progress(origin_url, auth_token, task_id)
+def _skip_json_whitespace(text: str, pos: int) -> int:
+    """
+    Skips JSON whitespace in a text, without copying the text.
+
+    :param str text: The JSON text.
+    :param int pos: The offset to start at.
+    :return: The offset of the next character that is not whitespace, or the length of the text.
+    :rtype: int
+    """
+    length = len(text)
+    while pos < length and text[pos] in _JSON_WHITESPACE:
+        pos += 1
+    return pos
 
 
-def _get_current_result(response_json: t.Any, task_id: str) -> t.Any:
+def _iter_json_array(text: str) -> t.Iterator[t.Tuple[int, t.Any]]:
     """
-    Retrieves the current result from a list of save results that the SWH API returns when `get`ting the save action
-    with the provided task id.
+    Parses the elements of a JSON array one at a time, so that parsing can stop at any element.
 
-    :param t.Any response_json: A list of request results, i.e., JSON objects.
+    :param str text: The JSON text of an array.
+    :return: An iterator over the offset of each element in the text, and the element.
+    :rtype: t.Iterator[t.Tuple[int, t.Any]]
+    :raises ValueError: if the text is not a valid JSON array.
+    """
+    length = len(text)
+    pos = _skip_json_whitespace(text, 0)
+    if pos == length or text[pos] != '[':
+        raise ValueError('Expected a JSON array.')
+    pos = _skip_json_whitespace(text, pos + 1)
+    if pos < length and text[pos] == ']':
+        return
+    while True:
+        start = _skip_json_whitespace(text, pos)
+        obj, pos = _json_decoder.raw_decode(text, start)
+        yield start, obj
+        pos = _skip_json_whitespace(text, pos)
+        if pos < length and text[pos] == ',':
+            pos += 1
+        elif pos < length and text[pos] == ']':
+            return
+        else:
+            raise ValueError(f'Expected "," or "]" at position {pos}.')
+
+
+def _find_current_result(text: str, task_id: str, poll: t.Optional[Poll] = None,
+                         raw: t.Optional[bytes] = None) -> t.Any:
+    """
+    Retrieves the current result from the JSON text of a response of the SWH API for a save request,
+    which is either a single object, or the list of all save requests for the origin.
+
+    The list of save requests grows with the history of the origin, so it is not parsed as a whole. Instead, the
+    JSON object at the offset where the current task has been found in the previous response is tried first, and
+    otherwise the list is parsed one object at a time until the current task has been found.
+
+    :param str text: The JSON text of the response.
     :param str task_id: The identifier of the current save task.
-    :return: The JSON response object for the current task id.
+    :param Poll poll: The state of polling for the save, which remembers the offset of the current task.
+    :param bytes raw: The body of the response to keep in the error if the task cannot be found, if any.
+    :return: The JSON object for the current task id.
     :rtype: t.Any
-    :raises SwhSaveError: if the response with the current task id cannot be found in the list of responses.
+    :raises SwhSaveError: if the object with the current task id cannot be found in the list of objects.
+    :raises ValueError: if the text is not valid JSON.
     """
-    """Returns the object with the provided task id from a list of objects."""
-    for obj in response_json:
+    start = _skip_json_whitespace(text, 0)
+    if text[start:start + 1] != '[':
+        return json.loads(text)
+    obj = _object_at(text, poll.position, task_id) if poll is not None else None
+    if obj is not None:
+        return obj
+    origin_url = poll.origin_url if poll is not None else None
+    for offset, obj in _iter_json_array(text):
         if obj['loading_task_id'] == task_id:
+            if poll is not None:
+                poll.position = offset
             return obj
-    # If we're still here, the task ID could not be found
-    raise SwhSaveError(f'Failed to retrieve the save task for {response_json[0]["origin_url"]}.\n'
-                       f'Full response: {response_json}')
+        origin_url = obj.get('origin_url', origin_url)
+    raise _task_not_found_error(origin_url, raw)
+
+
+def _find_current_results(text: str, tasks: t.Sequence[t.Tuple[str, Poll]]) -> t.Dict[str, t.Any]:
+    """
+    Retrieves the results of several save tasks of the same origin from the JSON text of a status response,
+    like :py:func:`_find_current_result`.
+
+    The offsets of the tasks in the previous response are tried first, and otherwise the list is parsed one object
+    at a time, only until all tasks have been found.
 
+    :param str text: The JSON text of the response.
+    :param t.Sequence[t.Tuple[str, Poll]] tasks: The task id of each save task, and the state of polling for it,
+        which remembers the offset of the task.
+    :return: The JSON object for each task id that has been found.
+    :rtype: t.Dict[str, t.Any]
+    :raises ValueError: if the text is not valid JSON.
+    """
+    start = _skip_json_whitespace(text, 0)
+    if text[start:start + 1] != '[':
+        obj = json.loads(text)
+        return {obj['loading_task_id']: obj}
+    found = {}
+    for task_id, poll in tasks:
+        obj = _object_at(text, poll.position, task_id) if task_id not in found else None
+        if obj is not None:
+            found[task_id] = obj
+    missing = {task_id for task_id, _ in tasks if task_id not in found}
+    if not missing:
+        return found
+    for offset, obj in _iter_json_array(text):
+        task_id = obj['loading_task_id']
+        if task_id in missing:
+            found[task_id] = obj
+            for other_id, poll in tasks:
+                if other_id == task_id:
+                    poll.position = offset
+            missing.discard(task_id)
+            if not missing:
+                break
+    return found
+
+
+def _object_at(text: str, position: t.Optional[int], task_id: str) -> t.Optional[t.Any]:
+    """
+    Parses the JSON object for a save task at the offset where it has been found in a previous response.
+
+    :param str text: The JSON text of the response.
+    :param int position: The offset of the task in the previous response, if any.
+    :param str task_id: The identifier of the save task.
+    :return: The JSON object at the offset, or `None` if there is none, or it is not the object for the task.
+    :rtype: t.Optional[t.Any]
+    """
+    if position is None or text[position:position + 1] != '{':
+        return None
+    try:
+        obj, _ = _json_decoder.raw_decode(text, position)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) and obj.get('loading_task_id') == task_id else None
+
+
+def _task_not_found_error(origin_url: str, raw: t.Optional[bytes] = None) -> SwhSaveError:
+    """
+    Creates the error for a save task that cannot be found in the response for its origin.
 
-def _check_status(response: requests.Response, auth_token: str, task_id: str):
+    :param str origin_url: The URL of the origin that should be saved in the archive.
+    :param bytes raw: The body of the response to keep in the error, if any.
+    :return: The error to raise.
+    :rtype: SwhSaveError
     """
-    Checks the status of the save action as reported by the :py:class:`requests.Response`.
+    return SwhSaveError(f'Failed to retrieve the save task for {origin_url}.', raw=raw)
 
-    :param requests.Response response: The response of the initial save request.
+
+def _with_result(error: SwhSaveError, poll: Poll) -> SwhSaveError:
+    """
+    Attaches the result of a save to an error raised for it, unless the error already carries a result.
+
+    :param SwhSaveError error: The error.
+    :param Poll poll: The state of polling for the save.
+    :return: The error.
+    :rtype: SwhSaveError
+    """
+    if error.result is None:
+        error.result = SaveResult.from_poll(poll, _visit_type)
+    return error
+
+
+def _keep_submitted(poll: Poll, response: t.Any):
+    """
+    Keeps the status of a save request that has been submitted without checking its status in its poll,
+    if the response to the initial save request holds the JSON object for it.
+
+    :param Poll poll: The state of polling for the save.
+    :param response: The response to the initial save request.
+    """
+    try:
+        status = response.json()
+    except ValueError:
+        return
+    if isinstance(status, dict):
+        poll.task_id = status.get('loading_task_id')
+        poll.status = compact_status(status)
+
+
+def _discard(response: t.Union[Response, StreamedResponse]):
+    """
+    Releases the connection of a response that is not returned, if its body has not been read.
+
+    :param response: The response.
+    """
+    if isinstance(response, StreamedResponse):
+        response.close()
+
+
+def _report_request(metrics: Metrics, endpoint: str, method: str, started: float, status: t.Optional[int] = None,
+                    headers: t.Optional[t.Mapping[str, str]] = None, clock: Clock = SYSTEM_CLOCK):
+    """
+    Reports a request to the API to the metrics.
+
+    :param Metrics metrics: The metrics to report to.
+    :param str endpoint: The name of the endpoint.
+    :param str method: The HTTP method.
+    :param float started: The monotonic time at which the request has been started.
+    :param int status: The HTTP status code, or `None` if no response has been received.
+    :param t.Mapping[str, str] headers: The headers of the response, if any.
+    :param Clock clock: The clock that `started` has been taken from.
+    """
+    remaining = _int_header(headers, _HEADER_REMAINING) if headers is not None else None
+    metrics.request(endpoint, method, status, clock.monotonic() - started, remaining)
+
+
+def _raise_for_status_check(origin_url: str, status: int):
+    """
+    Raises an error if the API has not returned the status of a save request.
+
+    :param str origin_url: The URL of the origin that is being saved.
+    :param int status: The HTTP status code of the status response.
+    :raises SwhSaveError: if the status code is not 200.
+    """
+    if status != 200:
+        raise SwhSaveError(f'Failed to check the status of saving {origin_url} (HTTP status {status}).')
+
+
+def _raise_for_init_status(origin_url: str, status: int, raw: t.Optional[bytes] = None):
+    """
+    Raises the error that matches the HTTP status code of an unsuccessful initial save request.
+
+    :param str origin_url: The URL of the origin that should be saved in the archive.
+    :param int status: The HTTP status code of the response to the initial save request.
+    :param bytes raw: The body of the response to keep in the error, if any.
+    :raises SwhSaveError: always.
+    """
+    if status == 400:
+        raise SwhSaveRejectedError(f'An invalid visit type or origin url has been provided.\n'
+                                   f'URL: {origin_url}', raw=raw)
+    elif status == 403:
+        raise SwhSaveRejectedError(f'The provided origin url is blacklisted.'
+                                   f'\nURL: {origin_url}', raw=raw)
+    elif status == 404:
+        raise SwhSaveError(f'No save requests have been found for a given origin.'
+                           f'\nURL: {origin_url}', raw=raw)
+    elif 500 <= status < 600:
+        raise SwhSaveError(f'The Software Heritage API could not handle the request to save {origin_url} '
+                           f'(HTTP status {status}). Please try again later.', raw=raw)
+    else:
+        raise SwhSaveError(f'The status of the API response is unknown. '
+                           f'Please open a new issue reporting this at https://github.com/sdruskat/pyswh/issues. '
+                           f'Status code: {status}', raw=raw)
+
+
+def _rejected_error(origin_url: str, response_json: t.Any, raw: t.Optional[bytes] = None) -> SwhSaveRejectedError:
+    """
+    Creates the error for a save request that has been rejected.
+
+    :param str origin_url: The URL of the origin that should be saved in the archive.
+    :param t.Any response_json: The JSON object for the save request.
+    :param bytes raw: The body of the response to keep in the error, if any.
+    :return: The error to raise.
+    :rtype: SwhSaveRejectedError
+    """
+    return SwhSaveRejectedError(f'The request to save {origin_url} has been rejected:\n'
+                                f'Notes: {response_json.get("note")}', raw=raw)
+
+
+def _failed_error(origin_url: str, response_json: t.Any, raw: t.Optional[bytes] = None) -> SwhSaveError:
+    """
+    Creates the error for a save task that has failed.
+
+    :param str origin_url: The URL of the origin that should be saved in the archive.
+    :param t.Any response_json: The JSON object for the save request.
+    :param bytes raw: The body of the response to keep in the error, if any.
+    :return: The error to raise.
+    :rtype: SwhSaveError
+    """
+    return SwhSaveError(f'Saving "{origin_url}" has failed with visit status "{response_json.get("visit_status")}"!',
+                        raw=raw)
+
+
+def _check_status(response: Response, auth_token: str, task_id: str) -> int:
+    """
+    Checks the status of the save action as reported by the :py:class:`~pyswh.transport.Response`,
+    and then checks on the progress of the save.
+
+    :param Response response: The response of the initial save request.
     :param str auth_token: An optional SWH auth token.
     :param str task_id: The task id of the current save task.
+    :return: The number of status checks made for the save.
+    :rtype: int
     :raises SwhSaveError: if the save request has been rejected.
     """
-
-    # First, check the overall requests status (accepted, rejected, pending)
-    response_json = response.json()
-    if type(response_json) == list:
-        response_json = _get_current_result(response_json, task_id)
-    origin_url = response_json['origin_url']
-    request_status = response_json['save_request_status']
-    if request_status == 'pending':
-        # Wait
-        _log.info(f'The request to save {origin_url} is still pending. '
-                  f'Waiting for 1 sec. before checking the status again.')
-        time.sleep(1)
-        retry_response = _request(_RequestMethod.GET, origin_url, auth_token)
-        _check_status(retry_response, auth_token, task_id)
-    elif request_status == 'rejected':
-        raise SwhSaveError(f'The request to save {origin_url} has been rejected:\n'
-                           f'Notes: {response_json["note"]}\nFull response: {response.content}')
-
-    # Request status is accepted, check for save progress
-    _check_save_progress(origin_url, auth_token, task_id)
+    return _get_default_client()._check_status(response, auth_token, task_id)
 
 
 def _prepare_url(origin_url: str) -> str:
@@ -197,57 +1872,169 @@ def _prepare_url(origin_url: str) -> str:
         return origin_url + '/'
 
 
-def _back_off(response: requests.Response):
-    """
-    Backs off from making further API calls for the amount of time that is the difference between
-    the current epoch and the epoch when the rate limit will be reset.
-
-    :param requests.Response response: The response from which to extract the rate limit reset time.
-    """
-    reset_time = int(response.headers['X-RateLimit-Reset'])
-    now_time = int(time.time())
-    sleep_time = reset_time - now_time + 2
-    _log.info(f'Rate limit exceeded. Waiting {sleep_time} seconds before retrying.')
-    time.sleep(sleep_time)  # Wait until the reset time, and an extra 2 seconds to be on the safe side.
-
-
-def save(origin_url: str, post_only: bool, auth_token: str):
+def save(origin_url: str, post_only: bool, auth_token: AuthToken, min_age: t.Optional[float] = None) -> SaveResult:
     """
     Attempts to save code in the Software Heritage Archive.
 
-    This method wraps the `/api/1/origin/save/ <https://archive.softwareheritage.org/1/origin/save/doc/>`_ endpoint.
+    This method wraps the `/api/1/origin/save/ <https://archive.softwareheritage.org/1/origin/save/doc/>`_ endpoint,
+    using a shared default :py:class:`SwhClient`. Create your own :py:class:`SwhClient` to configure the connection
+    pool, timeouts, or the API root URL.
 
     :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
     :param bool post_only: Whether the URL should simply be posted to the API and return,
         without checking for the success of the save operation.
-    :param str auth_token: An optional Software Heritage API authentication token.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param float min_age: The minimum age in seconds of the latest visit of the origin for it to be saved again,
+        or `None` to always save it. See :meth:`SwhClient.save`.
+    :return: The result of the save.
+    :rtype: SaveResult
     :raises SwhSaveError: if an error occurred during the save task, or if the save task was unsuccessful.
     """
-    if post_only:
-        _init_save(origin_url, auth_token)
-    else:
-        init_response = _init_save(origin_url, auth_token)
-        status = init_response.status_code
-        if status == 200:
-            # The API promises exactly one object as content of the POST response, so we can safely get the task ID
-            task_id = init_response.json()['loading_task_id']
-            _check_status(init_response, auth_token, task_id)
-        elif status == 400:
-            raise SwhSaveError(f'An invalid visit type or origin url has been provided.\n'
-                               f'URL: {origin_url}\n'
-                               f'{init_response.content}')
-        elif status == 403:
-            raise SwhSaveError(f'The provided origin url is blacklisted.'
-                               f'\nURL: {origin_url}'
-                               f'\n{init_response.content}')
-        elif status == 404:
-            raise SwhSaveError(f'No save requests have been found for a given origin.'
-                               f'\nURL: {origin_url}'
-                               f'\n{init_response.content}')
-        elif status == 429:  # Too many requests
-            _back_off(init_response)
-            save(origin_url, False, auth_token)
-        else:
-            raise SwhSaveError(f'The status of the API response is unknown. '
-                               f'Please open a new issue reporting this at https://github.com/sdruskat/pyswh/issues. '
-                               f'Status code: {status}')
+    return _get_default_client().save(origin_url, post_only, auth_token, min_age)
+
+
+def submit(origin_url: str, auth_token: AuthToken = None) -> 'SaveHandle':
+    """
+    Submits a request to save code in the Software Heritage Archive, using the shared default :py:class:`SwhClient`,
+    and returns without waiting for the save. See :meth:`SwhClient.submit`.
+
+    :param str origin_url: The URL of the origin (source code repository) that should be saved in the archive.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :return: A handle for the submitted save.
+    :rtype: SaveHandle
+    :raises SwhSaveError: if the save request could not be submitted, or has been rejected.
+    """
+    return _get_default_client().submit(origin_url, auth_token)
+
+
+def save_many(origins: t.Iterable[str], auth_token: AuthToken = None, max_workers: int = _DEFAULT_MAX_WORKERS,
+              post_only: bool = False, journal: t.Optional[SaveJournal] = None,
+              freshness: t.Optional[float] = None, min_age: t.Optional[float] = None,
+              dedupe: bool = False) -> t.Iterator[BulkSaveResult]:
+    """
+    Attempts to save many origins in the Software Heritage Archive concurrently, using the shared default
+    :py:class:`SwhClient`. See :meth:`SwhClient.save_many`.
+
+    :param t.Iterable[str] origins: The URLs of the origins that should be saved in the archive.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int max_workers: The maximum number of origins to save at the same time.
+    :param bool post_only: Whether the URLs should simply be posted to the API,
+        without checking for the success of the save operations.
+    :param SaveJournal journal: An optional journal to record the saves in, and to resume them from.
+    :param float freshness: The number of seconds for which a journaled successful save is considered fresh,
+        or `None` to save all origins that have not been saved before.
+    :param float min_age: The minimum age in seconds of the latest visit of an origin for it to be saved again,
+        or `None` to always save it.
+    :param bool dedupe: Whether to save equivalent origin URLs only once.
+    :return: An iterator over the results of the saves, in the order in which they complete.
+    :rtype: t.Iterator[BulkSaveResult]
+    """
+    return _get_default_client().save_many(origins, auth_token, max_workers, post_only, journal, freshness, min_age,
+                                           dedupe)
+
+
+def known(swhids: t.Iterable[str], auth_token: AuthToken = None, batch_size: int = KNOWN_MAX_BATCH_SIZE,
+          max_workers: int = _DEFAULT_KNOWN_WORKERS) -> SwhidBitmap:
+    """
+    Checks which of many SWHIDs are known to the archive, using the shared default :py:class:`SwhClient`.
+    See :meth:`SwhClient.known`.
+
+    :param t.Iterable[str] swhids: The core SWHIDs to check, such as `swh:1:rev:<sha1_git>`.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int batch_size: The number of SWHIDs to check per request,
+        at most :py:data:`~pyswh.known.KNOWN_MAX_BATCH_SIZE`.
+    :param int max_workers: The maximum number of requests in flight at the same time.
+    :return: Whether each SWHID is known, by its index in `swhids`.
+    :rtype: SwhidBitmap
+    :raises ValueError: if a SWHID is invalid, or the batch size is out of range.
+    :raises SwhSaveError: if no connection to the internet exists, or if the API has not answered a request.
+    """
+    return _get_default_client().known(swhids, auth_token, batch_size, max_workers)
+
+
+def fetch(swhid: str, path: str, bundle_type: t.Optional[str] = None, auth_token: AuthToken = None,
+          polling: t.Optional[PollingStrategy] = None) -> int:
+    """
+    Cooks a bundle of an archived object in the Software Heritage Vault and downloads it to a file, using the shared
+    default :py:class:`SwhClient`. See :meth:`SwhClient.fetch`.
+
+    :param str swhid: The core SWHID of the object, a directory or a revision.
+    :param str path: The path to write the bundle to.
+    :param str bundle_type: The type of the bundle, or `None` for `flat` for directories and `gitfast` for revisions.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param PollingStrategy polling: The strategy for polling the status of cooking.
+    :return: The size of the bundle in bytes.
+    :rtype: int
+    :raises ValueError: if the SWHID is invalid, or the object cannot be cooked into a bundle of the type.
+    :raises SwhVaultError: if the bundle cannot be cooked or downloaded, or is corrupt.
+    """
+    return _get_default_client().fetch(swhid, path, bundle_type, auth_token, polling)
+
+
+def fetch_many(bundles: t.Iterable[t.Tuple[str, str]], auth_token: AuthToken = None,
+               max_workers: int = _DEFAULT_VAULT_WORKERS, bundle_type: t.Optional[str] = None,
+               polling: t.Optional[PollingStrategy] = None) -> t.Iterator[VaultResult]:
+    """
+    Cooks and downloads many bundles concurrently, using the shared default :py:class:`SwhClient`.
+    See :meth:`SwhClient.fetch_many`.
+
+    :param bundles: The SWHID of each object, and the path to write its bundle to.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int max_workers: The maximum number of bundles to fetch at the same time.
+    :param str bundle_type: The type of the bundles, or `None` for the default type of each object.
+    :param PollingStrategy polling: The strategy for polling the status of cooking.
+    :return: An iterator over the results, in the order in which they complete.
+    :rtype: t.Iterator[VaultResult]
+    """
+    return _get_default_client().fetch_many(bundles, auth_token, max_workers, bundle_type, polling)
+
+
+def iter_visits(origin_url: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                prefetch: bool = True) -> t.Iterator[t.Dict[str, t.Any]]:
+    """
+    Iterates over the visits of an origin, newest first, using the shared default :py:class:`SwhClient`.
+    See :meth:`SwhClient.iter_visits`.
+
+    :param str origin_url: The URL of the origin.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int per_page: The number of visits to request per page.
+    :param bool prefetch: Whether to request the next page in the background.
+    :return: An iterator over the JSON objects for the visits.
+    :rtype: t.Iterator[t.Dict[str, t.Any]]
+    :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved.
+    """
+    return _get_default_client().iter_visits(origin_url, auth_token, per_page, prefetch)
+
+
+def iter_snapshot_branches(snapshot: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                           prefetch: bool = True) -> t.Iterator[t.Tuple[str, t.Optional[t.Dict[str, t.Any]]]]:
+    """
+    Iterates over the branches of a snapshot, using the shared default :py:class:`SwhClient`.
+    See :meth:`SwhClient.iter_snapshot_branches`.
+
+    :param str snapshot: The SWHID or the hex identifier of the snapshot.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int per_page: The number of branches to request per page.
+    :param bool prefetch: Whether to request the next page in the background.
+    :return: An iterator over the name of each branch and its target.
+    :rtype: t.Iterator[t.Tuple[str, t.Optional[t.Dict[str, t.Any]]]]
+    :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved.
+    """
+    return _get_default_client().iter_snapshot_branches(snapshot, auth_token, per_page, prefetch)
+
+
+def search_origins(query: str, auth_token: AuthToken = None, per_page: int = _DEFAULT_PAGE_SIZE,
+                   prefetch: bool = True) -> t.Iterator[t.Dict[str, t.Any]]:
+    """
+    Iterates over the origins whose URLs match a query, using the shared default :py:class:`SwhClient`.
+    See :meth:`SwhClient.search_origins`.
+
+    :param str query: The words to search for in origin URLs.
+    :param auth_token: An optional Software Heritage API authentication token, or a pool of tokens.
+    :param int per_page: The number of origins to request per page.
+    :param bool prefetch: Whether to request the next page in the background.
+    :return: An iterator over the JSON objects for the origins.
+    :rtype: t.Iterator[t.Dict[str, t.Any]]
+    :raises SwhSaveError: if no connection to the internet exists, or if a page cannot be retrieved.
+    """
+    return _get_default_client().search_origins(query, auth_token, per_page, prefetch)
@@ -0,0 +1,344 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import hashlib
+import json
+import logging
+import mmap
+import os
+import stat
+import typing as t
+
+DEFAULT_EXCLUDE = ('.git',)
+"""The names of the directories that are not part of a checkout by default."""
+
+_MODE_FILE = b'100644'
+_MODE_EXECUTABLE = b'100755'
+_MODE_SYMLINK = b'120000'
+_MODE_DIRECTORY = b'40000'
+_MIN_POOL_FILES = 256  # fewer files are hashed in-process, as starting the pool would take longer
+_MAX_CHUNKSIZE = 256
+
+_log = logging.getLogger(__name__)
+
+
+def _object_id(object_type: bytes, manifest: bytes) -> bytes:
+    """
+    Computes the intrinsic identifier of an object, i.e., the git hash of its manifest.
+
+    :param bytes object_type: The git object type, e.g., `tree`.
+    :param bytes manifest: The manifest of the object.
+    :return: The SHA1 digest.
+    :rtype: bytes
+    """
+    return hashlib.sha1(b'%s %d\0%s' % (object_type, len(manifest), manifest)).digest()
+
+
+def _hash_file(path: str) -> bytes:
+    """
+    Computes the intrinsic identifier of the content of a file, reading the file through a memory map.
+
+    :param str path: The path of the file.
+    :return: The SHA1 digest of the file as a git blob.
+    :rtype: bytes
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        sha1 = hashlib.sha1(b'blob %d\0' % size)
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sha1.update(data)
+    return sha1.digest()
+
+
+def content_swhid(path: t.Union[str, os.PathLike]) -> str:
+    """
+    Computes the SWHID of the content of a file.
+
+    :param path: The path of the file.
+    :return: The SWHID, e.g., `swh:1:cnt:e69de29bb2d1d6434b8b29ae775ad8c2e48c5391` for an empty file.
+    :rtype: str
+    """
+    return f'swh:1:cnt:{_hash_file(os.fspath(path)).hex()}'
+
+
+class ContentCache:
+    """
+    A cache of the content hashes of the files in a checkout, so that files which have not changed since the last run
+    are not read again.
+
+    A file is considered unchanged if its inode, modification time and size are the same. Entries are keyed by the
+    path of the file relative to the root of the checkout, so a cache belongs to one checkout. If a `path` is given,
+    the cache is loaded from that JSON file, if it exists, and written back to it by :meth:`save`.
+
+    :param str path: The path of an optional JSON file to persist the cache in.
+    """
+
+    def __init__(self, path: t.Optional[str] = None):
+        self.path = path
+        self._entries: t.Dict[str, t.Tuple[int, int, int, str]] = {}
+        if path is not None and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str, st: os.stat_result) -> t.Optional[bytes]:
+        """
+        Looks up the content hash of a file.
+
+        :param str key: The path of the file relative to the root of the checkout.
+        :param os.stat_result st: The current status of the file.
+        :return: The SHA1 digest, or `None` if the file is not cached or has changed.
+        :rtype: t.Optional[bytes]
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[:3] != (st.st_ino, st.st_mtime_ns, st.st_size):
+            return None
+        return bytes.fromhex(entry[3])
+
+    def put(self, key: str, st: os.stat_result, digest: bytes):
+        """
+        Stores the content hash of a file.
+
+        :param str key: The path of the file relative to the root of the checkout.
+        :param os.stat_result st: The status of the file when it has been hashed.
+        :param bytes digest: The SHA1 digest.
+        """
+        self._entries[key] = (st.st_ino, st.st_mtime_ns, st.st_size, digest.hex())
+
+    def retain(self, keys: t.Container[str]):
+        """
+        Removes the entries of files that no longer exist.
+
+        :param t.Container[str] keys: The paths of the files that exist, relative to the root of the checkout.
+        """
+        self._entries = {key: entry for key, entry in self._entries.items() if key in keys}
+
+    def save(self):
+        """
+        Writes the entries to the cache's file, if it has a path.
+        """
+        if self.path is None:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self, path: str):
+        """
+        Loads the entries from a file written by :meth:`save`.
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+            self._entries = {key: tuple(entry) for key, entry in entries.items()}
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            _log.warning(f'Could not load the content cache from {path}: {e}')
+
+
+class _Directory:
+    """
+    A directory of a checkout that has been scanned, with the entries that still need a hash.
+    """
+    __slots__ = ('key', 'entries')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.entries: t.List[t.List[t.Any]] = []  # [name, mode, digest or child key]
+
+
+def _join(key: str, name: str) -> str:
+    return f'{key}/{name}' if key else name
+
+
+def _scan(root: str, exclude: t.Container[str], cache: t.Optional[ContentCache],
+          missing: t.List[t.Tuple[str, str, os.stat_result, t.List[t.Any]]]) -> t.List[_Directory]:
+    """
+    Scans a checkout, and hashes the symbolic links and the files that are cached.
+
+    :param str root: The path of the checkout.
+    :param t.Container[str] exclude: The names of directories to leave out.
+    :param ContentCache cache: An optional content cache.
+    :param missing: The list to append each file that must be read to, as its path, key, status and entry.
+    :return: The directories in pre-order, so that each directory comes before its subdirectories.
+    :rtype: t.List[_Directory]
+    """
+    directories = []
+    stack = [(root, '')]
+    while stack:
+        path, key = stack.pop()
+        directory = _Directory(key)
+        directories.append(directory)
+        with os.scandir(path) as it:
+            for entry in it:
+                name = os.fsencode(entry.name)
+                entry_key = _join(key, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in exclude:
+                        continue
+                    directory.entries.append([name, _MODE_DIRECTORY, entry_key])
+                    stack.append((entry.path, entry_key))
+                elif entry.is_symlink():
+                    target = os.fsencode(os.readlink(entry.path))
+                    directory.entries.append([name, _MODE_SYMLINK, _object_id(b'blob', target)])
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    # Like git, only the executable bit of the owner counts
+                    mode = _MODE_EXECUTABLE if st.st_mode & stat.S_IXUSR else _MODE_FILE
+                    digest = cache.lookup(entry_key, st) if cache is not None else None
+                    item = [name, mode, digest]
+                    directory.entries.append(item)
+                    if digest is None:
+                        missing.append((entry.path, entry_key, st, item))
+                else:
+                    _log.debug(f'Skipping {entry.path}, which is neither a file, a directory nor a symbolic link.')
+    return directories
+
+
+def _hash_files(paths: t.List[str], max_workers: t.Optional[int]) -> t.Iterator[bytes]:
+    """
+    Hashes files, on a process pool if there are many of them.
+
+    :param t.List[str] paths: The paths of the files.
+    :param int max_workers: The maximum number of processes, or `None` for the number of CPUs.
+    :return: An iterator over the SHA1 digests of the files, in order.
+    :rtype: t.Iterator[bytes]
+    """
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    if workers <= 1 or len(paths) < _MIN_POOL_FILES:
+        yield from map(_hash_file, paths)
+        return
+    chunksize = max(1, min(_MAX_CHUNKSIZE, len(paths) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_hash_file, paths, chunksize=chunksize)
+
+
+def _sort_key(entry: t.List[t.Any]) -> bytes:
+    # Git sorts directories as if their names ended with a slash
+    return entry[0] + b'/' if entry[1] == _MODE_DIRECTORY else entry[0]
+
+
+def iter_swhids(root: t.Union[str, os.PathLike], exclude: t.Container[str] = DEFAULT_EXCLUDE,
+                cache: t.Optional[ContentCache] = None,
+                max_workers: t.Optional[int] = None) -> t.Iterator[t.Tuple[str, str]]:
+    """
+    Computes the SWHIDs of all files and directories in a checkout.
+
+    The checkout is scanned first. The contents of files that are not in the `cache`, or have changed, are then read
+    through memory maps on a pool of `max_workers` processes, and the manifests of the directories are built bottom-up
+    from the hashes of their entries, as in the git tree format. Symbolic links are hashed as contents holding the
+    link target. Empty directories are part of the checkout, other special files are skipped.
+    Afterwards, the cache holds the hashes of all files of the checkout, and is written to its file.
+
+    :param root: The path of the checkout.
+    :param t.Container[str] exclude: The names of directories to leave out, by default `.git`.
+    :param ContentCache cache: An optional cache of the content hashes from a previous run.
+    :param int max_workers: The maximum number of processes to hash files on, or `None` for the number of CPUs.
+    :return: An iterator over the path of each file and directory relative to `root`, with `/` as separator,
+        and its SWHID. Directories come after their entries, and the checkout itself comes last, with the path `''`.
+    :rtype: t.Iterator[t.Tuple[str, str]]
+    """
+    missing: t.List[t.Tuple[str, str, os.stat_result, t.List[t.Any]]] = []
+    directories = _scan(os.fspath(root), exclude, cache, missing)
+    digests = _hash_files([path for path, _, _, _ in missing], max_workers)
+    for (_, key, st, item), digest in zip(missing, digests):
+        item[2] = digest
+        if cache is not None:
+            cache.put(key, st, digest)
+    if cache is not None:
+        cache.retain({_join(directory.key, os.fsdecode(entry[0]))
+                      for directory in directories for entry in directory.entries if entry[1] != _MODE_DIRECTORY})
+        cache.save()
+    tree_ids: t.Dict[str, bytes] = {}
+    for directory in reversed(directories):
+        manifest = bytearray()
+        for name, mode, digest in sorted(directory.entries, key=_sort_key):
+            if mode == _MODE_DIRECTORY:
+                digest = tree_ids.pop(digest)
+            else:
+                yield _join(directory.key, os.fsdecode(name)), f'swh:1:cnt:{digest.hex()}'
+            manifest += b'%s %s\0%s' % (mode, name, digest)
+        tree_ids[directory.key] = tree_id = _object_id(b'tree', bytes(manifest))
+        yield directory.key, f'swh:1:dir:{tree_id.hex()}'
+
+
+def directory_swhid(root: t.Union[str, os.PathLike], exclude: t.Container[str] = DEFAULT_EXCLUDE,
+                    cache: t.Optional[ContentCache] = None, max_workers: t.Optional[int] = None) -> str:
+    """
+    Computes the SWHID of a checkout as a directory. See :func:`iter_swhids`.
+
+    :param root: The path of the checkout.
+    :param t.Container[str] exclude: The names of directories to leave out, by default `.git`.
+    :param ContentCache cache: An optional cache of the content hashes from a previous run.
+    :param int max_workers: The maximum number of processes to hash files on, or `None` for the number of CPUs.
+    :return: The SWHID, e.g., `swh:1:dir:4b825dc642cb6eb9a060e54bf8d69288fbee4904` for an empty directory.
+    :rtype: str
+    """
+    swhid = None
+    for _, swhid in iter_swhids(root, exclude, cache, max_workers):
+        pass
+    return swhid
+
+
+def _format_person(person: str, date: datetime) -> bytes:
+    """
+    Formats an author or committer line of a revision manifest.
+
+    :param str person: The name and email address, e.g., `Jane Doe <jane@example.org>`.
+    :param datetime date: The timezone-aware date.
+    :return: The line without its keyword.
+    :rtype: bytes
+    """
+    if date.tzinfo is None:
+        raise ValueError(f'The date of {person} must be timezone-aware.')
+    minutes = int(date.utcoffset().total_seconds()) // 60
+    offset = b'%s%02d%02d' % (b'-' if minutes < 0 else b'+', abs(minutes) // 60, abs(minutes) % 60)
+    return b'%s %d %s' % (person.encode('utf-8'), int(date.timestamp()), offset)
+
+
+def revision_swhid(directory: str, author: str, author_date: datetime, message: str,
+                   parents: t.Sequence[str] = (), committer: t.Optional[str] = None,
+                   committer_date: t.Optional[datetime] = None) -> str:
+    """
+    Computes the SWHID of a revision, which is the identifier of the equivalent git commit.
+
+    :param str directory: The SWHID or the hex hash of the directory of the revision.
+    :param str author: The name and email address of the author, e.g., `Jane Doe <jane@example.org>`.
+    :param datetime author_date: The timezone-aware date of authorship.
+    :param str message: The message of the revision.
+    :param t.Sequence[str] parents: The SWHIDs or hex hashes of the parent revisions.
+    :param str committer: The name and email address of the committer, by default the author.
+    :param datetime committer_date: The timezone-aware date of the commit, by default the date of authorship.
+    :return: The SWHID of the revision.
+    :rtype: str
+    :raises ValueError: if a date is not timezone-aware.
+    """
+    lines = [b'tree %s' % directory.rsplit(':', 1)[-1].encode('ascii')]
+    lines += [b'parent %s' % parent.rsplit(':', 1)[-1].encode('ascii') for parent in parents]
+    lines.append(b'author %s' % _format_person(author, author_date))
+    lines.append(b'committer %s' % _format_person(committer or author,
+                                                  committer_date if committer_date is not None else author_date))
+    manifest = b'\n'.join(lines) + b'\n\n' + message.encode('utf-8')
+    return f'swh:1:rev:{_object_id(b"commit", manifest).hex()}'
+
+
+def identify(path: t.Union[str, os.PathLike], exclude: t.Container[str] = DEFAULT_EXCLUDE,
+             cache: t.Optional[ContentCache] = None, max_workers: t.Optional[int] = None) -> str:
+    """
+    Computes the SWHID of a file or a directory.
+
+    :param path: The path of the file or directory.
+    :param t.Container[str] exclude: The names of directories to leave out, by default `.git`.
+    :param ContentCache cache: An optional cache of the content hashes from a previous run, for directories.
+    :param int max_workers: The maximum number of processes to hash files on, or `None` for the number of CPUs.
+    :return: The SWHID of the content of the file, or of the directory.
+    :rtype: str
+    """
+    if stat.S_ISDIR(os.stat(path).st_mode):
+        return directory_swhid(path, exclude, cache, max_workers)
+    return content_swhid(path)
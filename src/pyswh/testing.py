@@ -0,0 +1,357 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import threading
+import time
+import typing as t
+from urllib.parse import unquote
+
+_API_PREFIX = '/api/1/'
+_SAVE_PREFIX = _API_PREFIX + 'origin/save/'
+_ORIGIN_PREFIX = _API_PREFIX + 'origin/'
+_LATEST_VISIT_SUFFIX = '/visit/latest/'
+_KNOWN_MAX_BATCH_SIZE = 1000
+
+
+class _SaveRequest:
+    """
+    A save request held by a :py:class:`MockSwhServer`.
+    """
+    __slots__ = ('id', 'task_id', 'origin_url', 'visit_type', 'created', 'rejected', 'fails')
+
+    def __init__(self, request_id: int, task_id: int, origin_url: str, visit_type: str, created: float,
+                 rejected: bool, fails: bool):
+        self.id = request_id
+        self.task_id = task_id
+        self.origin_url = origin_url
+        self.visit_type = visit_type
+        self.created = created
+        self.rejected = rejected
+        self.fails = fails
+
+
+class MockSwhServer:
+    """
+    An in-process stand-in for the save, status, ping, latest visit and known endpoints of the Software Heritage API,
+    to test and benchmark pyswh without touching the real archive.
+
+    The server listens on a local port in a background thread, so that it can be used by the synchronous and the
+    asynchronous clients alike, by passing :py:attr:`api_root_url` to them.
+
+    Save requests go through the same states as in the real API: a request is `pending` for `pending_delay` seconds
+    before it is `accepted`, and its save task is `not yet scheduled` for `schedule_delay` seconds, `scheduled` for
+    `run_delay` seconds, `running` for `visit_delay` seconds, and then `succeeded`. Every response carries
+    `X-RateLimit-*` headers for a budget of `rate_limit` requests per `window` seconds; requests beyond the budget are
+    answered with HTTP status 429. Failures can be injected at random with the given rates: rejected save requests,
+    failed save tasks, server errors (HTTP 502), and spurious 429 responses. The known endpoint reports the SWHIDs in
+    `known` as archived, and refuses batches of more than 1000 SWHIDs like the real API.
+
+    :param float pending_delay: Seconds for which a save request is pending.
+    :param float schedule_delay: Seconds until a save task is scheduled.
+    :param float run_delay: Seconds until a scheduled save task runs.
+    :param float visit_delay: Seconds for which a save task runs.
+    :param int rate_limit: The number of requests allowed per window.
+    :param float window: The length of a rate limit window in seconds.
+    :param float reject_rate: The fraction of save requests that are rejected.
+    :param float failure_rate: The fraction of save tasks that fail.
+    :param float error_rate: The fraction of requests that are answered with HTTP status 502.
+    :param float throttle_rate: The fraction of requests that are answered with HTTP status 429 within the budget.
+    :param float latency: Seconds to wait before answering each request.
+    :param int seed: The seed for the random failures.
+    :param t.Iterable[str] known: The SWHIDs of the objects in the archive.
+    """
+
+    def __init__(self,
+                 pending_delay: float = 0.0,
+                 schedule_delay: float = 0.0,
+                 run_delay: float = 0.0,
+                 visit_delay: float = 0.0,
+                 rate_limit: int = 1_000_000,
+                 window: float = 3600.0,
+                 reject_rate: float = 0.0,
+                 failure_rate: float = 0.0,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 latency: float = 0.0,
+                 seed: t.Optional[int] = None,
+                 known: t.Iterable[str] = ()):
+        self.pending_delay = pending_delay
+        self.schedule_delay = schedule_delay
+        self.run_delay = run_delay
+        self.visit_delay = visit_delay
+        self.rate_limit = rate_limit
+        self.window = window
+        self.reject_rate = reject_rate
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.latency = latency
+        self.known = set(known)
+        """The SWHIDs of the objects in the archive."""
+        self.requests: t.Counter[str] = Counter()
+        """The number of requests the server has received, by endpoint (`ping`, `save`, `status`, `visit` and
+        `known`)."""
+        self.throttled = 0
+        """The number of requests that have been answered with HTTP status 429."""
+        self._random = random.Random(seed)
+        self._saves: t.Dict[str, t.List[_SaveRequest]] = {}
+        self._ids = itertools.count(1)
+        self._window_start = time.time()
+        self._used = 0
+        self._lock = threading.Lock()
+        self._server: t.Optional[ThreadingHTTPServer] = None
+        self._thread: t.Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'MockSwhServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def api_root_url(self) -> str:
+        """
+        The root URL of the mock API, to pass to a client.
+        """
+        if self._server is None:
+            raise RuntimeError('The mock server has not been started.')
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{_API_PREFIX}'
+
+    @property
+    def total_requests(self) -> int:
+        """
+        The number of requests the server has received.
+        """
+        return sum(self.requests.values())
+
+    def start(self):
+        """
+        Starts serving on a free local port.
+        """
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pyswh-mock-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _rate_limit_headers(self, count: bool = True) -> t.Tuple[bool, t.Dict[str, str]]:
+        """
+        Takes one request from the rate budget.
+
+        :param bool count: Whether the request counts against the budget.
+        :return: Whether the request is within the budget, and the rate limit headers for its response.
+        :rtype: t.Tuple[bool, t.Dict[str, str]]
+        """
+        with self._lock:
+            now = time.time()
+            if now >= self._window_start + self.window:
+                self._window_start = now
+                self._used = 0
+            allowed = self._used < self.rate_limit
+            if allowed and count:
+                self._used += 1
+            headers = {'X-RateLimit-Limit': str(self.rate_limit),
+                       'X-RateLimit-Remaining': str(max(self.rate_limit - self._used, 0)),
+                       'X-RateLimit-Reset': str(int(self._window_start + self.window))}
+        return allowed, headers
+
+    def _status(self, request: _SaveRequest, now: float) -> t.Dict[str, t.Any]:
+        """
+        Computes the current state of a save request as a JSON object.
+        """
+        age = now - request.created
+        visit_status = None
+        if request.rejected:
+            request_status, task_status = 'rejected', 'not created'
+        elif age < self.pending_delay:
+            request_status, task_status = 'pending', 'not created'
+        else:
+            request_status = 'accepted'
+            age -= self.pending_delay
+            if age < self.schedule_delay:
+                task_status = 'not yet scheduled'
+            elif age < self.schedule_delay + self.run_delay:
+                task_status = 'scheduled'
+            elif age < self.schedule_delay + self.run_delay + self.visit_delay:
+                task_status = 'running'
+                visit_status = 'created'
+            elif request.fails:
+                task_status, visit_status = 'failed', 'failed'
+            else:
+                task_status, visit_status = 'succeeded', 'full'
+        return {'id': request.id,
+                'origin_url': request.origin_url,
+                'visit_type': request.visit_type,
+                'save_request_date': _isoformat(request.created),
+                'save_request_status': request_status,
+                'save_task_status': task_status,
+                'visit_status': visit_status,
+                'visit_date': _isoformat(now) if visit_status in ('full', 'failed') else None,
+                'loading_task_id': request.task_id if not request.rejected else None,
+                'note': 'The origin is blocked.' if request.rejected else None}
+
+    def _save(self, visit_type: str, origin_url: str) -> t.Dict[str, t.Any]:
+        """
+        Creates a save request.
+        """
+        with self._lock:
+            request_id = next(self._ids)
+            request = _SaveRequest(request_id, request_id, origin_url, visit_type, time.time(),
+                                   self._random.random() < self.reject_rate,
+                                   self._random.random() < self.failure_rate)
+            self._saves.setdefault(origin_url, []).insert(0, request)
+        return self._status(request, request.created)
+
+    def _history(self, origin_url: str) -> t.Optional[t.List[t.Dict[str, t.Any]]]:
+        """
+        Lists the save requests for an origin, newest first.
+        """
+        with self._lock:
+            requests = list(self._saves.get(origin_url, ()))
+        if not requests:
+            return None
+        now = time.time()
+        return [self._status(request, now) for request in requests]
+
+    def _latest_visit(self, origin_url: str) -> t.Optional[t.Dict[str, t.Any]]:
+        """
+        Finds the latest successful visit of an origin.
+        """
+        for status in self._history(origin_url) or ():
+            if status['visit_status'] == 'full':
+                return {'origin': origin_url, 'visit': status['id'], 'date': status['visit_date'],
+                        'status': 'full', 'type': status['visit_type'], 'snapshot': None}
+        return None
+
+
+def _isoformat(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _strip_slash(origin_url: str) -> str:
+    # The client appends a slash to origin URLs
+    return origin_url[:-1] if origin_url.endswith('/') else origin_url
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Handles the requests to a :py:class:`MockSwhServer`.
+    """
+    mock: MockSwhServer
+    protocol_version = 'HTTP/1.1'  # Keep connections alive
+    disable_nagle_algorithm = True  # Do not delay the body, which is written after the headers
+    _ROUTES = {'ping': '_ping', 'known': '_known', 'visit': '_visit', 'save': '_save_request', 'status': '_status'}
+    """The names of the methods that answer the requests to each endpoint."""
+
+    def log_message(self, format, *args):
+        pass  # Keep the output of tests and benchmarks clean
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method: str):
+        mock = self.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = self.rfile.read(length) if length else b''
+        path = self.path.split('?', 1)[0]
+        endpoint = self._endpoint(method, path)
+        if endpoint is None:
+            self._send(404, {'exception': 'NotFoundExc', 'reason': f'{path} not found'}, {})
+            return
+        mock.requests[endpoint] += 1
+        if mock.latency:
+            time.sleep(mock.latency)
+        allowed, headers = mock._rate_limit_headers(count=endpoint != 'ping')
+        if not allowed or mock._random.random() < mock.throttle_rate:
+            with mock._lock:
+                mock.throttled += 1
+            self._send(429, {'exception': 'Throttled', 'reason': 'Request was throttled.'}, headers)
+            return
+        if endpoint != 'ping' and mock._random.random() < mock.error_rate:
+            self._send(502, {'exception': 'BadGateway', 'reason': 'Injected failure.'}, headers)
+            return
+        getattr(self, self._ROUTES[endpoint])(path, payload, headers)
+
+    def _ping(self, path: str, payload: bytes, headers: t.Mapping[str, str]):
+        self._send(200, 'pong', headers)
+
+    def _known(self, path: str, payload: bytes, headers: t.Mapping[str, str]):
+        swhids = json.loads(payload or b'[]')
+        if len(swhids) > _KNOWN_MAX_BATCH_SIZE:
+            self._send(413, {'exception': 'LargePayloadExc',
+                             'reason': f'The maximum number of SWHIDs this endpoint can receive is '
+                                       f'{_KNOWN_MAX_BATCH_SIZE}'}, headers)
+        else:
+            self._send(200, {swhid: {'known': swhid in self.mock.known} for swhid in swhids}, headers)
+
+    def _visit(self, path: str, payload: bytes, headers: t.Mapping[str, str]):
+        origin_url = _strip_slash(unquote(path[len(_ORIGIN_PREFIX):-len(_LATEST_VISIT_SUFFIX)]))
+        visit = self.mock._latest_visit(origin_url)
+        if visit is None:
+            self._send(404, {'exception': 'NotFoundExc', 'reason': 'No visit found.'}, headers)
+        else:
+            self._send(200, visit, headers)
+
+    def _save_request(self, path: str, payload: bytes, headers: t.Mapping[str, str]):
+        visit_type, origin_url = self._save_target(path)
+        self._send(200, self.mock._save(visit_type, origin_url), headers)
+
+    def _status(self, path: str, payload: bytes, headers: t.Mapping[str, str]):
+        _, origin_url = self._save_target(path)
+        history = self.mock._history(origin_url)
+        if history is None:
+            self._send(404, {'exception': 'NotFoundExc', 'reason': 'No save requests found.'}, headers)
+        else:
+            self._send(200, history, headers)
+
+    @staticmethod
+    def _endpoint(method: str, path: str) -> t.Optional[str]:
+        if path == _API_PREFIX + 'ping/' and method == 'GET':
+            return 'ping'
+        if path.startswith(_SAVE_PREFIX) and '/url/' in path:
+            return 'save' if method == 'POST' else 'status'
+        if path.startswith(_ORIGIN_PREFIX) and path.endswith(_LATEST_VISIT_SUFFIX) and method == 'GET':
+            return 'visit'
+        if path == _API_PREFIX + 'known/' and method == 'POST':
+            return 'known'
+        return None
+
+    @staticmethod
+    def _save_target(path: str) -> t.Tuple[str, str]:
+        visit_type, _, origin_url = path[len(_SAVE_PREFIX):].partition('/url/')
+        return visit_type, _strip_slash(unquote(origin_url))
+
+    def _send(self, status: int, body: t.Any, headers: t.Mapping[str, str]):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
@@ -0,0 +1,436 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+from collections import deque
+import json
+import threading
+import typing as t
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+Timeout = t.Union[float, t.Tuple[float, float], None]
+"""A timeout in seconds, either as a single value, or as a `(connect, read)` tuple."""
+
+
+class TransportError(Exception):
+    """
+    Error raised by a :py:class:`Transport` when a request could not be completed.
+    """
+    pass
+
+
+class TransportConnectionError(TransportError):
+    """
+    Error raised by a :py:class:`Transport` when no connection to the server could be established.
+    """
+    pass
+
+
+class Headers(t.Mapping[str, str]):
+    """
+    Case-insensitive, read-only HTTP headers.
+
+    :param headers: The header names and values.
+    """
+
+    def __init__(self, headers: t.Union[t.Mapping[str, str], t.Iterable[t.Tuple[str, str]], None] = None):
+        items = headers.items() if isinstance(headers, t.Mapping) else headers or ()
+        self._headers = {name.lower(): (name, value) for name, value in items}
+
+    def __getitem__(self, name: str) -> str:
+        return self._headers[name.lower()][1]
+
+    def __iter__(self) -> t.Iterator[str]:
+        return (name for name, _ in self._headers.values())
+
+    def __len__(self) -> int:
+        return len(self._headers)
+
+    def __repr__(self) -> str:
+        return f'Headers({dict(self.items())!r})'
+
+
+class Response:
+    """
+    A completely read response to a request made through a :py:class:`Transport`.
+
+    :param int status_code: The HTTP status code.
+    :param t.Mapping[str, str] headers: The case-insensitive response headers.
+    :param bytes content: The body of the response.
+    """
+    __slots__ = ('status_code', 'headers', 'content', '_text')
+
+    def __init__(self, status_code: int, headers: t.Mapping[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self._text: t.Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f'<Response [{self.status_code}]>'
+
+    @property
+    def text(self) -> str:
+        """
+        The body of the response, decoded as UTF-8, which the Software Heritage API uses for all JSON responses.
+        """
+        if self._text is None:
+            self._text = self.content.decode('utf-8', errors='replace')
+        return self._text
+
+    def json(self) -> t.Any:
+        """
+        Parses the body of the response as JSON.
+
+        :return: The parsed JSON content.
+        :rtype: t.Any
+        :raises ValueError: if the body is not valid JSON.
+        """
+        return json.loads(self.text)
+
+
+class StreamedResponse:
+    """
+    A response to a request made with :meth:`Transport.stream`, whose body is read in chunks rather than held in
+    memory. The response must be closed, which a `with` block does, to return its connection to the pool.
+
+    :param int status_code: The HTTP status code.
+    :param t.Mapping[str, str] headers: The case-insensitive response headers.
+    :param chunks: A callable that takes a chunk size and returns an iterator over the chunks of the body.
+        The iterator raises :py:class:`TransportError` if reading the body fails.
+    :param close: An optional callable that releases the connection.
+    """
+    __slots__ = ('status_code', 'headers', '_chunks', '_close')
+
+    def __init__(self, status_code: int, headers: t.Mapping[str, str], chunks: t.Callable[[int], t.Iterator[bytes]],
+                 close: t.Optional[t.Callable[[], None]] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self._chunks = chunks
+        self._close = close
+
+    def __repr__(self) -> str:
+        return f'<StreamedResponse [{self.status_code}]>'
+
+    def __enter__(self) -> 'StreamedResponse':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def iter_content(self, chunk_size: int = 1 << 16) -> t.Iterator[bytes]:
+        """
+        Reads the body of the response in chunks.
+
+        :param int chunk_size: The maximum number of bytes per chunk.
+        :return: An iterator over the chunks.
+        :rtype: t.Iterator[bytes]
+        :raises TransportError: if reading the body fails, e.g., because the connection has been lost.
+        """
+        return self._chunks(chunk_size)
+
+    def close(self):
+        """
+        Releases the connection of the response.
+        """
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+class Transport:
+    """
+    The HTTP layer underneath :py:class:`~pyswh.swh.SwhClient`, which sends requests and reads their responses.
+
+    Transports must be thread-safe, as a client may be shared between threads. Implementations override
+    :meth:`request`, and :meth:`close` if they hold connections.
+    """
+
+    def request(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+                body: t.Optional[bytes] = None) -> Response:
+        """
+        Sends a request and reads its response completely. Redirects are followed, but failed requests are not
+        retried.
+
+        :param str method: The HTTP method.
+        :param str url: The URL to request.
+        :param t.Mapping[str, str] headers: The request headers.
+        :param timeout: The timeout for the request in seconds, either as a single value,
+            or as a `(connect, read)` tuple.
+        :param bytes body: The body of the request, if any.
+        :return: The response.
+        :rtype: Response
+        :raises TransportConnectionError: if no connection to the server could be established.
+        :raises TransportError: if the request could not be completed for another reason.
+        """
+        raise NotImplementedError
+
+    def stream(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+               body: t.Optional[bytes] = None) -> StreamedResponse:
+        """
+        Sends a request and returns its response as soon as the headers have been read, so that large bodies can be
+        read in chunks. By default, the response is read completely with :meth:`request` and then handed out in chunks;
+        implementations that can read bodies incrementally override this method.
+
+        :param str method: The HTTP method.
+        :param str url: The URL to request.
+        :param t.Mapping[str, str] headers: The request headers.
+        :param timeout: The timeout for the request in seconds, either as a single value,
+            or as a `(connect, read)` tuple.
+        :param bytes body: The body of the request, if any.
+        :return: The response, which must be closed.
+        :rtype: StreamedResponse
+        :raises TransportConnectionError: if no connection to the server could be established.
+        :raises TransportError: if the request could not be completed for another reason.
+        """
+        response = self.request(method, url, headers, timeout, body)
+        content = response.content
+        return StreamedResponse(response.status_code, response.headers,
+                                lambda size: (content[i:i + size] for i in range(0, len(content), size)))
+
+    def close(self):
+        """
+        Closes all connections held by the transport.
+        """
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    The default transport, which uses the `requests` library.
+
+    Each thread gets its own :py:class:`requests.Session`, but all sessions draw from the same pool of keep-alive
+    connections. `requests` is imported when the transport is created.
+
+    :param int pool_connections: The number of hosts for which connection pools are cached.
+    :param int pool_maxsize: The maximum number of connections kept alive per host.
+    :param bool pool_block: Whether to block when all connections of a pool are in use,
+        rather than opening (and discarding) additional connections.
+    :param bool keep_alive: Whether to keep connections open between requests.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 keep_alive: bool = True):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._requests = requests
+        self.keep_alive = keep_alive
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        """The adapter that holds the shared connection pool."""
+        self._local = threading.local()
+        self._sessions: t.List['requests.Session'] = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        """
+        The :py:class:`requests.Session` for the current thread, which uses the transport's shared connection pool.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            with self._lock:
+                self._sessions.append(session)
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+                body: t.Optional[bytes] = None) -> Response:
+        exceptions = self._requests.exceptions
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=timeout, data=body)
+        except exceptions.ConnectionError as ce:
+            raise TransportConnectionError(f'Could not connect to {url}: {ce}') from ce
+        except exceptions.RequestException as re:
+            raise TransportError(f'Request to {url} failed: {re}') from re
+        return Response(response.status_code, response.headers, response.content)
+
+    def stream(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+               body: t.Optional[bytes] = None) -> StreamedResponse:
+        exceptions = self._requests.exceptions
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=timeout, data=body, stream=True)
+        except exceptions.ConnectionError as ce:
+            raise TransportConnectionError(f'Could not connect to {url}: {ce}') from ce
+        except exceptions.RequestException as re:
+            raise TransportError(f'Request to {url} failed: {re}') from re
+
+        def chunks(size: int) -> t.Iterator[bytes]:
+            try:
+                yield from response.iter_content(size)
+            except exceptions.RequestException as re:
+                raise TransportError(f'Reading the response from {url} failed: {re}') from re
+
+        return StreamedResponse(response.status_code, response.headers, chunks, response.close)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self.adapter.close()
+        self._local = threading.local()
+
+
+class Urllib3Transport(Transport):
+    """
+    A lean transport that uses `urllib3` directly, without the per-request overhead and the import time of
+    `requests`. `urllib3` is imported when the transport is created.
+
+    :param int pool_connections: The number of hosts for which connection pools are cached.
+    :param int pool_maxsize: The maximum number of connections kept alive per host.
+    :param bool pool_block: Whether to block when all connections of a pool are in use,
+        rather than opening (and discarding) additional connections.
+    :param bool keep_alive: Whether to keep connections open between requests.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 keep_alive: bool = True):
+        import urllib3
+        self._urllib3 = urllib3
+        self.keep_alive = keep_alive
+        self.pool = urllib3.PoolManager(num_pools=pool_connections, maxsize=pool_maxsize, block=pool_block)
+        """The :py:class:`urllib3.PoolManager` that holds the connection pools."""
+        # Follow redirects like requests, but do not retry failed requests
+        self._retries = urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=10)
+
+    def request(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+                body: t.Optional[bytes] = None) -> Response:
+        response = self._send(method, url, headers, timeout, body, True)
+        return Response(response.status, response.headers, response.data)
+
+    def stream(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+               body: t.Optional[bytes] = None) -> StreamedResponse:
+        response = self._send(method, url, headers, timeout, body, False)
+        urllib3 = self._urllib3
+
+        def chunks(size: int) -> t.Iterator[bytes]:
+            try:
+                yield from response.stream(size)
+            except urllib3.exceptions.HTTPError as e:
+                raise TransportError(f'Reading the response from {url} failed: {e}') from e
+
+        def close():
+            if not response.isclosed():
+                response.close()  # Do not return a connection with an unread body to the pool
+            response.release_conn()
+
+        return StreamedResponse(response.status, response.headers, chunks, close)
+
+    def _send(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout, body: t.Optional[bytes],
+              preload_content: bool) -> t.Any:
+        """
+        Sends a request through the pool, and maps the errors of `urllib3` to :py:class:`TransportError`.
+
+        :return: The :py:class:`urllib3.response.HTTPResponse`.
+        """
+        urllib3 = self._urllib3
+        if isinstance(timeout, tuple):
+            timeout = urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        if not self.keep_alive:
+            headers = {**headers, 'Connection': 'close'}
+        try:
+            return self.pool.request(method, url, body=body, headers=headers, timeout=timeout,
+                                     retries=self._retries, preload_content=preload_content)
+        except urllib3.exceptions.HTTPError as e:
+            reason = getattr(e, 'reason', e)  # Failed attempts are wrapped in a MaxRetryError
+            if isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)):
+                raise TransportConnectionError(f'Could not connect to {url}: {reason}') from e
+            raise TransportError(f'Request to {url} failed: {reason}') from e
+
+    def close(self):
+        self.pool.clear()
+
+
+_Handler = t.Callable[[str, str, t.Mapping[str, str], t.Optional[bytes]], Response]
+
+
+class MemoryTransport(Transport):
+    """
+    A transport that answers requests from memory, to test code that uses pyswh without a server.
+
+    Responses are registered for a method and a URL with :meth:`add`. Responses registered for the same request are
+    returned in order, and the last one is repeated. Requests without a registered response are passed to the
+    `handler`, if given, or fail with :py:class:`TransportConnectionError`.
+    All requests are recorded in :py:attr:`calls`.
+
+    :param handler: An optional callable that answers requests without a registered response. It is called with the
+        method, the URL, the headers and the body of the request, and returns a :py:class:`Response`.
+    """
+
+    def __init__(self, handler: t.Optional[_Handler] = None):
+        self.handler = handler
+        self.calls: t.List[t.Tuple[str, str, t.Mapping[str, str], t.Optional[bytes]]] = []
+        """The method, the URL, the headers and the body of each request, in the order in which they have been made."""
+        self._responses: t.Dict[t.Tuple[str, str], t.Deque[Response]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, method: str, url: str, status: int = 200, json: t.Any = None, body: t.Union[str, bytes] = b'',
+            headers: t.Optional[t.Mapping[str, str]] = None) -> Response:
+        """
+        Registers a response for a request.
+
+        :param str method: The HTTP method of the request.
+        :param str url: The URL of the request.
+        :param int status: The HTTP status code of the response.
+        :param t.Any json: The content of the response, serialized as JSON. Takes precedence over `body`.
+        :param body: The body of the response.
+        :param t.Mapping[str, str] headers: The headers of the response.
+        :return: The registered response.
+        :rtype: Response
+        """
+        if json is not None:
+            body = _json_dumps(json)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        response = Response(status, Headers(headers), body)
+        with self._lock:
+            self._responses.setdefault((method.upper(), url), deque()).append(response)
+        return response
+
+    def request(self, method: str, url: str, headers: t.Mapping[str, str], timeout: Timeout = None,
+                body: t.Optional[bytes] = None) -> Response:
+        method = method.upper()
+        with self._lock:
+            self.calls.append((method, url, dict(headers), body))
+            responses = self._responses.get((method, url))
+            if responses:
+                return responses.popleft() if len(responses) > 1 else responses[0]
+        if self.handler is not None:
+            return self.handler(method, url, headers, body)
+        raise TransportConnectionError(f'No response registered for {method} {url}.')
+
+
+def _json_dumps(obj: t.Any) -> str:
+    return json.dumps(obj)
+
+
+_BACKENDS = {'requests': RequestsTransport, 'urllib3': Urllib3Transport}
+
+
+def create_transport(name: str, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                     keep_alive: bool = True) -> Transport:
+    """
+    Creates a transport by the name of its backend.
+
+    :param str name: The name of the backend, `requests` or `urllib3`.
+    :param int pool_connections: The number of hosts for which connection pools are cached.
+    :param int pool_maxsize: The maximum number of connections kept alive per host.
+    :param bool pool_block: Whether to block when all connections of a pool are in use.
+    :param bool keep_alive: Whether to keep connections open between requests.
+    :return: The transport.
+    :rtype: Transport
+    :raises ValueError: if the backend is unknown.
+    """
+    try:
+        backend = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f'Unknown transport {name!r}, expected one of {", ".join(sorted(_BACKENDS))}.')
+    return backend(pool_connections, pool_maxsize, pool_block, keep_alive)
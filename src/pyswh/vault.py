@@ -0,0 +1,155 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+
+import re
+import typing as t
+import zlib
+
+from pyswh.errors import SwhError, SwhVaultError
+from pyswh.known import validate_swhid
+from pyswh.polling import PollingStrategy
+
+BUNDLE_TYPES = {'flat': ('dir',), 'gitfast': ('rev',), 'git-bare': ('rev',)}
+"""The bundle types that the vault cooks, with the types of the objects that each can be cooked from."""
+
+DEFAULT_VAULT_POLLING = PollingStrategy(initial_delay=2.0, factor=1.5, max_delay=120.0)
+"""The default strategy for polling the status of cooking, which takes from seconds to hours."""
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+"""The default number of bytes that a bundle is downloaded and written in at a time."""
+
+_DEFAULT_BUNDLE_TYPES = {'dir': 'flat', 'rev': 'gitfast'}
+_GZIP_MAGIC = b'\x1f\x8b'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_MAX_INFLATE = 1 << 20  # bytes of decompressed output per step, so that verification takes little memory
+_CONTENT_RANGE = re.compile(r'bytes (?:(\d+)-\d+|\*)/(\d+|\*)')
+
+
+class VaultResult(t.NamedTuple):
+    """
+    The result of fetching a single bundle with :meth:`~pyswh.swh.SwhClient.fetch_many`.
+    """
+    swhid: str
+    """The SWHID of the object whose bundle should have been fetched."""
+    path: str
+    """The path that the bundle should have been written to."""
+    size: int = 0
+    """The size of the bundle in bytes, if it has been fetched."""
+    error: t.Optional[SwhError] = None
+    """The error that made fetching the bundle fail, or `None` if it has succeeded."""
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        Whether the bundle has been fetched.
+        """
+        return self.error is None
+
+
+def resolve_bundle_type(swhid: str, bundle_type: t.Optional[str] = None) -> str:
+    """
+    Determines the type of the bundle to cook for an object.
+
+    :param str swhid: The core SWHID of the object.
+    :param str bundle_type: The requested bundle type, or `None` for the default type of the object,
+        `flat` for directories and `gitfast` for revisions.
+    :return: The bundle type.
+    :rtype: str
+    :raises ValueError: if the SWHID is invalid, or the object cannot be cooked into a bundle of the type.
+    """
+    object_type = validate_swhid(swhid)[6:9]
+    if bundle_type is None:
+        bundle_type = _DEFAULT_BUNDLE_TYPES.get(object_type)
+    if object_type not in BUNDLE_TYPES.get(bundle_type, ()):
+        raise ValueError(f'The vault cannot cook {swhid} into a {bundle_type or "bundle"}.')
+    return bundle_type
+
+
+def parse_content_range(value: t.Optional[str]) -> t.Tuple[t.Optional[int], t.Optional[int]]:
+    """
+    Parses a `Content-Range` header.
+
+    :param str value: The value of the header, e.g., `bytes 100-199/1000` or `bytes */1000`.
+    :return: The offset of the first byte and the total size, each `None` if it is missing or unknown.
+    :rtype: t.Tuple[t.Optional[int], t.Optional[int]]
+    """
+    match = _CONTENT_RANGE.fullmatch(value.strip()) if value else None
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None), (int(total) if total != '*' else None)
+
+
+class BundleVerifier:
+    """
+    Verifies a bundle while it is downloaded.
+
+    Bundles of the types `flat` and `gitfast` are gzip-compressed. Their chunks are decompressed as they arrive,
+    without keeping the output, so that a corrupt bundle fails with the CRC check of gzip as soon as possible, and a
+    truncated bundle fails when it is finished. Other bundles are only counted.
+    """
+    __slots__ = ('size', 'compressed', 'failed', '_head', '_decompressor')
+
+    def __init__(self):
+        self.size = 0
+        """The number of bytes verified so far."""
+        self.compressed: t.Optional[bool] = None
+        """Whether the bundle is gzip-compressed, or `None` if that is not known yet."""
+        self.failed = False
+        """Whether the bundle has been found to be corrupt or truncated."""
+        self._head = b''
+        self._decompressor: t.Any = None
+
+    def update(self, chunk: bytes):
+        """
+        Verifies the next chunk of the bundle.
+
+        :param bytes chunk: The chunk.
+        :raises SwhVaultError: if the bundle is corrupt.
+        """
+        self.size += len(chunk)
+        if self.compressed is None:
+            self._head += chunk
+            if len(self._head) < len(_GZIP_MAGIC):
+                return
+            self.compressed = self._head.startswith(_GZIP_MAGIC)
+            chunk, self._head = self._head, b''
+            if self.compressed:
+                self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+        if self.compressed:
+            self._inflate(chunk)
+
+    def finish(self):
+        """
+        Checks that the bundle is complete.
+
+        :raises SwhVaultError: if the bundle is corrupt or truncated.
+        """
+        if not self.compressed:
+            return
+        decompressor = self._decompressor
+        try:
+            while not decompressor.eof and decompressor.decompress(b'', _MAX_INFLATE):
+                pass
+        except zlib.error as e:
+            self.failed = True
+            raise SwhVaultError(f'The bundle is corrupt: {e}') from e
+        if not decompressor.eof:
+            self.failed = True
+            raise SwhVaultError(f'The bundle is truncated after {self.size} bytes.')
+
+    def _inflate(self, data: bytes):
+        """
+        Decompresses data and discards the output, starting a new decompressor for each gzip member.
+        """
+        decompressor = self._decompressor
+        try:
+            while data:
+                if decompressor.eof:
+                    decompressor = self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+                decompressor.decompress(data, _MAX_INFLATE)
+                data = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+        except zlib.error as e:
+            self.failed = True
+            raise SwhVaultError(f'The bundle is corrupt: {e}') from e
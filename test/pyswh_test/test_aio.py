@@ -0,0 +1,200 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+import json
+import logging
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+
+from pyswh import aio  # noqa: E402
+from pyswh.errors import SwhSaveError, SwhSaveRejectedError  # noqa: E402
+from pyswh.ratelimit import RateLimiter  # noqa: E402
+from pyswh.retry import NO_RETRY  # noqa: E402
+from pyswh.swh import SaveOutcome  # noqa: E402
+
+
+class StubServer:
+    """
+    A local stub of the Software Heritage save and ping endpoints.
+    Each origin named `PENDING*` is pending for one status check, `FAIL*` fails, and `REJECT*` is rejected.
+    """
+
+    def __init__(self, remaining=1000):
+        self.remaining = remaining
+        self.reset = int(time.time()) + 3600
+        self.polls = {}
+        self.requests = 0
+        self.pings = 0
+        self.too_many = 0
+        self.url = None
+        self._runner = None
+
+    def _headers(self):
+        return {'X-RateLimit-Remaining': str(self.remaining), 'X-RateLimit-Reset': str(self.reset)}
+
+    def _body(self, origin, polls):
+        request_status, task_status = 'accepted', 'succeeded'
+        if origin.startswith('PENDING') and polls < 2:
+            request_status, task_status = 'pending', 'not yet scheduled'
+        elif origin.startswith('FAIL'):
+            task_status = 'failed'
+        elif origin.startswith('REJECT'):
+            request_status = 'rejected'
+        return {'origin_url': origin, 'loading_task_id': f'{origin}-1', 'save_request_status': request_status,
+                'save_task_status': task_status, 'visit_status': 'full', 'note': 'NOTE'}
+
+    async def ping(self, request):
+        self.pings += 1
+        return web.json_response('pong', headers=self._headers())
+
+    async def save(self, request):
+        self.requests += 1
+        if self.too_many:
+            self.too_many -= 1
+            return web.Response(status=429, headers={'X-RateLimit-Reset': str(int(time.time()) - 2)})
+        origin = request.match_info['origin']
+        if origin.startswith('BLACK'):
+            return web.Response(status=403, body=b'BLACKLISTED')
+        polls = self.polls.get(origin, 0)
+        self.polls[origin] = polls + 1
+        body = self._body(origin, polls)
+        if request.method == 'GET':
+            body = [body]
+        return web.Response(body=json.dumps(body), content_type='application/json', headers=self._headers())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/api/1/ping/', self.ping)
+        app.router.add_route('*', '/api/1/origin/save/git/url/{origin}/', self.save)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}/api/1/'
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def _run(test):
+    async def wrapper():
+        server = StubServer()
+        await server.start()
+        try:
+            async with aio.AsyncSwhClient(api_root_url=server.url) as client:
+                await test(server, client)
+        finally:
+            await server.stop()
+    asyncio.run(wrapper())
+
+
+def test_save_succeed():
+    async def test(server, client):
+        await client.save('OK', False, None)
+        assert server.pings == 1
+        assert server.requests == 2
+
+    _run(test)
+
+
+def test_save_pending(caplog):
+    async def test(server, client):
+        await client.save('PENDING', False, 'xyz')
+        assert server.polls['PENDING'] == 4
+
+    with caplog.at_level(logging.INFO):
+        _run(test)
+    assert 'The request to save PENDING is still pending.' in caplog.text
+
+
+def test_save_post_only():
+    async def test(server, client):
+        await client.save('PENDING', True, None)
+        assert server.requests == 1
+
+    _run(test)
+
+
+def test_save_errors():
+    async def test(server, client):
+        with pytest.raises(SwhSaveError, match='Saving "FAIL" has failed with visit status "full"!'):
+            await client.save('FAIL', False, None)
+        with pytest.raises(SwhSaveRejectedError, match='The request to save REJECT has been rejected'):
+            await client.save('REJECT', False, None)
+        with pytest.raises(SwhSaveRejectedError, match='The provided origin url is blacklisted.'):
+            await client.save('BLACK', False, None)
+
+    _run(test)
+
+
+def test_save_429():
+    async def test(server, client):
+        server.too_many = 1
+        await client.save('OK', False, None)
+        assert server.requests == 3
+
+    _run(test)
+
+
+def test_save_connection_error():
+    async def test():
+        async with aio.AsyncSwhClient(api_root_url='http://127.0.0.1:1/api/1/', retry=NO_RETRY) as client:
+            with pytest.raises(SwhSaveError, match='Could not connect to the Software Heritage API.'):
+                await client.save('OK', False, None)
+
+    asyncio.run(test())
+
+
+def test_save_all_gather():
+    async def test(server, client):
+        origins = [f'OK{i}' for i in range(200)] + ['FAIL', 'REJECT', 'BLACK']
+        results = await client.save_all(origins, max_concurrency=50)
+        assert [r.origin_url for r in results] == origins
+        assert all(r.outcome is SaveOutcome.SUCCEEDED for r in results[:200])
+        assert results[200].outcome is SaveOutcome.FAILED
+        assert results[201].outcome is SaveOutcome.REJECTED
+        assert results[202].outcome is SaveOutcome.REJECTED
+        assert server.pings == 1  # All saves share one rate limiter
+
+    _run(test)
+
+
+def test_save_many_stream():
+    async def test(server, client):
+        results = [r async for r in client.save_many((f'OK{i}' for i in range(30)), max_concurrency=5)]
+        assert sorted(r.origin_url for r in results) == sorted(f'OK{i}' for i in range(30))
+
+    _run(test)
+
+
+def test_shared_rate_limiter_fails_fast():
+    async def test(server, client):
+        server.remaining = 0
+        client.rate_limiter = RateLimiter(block=False)
+        with pytest.raises(SwhSaveError, match='Rate limit exceeded'):
+            await client.save('OK', True, None)
+
+    _run(test)
+
+
+def test_async_save_default_client():
+    async def test():
+        server = StubServer()
+        await server.start()
+        try:
+            client = aio._get_default_client()
+            assert client is aio._get_default_client()
+            client.api_root_url = server.url
+            client.rate_limiter = RateLimiter()
+            await aio.async_save('OK', False, None)
+            await client.close()
+        finally:
+            await server.stop()
+
+    asyncio.run(test())
@@ -0,0 +1,55 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+from pyswh.cache import VisitCache
+from pyswh.clock import VirtualClock
+
+
+def test_lookup_and_put():
+    cache = VisitCache()
+    assert cache.lookup('A') == (False, None)
+    cache.put('A', {'visit': 1})
+    cache.put('B', None)
+    assert cache.lookup('A') == (True, {'visit': 1})
+    assert cache.lookup('B') == (True, None)
+    cache.discard('B')
+    assert cache.lookup('B') == (False, None)
+
+
+def test_entries_expire():
+    clock = VirtualClock()
+    cache = VisitCache(ttl=60, clock=clock)
+    cache.put('A', 1)
+    clock.advance(59)
+    assert cache.lookup('A') == (True, 1)
+    clock.advance(1)
+    assert cache.lookup('A') == (False, None)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = VisitCache(maxsize=2)
+    cache.put('A', 1)
+    cache.put('B', 2)
+    cache.lookup('A')
+    cache.put('C', 3)
+    assert cache.lookup('B') == (False, None)
+    assert cache.lookup('A') == (True, 1)
+    assert cache.lookup('C') == (True, 3)
+
+
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / 'visits.json')
+    cache = VisitCache(path=path)
+    cache.put('A', {'date': '2022-10-13T00:00:00+00:00'})
+    cache.put('B', None)
+    cache.save()
+    loaded = VisitCache(path=path)
+    assert loaded.lookup('A') == (True, {'date': '2022-10-13T00:00:00+00:00'})
+    assert loaded.lookup('B') == (True, None)
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path):
+    path = tmp_path / 'visits.json'
+    path.write_text('{')
+    assert len(VisitCache(path=str(path))) == 0
@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import io
+import json
+
+import pytest
+import responses
+
+from pyswh import cli
+from pyswh.ratelimit import TokenPool
+
+
+def _mock_origin(api, name, save_status='succeeded'):
+    url = f'https://archive.softwareheritage.org/api/1/origin/save/git/url/{name}/'
+    body = {'loading_task_id': f'{name}-1', 'save_task_status': save_status, 'visit_status': 'full',
+            'origin_url': name, 'save_request_status': 'accepted', 'note': None}
+    api.post(url, json=body)
+    api.get(url, json=[body])
+
+
+@pytest.fixture
+def api():
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mock:
+        mock.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': '100'})
+        yield mock
+
+
+def _run(argv, stdin=''):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    code = cli.main(argv, stdin=io.StringIO(stdin), stdout=stdout, stderr=stderr)
+    results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    return code, results, stderr.getvalue()
+
+
+def test_save_from_stdin(api):
+    for name in ('A', 'B', 'C'):
+        _mock_origin(api, name)
+    code, results, stderr = _run(['save', '--concurrency', '2'], stdin='A\n\n# comment\nB\nC\n')
+    assert code == cli.EXIT_OK
+    assert sorted(r['origin_url'] for r in results) == ['A', 'B', 'C']
+    assert all(r['outcome'] == 'succeeded' and r['error'] is None for r in results)
+    assert stderr.startswith('Done: 3 origins in')
+    assert '3 succeeded, 0 failed, 0 rejected, 0 skipped' in stderr
+
+
+def test_save_from_file_with_partial_failure(api, tmp_path):
+    _mock_origin(api, 'A')
+    _mock_origin(api, 'B', save_status='failed')
+    source = tmp_path / 'urls.txt'
+    source.write_text('A\nB\n')
+    output = tmp_path / 'results.ndjson'
+    code, results, _ = _run(['save', '--from', str(source), '--output', str(output), '--quiet'])
+    assert code == cli.EXIT_PARTIAL_FAILURE
+    results = {r['origin_url']: r for r in map(json.loads, output.read_text().splitlines())}
+    assert results['B']['outcome'] == 'failed'
+    assert 'has failed' in results['B']['error']
+
+
+def test_save_all_failed(api):
+    _mock_origin(api, 'B', save_status='failed')
+    assert _run(['save', 'B', '--quiet'])[0] == cli.EXIT_FAILURE
+
+
+def test_save_with_journal(api, tmp_path):
+    _mock_origin(api, 'A')
+    journal = str(tmp_path / 'journal.db')
+    assert _run(['save', 'A', '--journal', journal, '--quiet'])[0] == cli.EXIT_OK
+    code, results, _ = _run(['save', 'A', '--journal', journal, '--freshness', '3600', '--quiet'])
+    assert code == cli.EXIT_OK
+    assert results[0]['outcome'] == 'skipped'
+
+
+def test_progress(api):
+    _mock_origin(api, 'A')
+    _, _, stderr = _run(['save', 'A', '--progress', '0'])
+    assert stderr.startswith('Progress: 1 origins in')
+    assert 'saves/min' in stderr
+
+
+def test_usage_errors(tmp_path):
+    assert _run([])[0] == cli.EXIT_USAGE
+    assert _run(['save', '--concurrency', '0', 'A'])[0] == cli.EXIT_USAGE
+    assert _run(['save', '--retries', '-1', 'A'])[0] == cli.EXIT_USAGE
+    code, _, stderr = _run(['save', '--from', str(tmp_path / 'missing.txt')])
+    assert code == cli.EXIT_USAGE
+    assert 'missing.txt' in stderr
+
+
+def test_auth_tokens(monkeypatch):
+    monkeypatch.delenv('PYSWH_AUTH_TOKENS', raising=False)
+    assert cli._auth_token([]) is None
+    assert cli._auth_token(['a']) == 'a'
+    assert len(cli._auth_token(['a', 'b'])) == 2
+    monkeypatch.setenv('PYSWH_AUTH_TOKENS', 'x, y z')
+    pool = cli._auth_token([])
+    assert isinstance(pool, TokenPool)
+    assert set(pool.limiters) == {'x', 'y', 'z'}
+
+
+def test_save_dedupe(api):
+    _mock_origin(api, 'https://github.com/org/repo')
+    code, results, _ = _run(['save', '--dedupe', '--quiet', 'https://github.com/org/repo',
+                             'http://github.com/org/repo.git'])
+    assert code == cli.EXIT_OK
+    assert [r['outcome'] for r in results] == ['succeeded', 'succeeded']
+    assert len([call for call in api.calls if call.request.method == 'POST']) == 1
@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+from email.utils import formatdate
+import threading
+import time
+
+import pytest
+
+from pyswh import swh
+from pyswh.clock import SYSTEM_CLOCK, VirtualClock
+from pyswh.errors import SwhSaveTimeoutError
+from pyswh.metrics import SLEEP_CIRCUIT, SLEEP_POLL, MetricsRecorder
+from pyswh.polling import PollingStrategy
+from pyswh.retry import CircuitBreaker, RetryPolicy
+from pyswh.transport import MemoryTransport
+
+API = 'https://archive.softwareheritage.org/api/1/'
+SAVE_URL = API + 'origin/save/git/url/MOCK/'
+
+
+def _task(task_status, visit_status=None):
+    return {'loading_task_id': 1, 'origin_url': 'MOCK', 'save_request_status': 'accepted',
+            'save_task_status': task_status, 'visit_status': visit_status}
+
+
+def test_virtual_clock():
+    clock = VirtualClock(start=1000.0)
+    assert (clock.time(), clock.monotonic()) == (1000.0, 0.0)
+    clock.sleep(2.5)
+    clock.sleep(-1)
+    clock.advance(0.5)
+    assert (clock.time(), clock.monotonic()) == (1003.0, 3.0)
+    assert clock.sleeps == [2.5, 0.0] and clock.slept == 2.5
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+    condition = threading.Condition()
+    with condition:
+        assert not clock.wait(condition, 7) and clock.monotonic() == 10.0
+        assert not SYSTEM_CLOCK.wait(condition, 0)
+    assert swh.SwhClient().clock is SYSTEM_CLOCK
+
+
+def test_client_polls_in_virtual_time():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', SAVE_URL, json=_task('not yet scheduled'))
+    for _ in range(9):
+        transport.add('GET', SAVE_URL, json=[_task('scheduled')])
+    transport.add('GET', SAVE_URL, json=[_task('succeeded', 'full')])
+    clock = VirtualClock()
+    metrics = MetricsRecorder()
+    polling = PollingStrategy(initial_delay=60, factor=2, max_delay=3600, jitter=0)
+    started = time.monotonic()
+    with swh.SwhClient(transport=transport, polling=polling, metrics=metrics, clock=clock) as client:
+        result = client.save('MOCK', False, None)
+    assert time.monotonic() - started < 5
+    assert clock.sleeps == [60, 120, 240, 480, 960, 1920, 3600, 3600, 3600]
+    assert result.polls == 10 and result.duration == clock.slept == 14580
+    assert metrics.sleep_seconds[SLEEP_POLL] == 14580
+
+
+def test_polling_timeout_in_virtual_time():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', SAVE_URL, json=_task('not yet scheduled'))
+    for _ in range(3):
+        transport.add('GET', SAVE_URL, json=[_task('scheduled')])
+    clock = VirtualClock()
+    polling = PollingStrategy(initial_delay=600, factor=1, max_delay=600, jitter=0, timeout=1500)
+    with swh.SwhClient(transport=transport, polling=polling, clock=clock) as client:
+        with pytest.raises(SwhSaveTimeoutError) as excinfo:
+            client.save('MOCK', False, None)
+    assert clock.sleeps == [600, 600]
+    assert excinfo.value.polls == 3 and excinfo.value.result.duration == 1200
+
+
+def test_circuit_breaker_in_virtual_time():
+    clock = VirtualClock()
+    metrics = MetricsRecorder()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=300, metrics=metrics, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.wait()
+    assert clock.sleeps == [300] and metrics.sleep_seconds[SLEEP_CIRCUIT] == 300
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_retry_after_date_in_virtual_time():
+    clock = VirtualClock(start=1_000_000_000)
+    headers = {'Retry-After': formatdate(clock.time() + 30, usegmt=True)}
+    assert RetryPolicy().delay(1, headers, clock.time()) == 30
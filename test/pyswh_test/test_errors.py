@@ -15,3 +15,9 @@ def swh_save_error():
 def test_swh_save_error(swh_save_error):
     assert type(swh_save_error) is errors.SwhSaveError
     assert type(swh_save_error) is not Exception
+
+
+def test_error_hierarchy():
+    assert issubclass(errors.SwhSaveError, errors.SwhError)
+    assert issubclass(errors.SwhVaultError, errors.SwhError)
+    assert not issubclass(errors.SwhVaultError, errors.SwhSaveError)
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import json
+import threading
+import time
+
+import pytest
+
+from pyswh import swh
+from pyswh.clock import VirtualClock
+from pyswh.errors import SwhSaveError
+from pyswh.flight import SingleFlight
+from pyswh.metrics import SLEEP_DEBOUNCE, MetricsRecorder
+from pyswh.polling import PollingStrategy
+from pyswh.transport import Headers, MemoryTransport, Response
+
+API = 'https://archive.softwareheritage.org/api/1/'
+ORIGIN = 'https://github.com/org/repo'
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _run_threads(target, count):
+    results = [None] * count
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, target(i))) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    threads, results = _run_threads(lambda _: flights.do('key', call), 3)
+    _wait_for(lambda: flights.joined == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['result'] * 3
+    assert calls == [1]
+    assert len(flights) == 0
+    # Once the call has completed, the next call for the key runs anew
+    assert flights.do('key', lambda: 'again') == 'again'
+
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait(5)
+        raise SwhSaveError('Boom')
+
+    def attempt(_):
+        try:
+            flights.do('key', call)
+        except SwhSaveError as sse:
+            return sse
+
+    threads, errors = _run_threads(attempt, 2)
+    _wait_for(lambda: flights.joined == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors[0] is errors[1] and str(errors[0]) == 'Boom'
+    assert len(flights) == 0
+
+
+def test_single_flight_debounce_merges_bursts():
+    clock = VirtualClock()
+    metrics = MetricsRecorder()
+    flights = SingleFlight(debounce=0.5, metrics=metrics, clock=clock)
+    assert flights.do('key', lambda: 1) == 1
+    assert clock.sleeps == [0.5] and metrics.sleep_seconds[SLEEP_DEBOUNCE] == 0.5
+    with pytest.raises(ValueError):
+        SingleFlight(debounce=-1)
+
+
+def test_client_coalesces_saves_of_equivalent_origins():
+    release = threading.Event()
+    task = {'loading_task_id': 1, 'origin_url': ORIGIN, 'save_request_status': 'accepted',
+            'save_task_status': 'succeeded', 'visit_status': 'full'}
+
+    def handler(method, url, headers, body):
+        if method == 'POST':
+            release.wait(5)
+        return Response(200, Headers(), json.dumps(task if method == 'POST' else [task]).encode('utf-8'))
+
+    transport = MemoryTransport(handler)
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    spellings = [ORIGIN, 'https://github.com/Org/Repo.git', 'git@github.com:org/repo']
+    with swh.SwhClient(transport=transport, polling=PollingStrategy(initial_delay=0, jitter=0),
+                       single_flight=True) as client:
+        threads, results = _run_threads(lambda i: client.save(spellings[i], False, None), 3)
+        _wait_for(lambda: client.flights.joined == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results[0] is results[1] is results[2]
+        assert results[0].succeeded
+        assert [call[0] for call in transport.calls] == ['GET', 'POST', 'GET']
+        # A post-only save does not attach to a save that polls the status
+        assert client.save(ORIGIN, True, None).task_id == 1
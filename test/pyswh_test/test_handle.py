@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+from concurrent.futures import CancelledError, TimeoutError
+import json
+import threading
+
+import pytest
+import responses
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError, SwhSaveRejectedError
+from pyswh.polling import PollingStrategy
+from pyswh.result import SaveResult
+
+
+PING_URL = 'https://archive.softwareheritage.org/api/1/ping/'
+MOCK_SAVE_URL = 'https://archive.softwareheritage.org/api/1/origin/save/git/url/MOCK/'
+
+
+def _task(save_status='succeeded', request_status='accepted'):
+    return {'loading_task_id': '1', 'origin_url': 'MOCK', 'save_request_status': request_status,
+            'save_task_status': save_status, 'visit_status': 'full', 'note': None}
+
+
+@pytest.fixture()
+def client():
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0))
+    yield client
+    client.close()
+
+
+@responses.activate
+def test_submit_returns_after_post(client):
+    release = threading.Event()
+
+    def status(request):
+        release.wait(5)
+        return 200, {}, json.dumps([_task()])
+
+    responses.post(MOCK_SAVE_URL, json=_task('not yet scheduled'))
+    responses.add_callback(responses.GET, MOCK_SAVE_URL, callback=status)
+    handle = client.submit('MOCK')
+    assert handle.task_id == '1'
+    assert handle.status == 'not yet scheduled'
+    assert not handle.done()
+    with pytest.raises(TimeoutError):
+        handle.result(timeout=0.01)
+    release.set()
+    result = handle.result(timeout=5)
+    assert isinstance(result, SaveResult) and result.succeeded
+    assert (result.origin_url, result.task_id) == ('MOCK', '1') and result.polls >= 1
+    assert handle.status == 'succeeded'
+    assert handle.done()
+
+
+@responses.activate
+def test_submit_callbacks(client):
+    responses.post(MOCK_SAVE_URL, json=_task('scheduled'))
+    responses.get(MOCK_SAVE_URL, json=[_task('failed')])
+    done = threading.Event()
+    called = []
+
+    def callback(handle):
+        called.append(handle)
+        done.set()
+
+    handle = client.submit('MOCK')
+    handle.add_done_callback(callback)
+    assert done.wait(5)
+    assert called == [handle]
+    assert 'has failed' in str(handle.exception())
+    with pytest.raises(SwhSaveError):
+        handle.result()
+    handle.add_done_callback(called.append)  # Called immediately for completed saves
+    assert called == [handle, handle]
+
+
+@responses.activate
+def test_submit_cancel_wait(client):
+    responses.post(MOCK_SAVE_URL, json=_task('scheduled'))
+    responses.get(MOCK_SAVE_URL, json=[_task('scheduled')])
+    handle = client.submit('MOCK')
+    called = []
+    handle.add_done_callback(called.append)
+    assert handle.cancel_wait()
+    assert handle.cancelled()
+    assert handle.done()
+    assert called == [handle]
+    with pytest.raises(CancelledError):
+        handle.result()
+    assert not handle.cancel_wait()
+
+
+@responses.activate
+def test_submit_raises_for_rejected_requests(client):
+    responses.post(MOCK_SAVE_URL, json=_task(request_status='rejected'))
+    with pytest.raises(SwhSaveRejectedError):
+        client.submit('MOCK')
+
+
+@responses.activate
+def test_submit_raises_for_failed_post(client):
+    responses.post(MOCK_SAVE_URL, status=403)
+    with pytest.raises(SwhSaveRejectedError):
+        client.submit('MOCK')
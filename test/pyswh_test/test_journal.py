@@ -0,0 +1,148 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import sqlite3
+import time
+
+import pytest
+import responses
+
+from pyswh import swh
+from pyswh.clock import VirtualClock
+from pyswh.journal import SaveJournal
+from pyswh.polling import PollingStrategy
+
+
+def _url(name):
+    return f'https://archive.softwareheritage.org/api/1/origin/save/git/url/{name}/'
+
+
+def _body(name, save_status='succeeded', request_status='accepted', visit_status='full'):
+    return (f'{{"loading_task_id": "{name}-1", "save_task_status": "{save_status}", "visit_status": "{visit_status}",'
+            f'"origin_url": "{name}", "save_request_status": "{request_status}"}}')
+
+
+@pytest.fixture
+def journal(tmp_path):
+    with SaveJournal(str(tmp_path / 'journal.db'), batch_size=1000, flush_interval=3600) as journal:
+        yield journal
+
+
+@pytest.fixture
+def client():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    return swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0))
+
+
+def test_journal_uses_wal(journal):
+    mode = sqlite3.connect(journal.path).execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+
+
+def test_journal_batches_commits(journal):
+    journal.record_submitted('A', 'A-1', 'accepted')
+    assert journal.get('A').task_id == 'A-1'  # Uncommitted changes are visible
+    reader = sqlite3.connect(journal.path)
+    assert reader.execute('SELECT COUNT(*) FROM saves').fetchone()[0] == 0
+    journal.flush()
+    assert reader.execute('SELECT COUNT(*) FROM saves').fetchone()[0] == 1
+
+
+def test_journal_commits_full_batch(tmp_path):
+    with SaveJournal(str(tmp_path / 'journal.db'), batch_size=2, flush_interval=3600) as journal:
+        journal.record_submitted('A', 'A-1', 'accepted')
+        journal.record_submitted('B', 'B-1', 'accepted')
+        reader = sqlite3.connect(journal.path)
+        assert reader.execute('SELECT COUNT(*) FROM saves').fetchone()[0] == 2
+
+
+def test_journal_persists(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    with SaveJournal(path) as journal:
+        journal.record_submitted('A', 'A-1', 'accepted')
+        journal.record_result('A', 'succeeded', {'save_request_status': 'accepted', 'save_task_status': 'succeeded',
+                                                 'visit_status': 'full'}, None, True)
+    with SaveJournal(path) as journal:
+        entry = journal.get('A')
+        assert entry.task_id == 'A-1'
+        assert entry.visit_status == 'full'
+        assert entry.outcome == 'succeeded'
+        assert entry.submitted_at <= entry.completed_at
+        assert not entry.resumable
+        assert entry.succeeded_within(60)
+        assert not entry.succeeded_within(60, now=time.time() + 120)
+        assert journal.get('B') is None
+        assert [e.origin_url for e in journal.entries()] == ['A']
+
+
+@responses.activate
+def test_save_many_journals_results(client, journal):
+    responses.post(_url('OK'), body=_body('OK'))
+    responses.get(_url('OK'), body=f'[{_body("OK")}]')
+    responses.post(_url('FAIL'), body=_body('FAIL', save_status='failed', visit_status='failed'))
+    responses.get(_url('FAIL'), body=f'[{_body("FAIL", save_status="failed", visit_status="failed")}]')
+    results = {r.origin_url: r for r in client.save_many(['OK', 'FAIL'], journal=journal)}
+    assert results['OK'].outcome is swh.SaveOutcome.SUCCEEDED
+    ok = journal.get('OK')
+    assert (ok.task_id, ok.task_status, ok.visit_status, ok.outcome) == ('OK-1', 'succeeded', 'full', 'succeeded')
+    assert ok.completed_at is not None
+    fail = journal.get('FAIL')
+    assert fail.outcome == 'failed'
+    assert 'has failed' in fail.error
+    assert not fail.resumable
+
+
+@responses.activate
+def test_save_many_skips_fresh_origins(client, journal):
+    journal.record_submitted('OK', 'OK-1', 'accepted')
+    journal.record_result('OK', 'succeeded', None, None, True)
+    post = responses.post(_url('OK'), body=_body('OK'))
+    results = list(client.save_many(['OK'], journal=journal, freshness=60))
+    assert results == [swh.BulkSaveResult('OK', swh.SaveOutcome.SKIPPED)]
+    assert post.call_count == 0
+
+
+@responses.activate
+def test_save_many_saves_stale_origins_again(tmp_path):
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    clock = VirtualClock()
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0), clock=clock)
+    with SaveJournal(str(tmp_path / 'journal.db'), clock=clock) as journal:
+        journal.record_submitted('OK', 'OK-0', 'accepted')
+        journal.record_result('OK', 'succeeded', None, None, True)
+        post = responses.post(_url('OK'), body=_body('OK'))
+        responses.get(_url('OK'), body=f'[{_body("OK")}]')
+        clock.advance(60)
+        assert list(client.save_many(['OK'], journal=journal, freshness=60)) == [
+            swh.BulkSaveResult('OK', swh.SaveOutcome.SKIPPED)]
+        clock.advance(1)
+        results = list(client.save_many(['OK'], journal=journal, freshness=60))
+        assert results[0].outcome is swh.SaveOutcome.SUCCEEDED
+        assert post.call_count == 1
+        assert journal.get('OK').task_id == 'OK-1'
+        assert journal.get('OK').completed_at == clock.time()
+
+
+@responses.activate
+def test_save_many_resumes_submitted_tasks(client, journal):
+    journal.record_submitted('OK', 'OK-1', 'accepted')
+    post = responses.post(_url('OK'), body=_body('OK'))
+    status = responses.get(_url('OK'), body=f'[{_body("OK")}]')
+    results = list(client.save_many(['OK'], journal=journal))
+    assert results[0].outcome is swh.SaveOutcome.SUCCEEDED
+    assert post.call_count == 0
+    assert status.call_count >= 1
+    assert journal.get('OK').completed_at is not None
+
+
+@responses.activate
+def test_save_many_keeps_timed_out_tasks_resumable(journal):
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0, timeout=0.001))
+    responses.post(_url('SLOW'), body=_body('SLOW', save_status='scheduled', visit_status='null'))
+    responses.get(_url('SLOW'), body=f'[{_body("SLOW", save_status="scheduled")}]')
+    results = list(client.save_many(['SLOW'], journal=journal))
+    assert results[0].outcome is swh.SaveOutcome.FAILED
+    entry = journal.get('SLOW')
+    assert entry.resumable
+    assert entry.task_status == 'scheduled'
@@ -0,0 +1,84 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import json
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.known import SwhidBitmap, validate_swhid
+from pyswh.retry import NO_RETRY
+from pyswh.testing import MockSwhServer
+from pyswh.transport import MemoryTransport
+
+API = 'https://archive.softwareheritage.org/api/1/'
+
+
+def _swhid(i, object_type='rev'):
+    return f'swh:1:{object_type}:{i:040x}'
+
+
+def test_validate_swhid():
+    assert validate_swhid(_swhid(1, 'cnt')) == _swhid(1, 'cnt')
+    for invalid in ('swh:1:cnt:123', 'swh:1:ori:' + 40 * 'a', _swhid(1) + ';origin=https://example.org', None):
+        with pytest.raises(ValueError):
+            validate_swhid(invalid)
+
+
+def test_swhid_bitmap():
+    bitmap = SwhidBitmap()
+    bitmap._set_batch(8, [True, False, True])
+    bitmap._set_batch(0, [False] * 7 + [True])
+    assert len(bitmap) == 11
+    assert list(bitmap.indices()) == [7, 8, 10]
+    assert list(bitmap.indices(known=False)) == [0, 1, 2, 3, 4, 5, 6, 9]
+    assert bitmap.count() == 3
+    assert bitmap[-1] and not bitmap[9]
+    with pytest.raises(IndexError):
+        bitmap[11]
+    assert SwhidBitmap.from_bytes(bitmap.to_bytes(), 11) == bitmap
+    assert len(bitmap.to_bytes()) == 2
+
+
+def test_known_batches_requests_concurrently():
+    swhids = [_swhid(i) for i in range(2500)]
+    with MockSwhServer(known=swhids[::3], rate_limit=100) as server, \
+            swh.SwhClient(api_root_url=server.api_root_url) as client:
+        bitmap = client.known(iter(swhids), max_workers=2)
+        assert server.requests['known'] == 3
+        assert client.rate_limiter.remaining < 100
+    assert len(bitmap) == 2500
+    assert list(bitmap.indices()) == list(range(0, 2500, 3))
+
+
+def test_iter_known_streams_results():
+    swhids = [_swhid(i, 'cnt') for i in range(10)]
+    with MockSwhServer(known=swhids[:4]) as server, swh.SwhClient(api_root_url=server.api_root_url) as client:
+        results = dict(client.iter_known(swhids, batch_size=3))
+        assert server.requests['known'] == 4
+    assert results == {swhid: i < 4 for i, swhid in enumerate(swhids)}
+
+
+def test_known_sends_json_batches():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', API + 'known/', json={_swhid(1): {'known': True}, _swhid(2): {'known': False}})
+    with swh.SwhClient(transport=transport) as client:
+        assert list(client.known([_swhid(1), _swhid(2)])) == [True, False]
+    method, url, headers, body = transport.calls[1]
+    assert headers['Content-Type'] == 'application/json'
+    assert json.loads(body) == [_swhid(1), _swhid(2)]
+
+
+def test_known_errors():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', API + 'known/', status=413)
+    with swh.SwhClient(transport=transport, retry=NO_RETRY) as client:
+        with pytest.raises(SwhSaveError, match='HTTP status 413'):
+            client.known([_swhid(1)])
+        with pytest.raises(ValueError, match='batch size'):
+            client.known([_swhid(1)], batch_size=1001)
+        with pytest.raises(ValueError, match='Invalid core SWHID'):
+            client.known([_swhid(1), 'swh:1:rev:xyz'])
@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import time
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.metrics import Histogram, Metrics, MetricsRecorder
+from pyswh.polling import PollingStrategy
+from pyswh.ratelimit import RateLimiter
+from pyswh.retry import NO_RETRY
+from pyswh.testing import MockSwhServer
+
+ORIGIN = 'https://example.org/repo'
+
+
+class EventLog(Metrics):
+
+    def __init__(self):
+        self.requests = []
+        self.stages = []
+        self.sleeps = []
+
+    def request(self, endpoint, method, status, latency, remaining):
+        self.requests.append((endpoint, method, status, remaining))
+
+    def save_stage(self, origin_url, stage, elapsed, duration):
+        self.stages.append((origin_url, stage))
+
+    def slept(self, reason, seconds):
+        self.sleeps.append(reason)
+
+
+def _client(server, metrics, **kwargs):
+    polling = PollingStrategy(initial_delay=0.02, factor=1, jitter=0)
+    return swh.SwhClient(api_root_url=server.api_root_url, polling=polling, metrics=metrics, **kwargs)
+
+
+def test_metrics_default_discards_measurements():
+    client = swh.SwhClient()
+    assert type(client.metrics) is Metrics
+    assert client.rate_limiter.metrics is client.metrics
+
+
+def test_metrics_save_reports_requests_stages_and_sleeps():
+    events = EventLog()
+    with MockSwhServer(schedule_delay=0.1, run_delay=0.1, visit_delay=0.1, rate_limit=100) as server, \
+            _client(server, events) as client:
+        client.save(ORIGIN, False, None)
+    assert events.requests[0] == ('ping', 'GET', 200, 100)
+    assert events.requests[1] == ('save', 'POST', 200, 99)
+    assert {request[0] for request in events.requests[2:]} == {'status'}
+    assert [stage for _, stage in events.stages] == ['submitted', 'accepted', 'scheduled', 'running', 'succeeded']
+    assert set(events.sleeps) == {'poll'}
+
+
+def test_metrics_multiplexed_save_reports_stages():
+    events = EventLog()
+    with MockSwhServer(schedule_delay=0.1, failure_rate=1.0) as server, \
+            _client(server, events, multiplex_polling=True) as client:
+        with pytest.raises(SwhSaveError):
+            client.save(ORIGIN, False, None)
+    assert [stage for _, stage in events.stages] == ['submitted', 'accepted', 'failed']
+
+
+def test_metrics_reports_failed_requests():
+    events = EventLog()
+    client = swh.SwhClient(api_root_url='http://127.0.0.1:1/api/1/', metrics=events, retry=NO_RETRY)
+    with pytest.raises(SwhSaveError):
+        client.save(ORIGIN, True, None)
+    assert events.requests == [('ping', 'GET', None, None)]
+
+
+def test_metrics_rate_limiter_reports_sleeps():
+    events = EventLog()
+    limiter = RateLimiter(margin=0, metrics=events)
+    limiter.update({'X-RateLimit-Limit': '10', 'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset': str(int(time.time()) + 1)})
+    limiter.acquire(lambda: (200, {}))
+    assert events.sleeps == ['rate_limit']
+
+
+def test_histogram_cumulative_buckets():
+    histogram = Histogram((1.0, 5.0))
+    for value in (0.5, 1.0, 3.0, 10.0):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [(1.0, 2), (5.0, 3), (float('inf'), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 14.5
+
+
+def test_metrics_recorder_renders_prometheus_text():
+    recorder = MetricsRecorder()
+    with MockSwhServer(schedule_delay=0.05, rate_limit=100) as server, _client(server, recorder) as client:
+        client.save(ORIGIN, False, None)
+    assert recorder.requests[('save', 'POST', '200')] == 1
+    assert recorder.stages['succeeded'] == 1
+    assert recorder.sleep_seconds['poll'] > 0
+    text = recorder.render()
+    assert 'pyswh_requests_total{endpoint="save",method="POST",status="200"} 1\n' in text
+    assert 'pyswh_request_seconds_count{endpoint="ping"} 1\n' in text
+    assert 'pyswh_rate_limit_remaining ' in text
+    assert 'pyswh_save_stage_seconds_bucket{stage="succeeded",le="+Inf"} 1\n' in text
+    assert '# TYPE pyswh_sleep_seconds_total counter\npyswh_sleep_seconds_total{reason="poll"} ' in text
+    # Stages are rendered in the order of the lifecycle
+    assert text.index('stage="submitted"') < text.index('stage="accepted"') < text.index('stage="succeeded"')
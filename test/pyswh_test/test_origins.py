@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+
+import pytest
+
+from pyswh import swh
+from pyswh.origins import Forge, OriginDeduplicator, canonicalize, origin_key
+from pyswh.polling import PollingStrategy
+from pyswh.testing import MockSwhServer
+
+ALIASES = ['https://github.com/Org/Repo', 'https://github.com/org/repo.git', 'http://github.com/Org/Repo/',
+           'git@github.com:Org/Repo.git', 'https://www.github.com/Org/Repo/tree/main']
+
+
+@pytest.mark.parametrize('origin_url, canonical', [
+    ('https://github.com/Org/Repo', 'https://github.com/Org/Repo'),
+    ('  HTTP://GitHub.com//Org/Repo.git/ ', 'https://github.com/Org/Repo'),
+    ('git@github.com:Org/Repo.git', 'https://github.com/Org/Repo'),
+    ('https://user@github.com:443/Org/Repo/tree/main?tab=readme#top', 'https://github.com/Org/Repo'),
+    ('https://gitlab.com/group/sub/project/-/tree/main', 'https://gitlab.com/group/sub/project'),
+    ('https://Git.Example.org:443/repo.git/', 'https://git.example.org/repo.git'),
+    ('http://git.example.org:8080/cgit/repo?h=main#x', 'http://git.example.org:8080/cgit/repo?h=main'),
+    ('not a url', 'not a url'),
+])
+def test_canonicalize(origin_url, canonical):
+    assert canonicalize(origin_url) == canonical
+
+
+def test_origin_key_folds_case_on_forges_only():
+    assert len({origin_key(alias) for alias in ALIASES}) == 1
+    assert origin_key('https://Git.Example.org/Repo') == 'https://git.example.org/Repo'
+    forges = {'github.com': Forge(path_segments=2, case_insensitive=False)}
+    assert origin_key('https://github.com/Org/Repo', forges) == 'https://github.com/Org/Repo'
+
+
+def test_deduplicator_fans_out_results_to_aliases():
+    deduplicator = OriginDeduplicator()
+    unique = deduplicator.unique(ALIASES[:2] + ['https://example.org/other'] + ALIASES[2:])
+    assert next(unique) == 'https://github.com/Org/Repo'
+    assert next(unique) == 'https://example.org/other'
+    result = swh.BulkSaveResult('https://github.com/Org/Repo', swh.SaveOutcome.SUCCEEDED, None, 2)
+    fanned_out = deduplicator.fan_out([result])
+    assert [r.origin_url for r in fanned_out] == ALIASES[:2]
+    # Aliases seen after the save has completed get its result as well
+    assert list(unique) == []
+    assert [r.origin_url for r in deduplicator.fan_out([])] == ALIASES[2:]
+    assert deduplicator.duplicates == 4
+
+
+def test_save_many_dedupe_saves_equivalent_origins_once():
+    origins = ALIASES + ['https://example.org/other', 'https://example.org/other/']
+    with MockSwhServer() as server, \
+            swh.SwhClient(api_root_url=server.api_root_url, polling=PollingStrategy(initial_delay=0)) as client:
+        results = list(client.save_many(origins, max_workers=2, dedupe=True))
+        assert server.requests['save'] == 2
+    assert sorted(r.origin_url for r in results) == sorted(origins)
+    assert all(r.outcome is swh.SaveOutcome.SUCCEEDED for r in results)
+
+
+def test_async_save_many_dedupe():
+    from pyswh.aio import AsyncSwhClient
+
+    async def save(server):
+        async with AsyncSwhClient(api_root_url=server.api_root_url, polling=PollingStrategy(initial_delay=0)) as client:
+            return [result async for result in client.save_many(ALIASES, dedupe=True)]
+
+    with MockSwhServer() as server:
+        results = asyncio.run(save(server))
+        assert server.requests['save'] == 1
+    assert sorted(r.origin_url for r in results) == sorted(ALIASES)
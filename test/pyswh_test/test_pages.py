@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import threading
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.pages import paginate, parse_link_header
+from pyswh.retry import NO_RETRY
+from pyswh.transport import MemoryTransport
+
+API = 'https://archive.softwareheritage.org/api/1/'
+ORIGIN = 'https://example.org/repo'
+SNAPSHOT = 40 * 'a'
+
+
+def _transport():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    return transport
+
+
+def test_parse_link_header():
+    assert parse_link_header('<https://example.org/?page=2>; rel="next", <https://example.org/?page=0>; rel=prev') == \
+        {'next': 'https://example.org/?page=2', 'prev': 'https://example.org/?page=0'}
+    assert parse_link_header(None) == {}
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_paginate_follows_links(prefetch):
+    pages = {'1': ([1, 2], '2'), '2': ([3], '3'), '3': ([], None)}
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return pages[url]
+
+    assert list(paginate(fetch, '1', prefetch)) == [[1, 2], [3], []]
+    assert fetched == ['1', '2', '3']
+
+
+def test_paginate_prefetches_next_page():
+    second_page_requested = threading.Event()
+
+    def fetch(url):
+        if url == '2':
+            second_page_requested.set()
+            return [3], None
+        return [1, 2], '2'
+
+    pages = paginate(fetch, '1')
+    assert next(pages) == [1, 2]
+    assert second_page_requested.wait(5)
+    assert list(pages) == [[3]]
+
+
+def test_iter_visits():
+    transport = _transport()
+    first = API + f'origin/{ORIGIN}/visits/?per_page=2'
+    second = API + f'origin/{ORIGIN}/visits/?last_visit=2&per_page=2'
+    transport.add('GET', first, json=[{'visit': 3}, {'visit': 2}], headers={'Link': f'<{second}>; rel="next"'})
+    transport.add('GET', second, json=[{'visit': 1}])
+    with swh.SwhClient(transport=transport) as client:
+        assert [visit['visit'] for visit in client.iter_visits(ORIGIN, per_page=2)] == [3, 2, 1]
+
+
+def test_iter_snapshot_branches():
+    transport = _transport()
+    first = API + f'snapshot/{SNAPSHOT}/?branches_count=1'
+    second = API + f'snapshot/{SNAPSHOT}/?branches_count=1&branches_from=refs/heads/main'
+    head = {'target': 'refs/heads/main', 'target_type': 'alias'}
+    transport.add('GET', first, json={'id': SNAPSHOT, 'branches': {'HEAD': head}},
+                  headers={'Link': f'<{second}>; rel="next"'})
+    transport.add('GET', second, json={'id': SNAPSHOT, 'branches': {'refs/heads/main': None}})
+    with swh.SwhClient(transport=transport) as client:
+        branches = list(client.iter_snapshot_branches(f'swh:1:snp:{SNAPSHOT}', per_page=1, prefetch=False))
+    assert branches == [('HEAD', {'target': 'refs/heads/main', 'target_type': 'alias'}), ('refs/heads/main', None)]
+
+
+def test_search_origins():
+    transport = _transport()
+    transport.add('GET', API + 'origin/search/pyswh%2Fdocs/?limit=1000', json=[{'url': ORIGIN}])
+    with swh.SwhClient(transport=transport) as client:
+        assert list(client.search_origins('pyswh/docs')) == [{'url': ORIGIN}]
+
+
+def test_pages_fail_with_save_error():
+    transport = _transport()
+    transport.add('GET', API + f'origin/{ORIGIN}/visits/?per_page=1000', status=404)
+    with swh.SwhClient(transport=transport, retry=NO_RETRY) as client:
+        with pytest.raises(SwhSaveError, match='HTTP status 404'):
+            list(client.iter_visits(ORIGIN))
@@ -0,0 +1,153 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import json
+
+import pytest
+import responses
+
+from pyswh import swh
+from pyswh.clock import VirtualClock
+from pyswh.errors import SwhSaveError, SwhSaveRejectedError
+from pyswh.polling import PollingStrategy
+from pyswh.retry import NO_RETRY
+
+
+PING_URL = 'https://archive.softwareheritage.org/api/1/ping/'
+MOCK_SAVE_URL = 'https://archive.softwareheritage.org/api/1/origin/save/git/url/MOCK/'
+
+
+def _task(task_id, save_status='succeeded', request_status='accepted'):
+    return {'loading_task_id': task_id, 'origin_url': 'MOCK', 'save_request_status': request_status,
+            'save_task_status': save_status, 'visit_status': 'full', 'note': 'NOTE'}
+
+
+@pytest.fixture()
+def client():
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0), multiplex_polling=True,
+                           retry=NO_RETRY)
+    yield client
+    client.close()
+
+
+@responses.activate
+def test_one_request_resolves_all_tasks(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    bodies = [
+        [_task('1', 'scheduled'), _task('2', 'scheduled'), _task('3', 'scheduled')],
+        [_task('1'), _task('2', 'failed'), _task('3', 'scheduled'), _task('0')],
+        [_task('3'), _task('1'), _task('2', 'failed')],
+    ]
+    calls = []
+
+    def status(request):
+        calls.append(request)
+        return 200, {}, json.dumps(bodies[min(len(calls), len(bodies)) - 1])
+
+    responses.add_callback(responses.GET, MOCK_SAVE_URL, callback=status)
+    watches = [client.poller.watch('MOCK', task_id, None, client.polling.start('MOCK')) for task_id in '123']
+    for watch in watches:
+        assert watch.wait(5)
+    assert watches[0].error is None
+    assert watches[0].response_json['loading_task_id'] == '1'
+    assert 'has failed' in str(watches[1].error)
+    assert watches[2].error is None
+    # Usually three requests, or four if the first request was made before all tasks were watched
+    assert client.poller.requests == len(calls) <= 4
+    assert watches[2].poll.polls >= 2
+
+
+@responses.activate
+def test_history_is_parsed_only_up_to_watched_tasks(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    # The objects after the watched tasks are not parsed, so that invalid JSON there goes unnoticed
+    history = ', '.join(json.dumps(_task(str(i))) for i in range(5, 0, -1))
+    responses.get(MOCK_SAVE_URL, body=f'[{history}, INVALID]')
+    watches = [client.poller.watch('MOCK', task_id, None, client.polling.start('MOCK')) for task_id in '42']
+    for watch in watches:
+        assert watch.wait(5)
+        assert watch.error is None and watch.response_json['loading_task_id'] == watch.task_id
+
+
+@responses.activate
+def test_missing_and_rejected_tasks(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    responses.get(MOCK_SAVE_URL, body=json.dumps([_task('1', request_status='rejected')]))
+    rejected = client.poller.watch('MOCK', '1', None, client.polling.start('MOCK'))
+    missing = client.poller.watch('MOCK', '2', None, client.polling.start('MOCK'))
+    assert rejected.wait(5) and missing.wait(5)
+    assert isinstance(rejected.error, SwhSaveRejectedError)
+    assert 'Failed to retrieve the save task for MOCK' in str(missing.error)
+
+
+@responses.activate
+def test_connection_error_resolves_all_tasks(client):
+    watch = client.poller.watch('MOCK', '1', None, client.polling.start('MOCK'))
+    assert watch.wait(5)
+    assert 'Could not connect to the Software Heritage API during progress check.' in str(watch.error)
+
+
+@responses.activate
+def test_task_without_optional_fields(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    responses.post(MOCK_SAVE_URL, body=json.dumps(_task('1', 'not yet scheduled', 'pending')))
+    responses.get(MOCK_SAVE_URL, body=json.dumps([{'loading_task_id': '1', 'save_task_status': 'scheduled'}]))
+    responses.get(MOCK_SAVE_URL, body=json.dumps([{'loading_task_id': '1', 'save_task_status': 'succeeded'}]))
+    handle = client.submit('MOCK')
+    assert handle.result(timeout=3).succeeded
+
+
+@responses.activate
+def test_unexpected_error_fails_all_tasks(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    responses.post(MOCK_SAVE_URL, body=json.dumps(_task('1', 'not yet scheduled', 'pending')))
+    # Objects without a task id make the parser fail with a KeyError
+    responses.get(MOCK_SAVE_URL, body=json.dumps([{'save_task_status': 'scheduled'}]))
+    handle = client.submit('MOCK')
+    with pytest.raises(SwhSaveError, match='Failed to check the status of saving MOCK: KeyError'):
+        handle.result(timeout=3)
+
+
+@responses.activate
+def test_done_callback(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    responses.get(MOCK_SAVE_URL, body=json.dumps([_task('1')]))
+    done = []
+    watch = client.poller.watch('MOCK', '1', None, client.polling.start('MOCK'))
+    watch.add_done_callback(done.append)
+    assert watch.wait(5)
+    watch.add_done_callback(done.append)
+    assert done == [watch, watch]
+
+
+@responses.activate
+def test_poller_waits_in_virtual_time():
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    for body in ([_task('1', 'scheduled')], [_task('1', 'scheduled')], [_task('1')]):
+        responses.get(MOCK_SAVE_URL, body=json.dumps(body))
+    clock = VirtualClock()
+    polling = PollingStrategy(initial_delay=600, factor=2, max_delay=3600, jitter=0)
+    with swh.SwhClient(polling=polling, multiplex_polling=True, retry=NO_RETRY, clock=clock) as client:
+        watch = client.poller.watch('MOCK', '1', None, client.polling.start('MOCK', clock))
+        assert watch.wait(5) and watch.error is None
+    assert clock.sleeps == [600, 1200]
+    assert watch.poll.polls == 3 and watch.poll.elapsed == 1800
+
+
+def test_close_resolves_pending_tasks(client):
+    poller = client.poller
+    client.close()
+    with pytest.raises(SwhSaveError, match='closed'):
+        poller.watch('MOCK', '1', None, client.polling.start('MOCK'))
+
+
+@responses.activate
+def test_client_save_multiplexed(client):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100'})
+    responses.post(MOCK_SAVE_URL, body=json.dumps(_task('1', 'not yet scheduled', 'pending')))
+    responses.get(MOCK_SAVE_URL, body=json.dumps([_task('1')]))
+    assert client.save('MOCK', False, None).polls == 1
+    results = list(client.save_many(['MOCK'] * 10, max_workers=10))
+    assert all(result.outcome is swh.SaveOutcome.SUCCEEDED for result in results)
+    # Ten concurrent saves of the same origin share their status requests
+    assert client.poller.requests < 11
@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import time
+
+import pytest
+
+from pyswh.errors import SwhSaveTimeoutError
+from pyswh.polling import PollingStrategy
+
+
+def test_delay_grows_exponentially_up_to_cap():
+    strategy = PollingStrategy(initial_delay=1, factor=2, max_delay=10, jitter=0)
+    assert [strategy.delay(attempt) for attempt in range(6)] == [1, 2, 4, 8, 10, 10]
+    assert strategy.delay(100000) == 10
+
+
+def test_delay_jitter():
+    strategy = PollingStrategy(initial_delay=10, factor=1, max_delay=10, jitter=0.5)
+    delays = [strategy.delay(0) for _ in range(100)]
+    assert all(5 <= delay <= 15 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'initial_delay': -1},
+    {'initial_delay': 10, 'max_delay': 1},
+    {'factor': 0.5},
+    {'jitter': 2},
+    {'timeout': -1},
+])
+def test_invalid_strategy(kwargs):
+    with pytest.raises(ValueError):
+        PollingStrategy(**kwargs)
+
+
+def test_poll_timeout():
+    poll = PollingStrategy(initial_delay=1, jitter=0, timeout=3).start('MOCK')
+    assert poll.next_delay() == 1
+    poll.started = time.monotonic() - 1
+    assert poll.next_delay() == 1.5
+    poll.started = time.monotonic() - 2.5
+    poll.polls = 3
+    with pytest.raises(SwhSaveTimeoutError, match=r'Saving MOCK has not completed within 3 seconds \(3 status'):
+        poll.next_delay()
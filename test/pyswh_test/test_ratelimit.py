@@ -0,0 +1,307 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+
+import pytest
+import responses
+
+from pyswh import ratelimit, swh
+from pyswh.clock import VirtualClock
+from pyswh.errors import SwhRateLimitError
+from pyswh.ratelimit import RateLimiter, SharedRateLimiter, TokenPool
+
+
+MOCK_SAVE_URL = 'https://archive.softwareheritage.org/api/1/origin/save/git/url/MOCK/'
+PING_URL = 'https://archive.softwareheritage.org/api/1/ping/'
+
+
+class _Probe:
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.status_code, self.headers
+
+
+def test_back_off():
+    clock = VirtualClock()
+    current_epoch = int(clock.time())
+    limiter = RateLimiter(clock=clock)
+    limiter.back_off({'X-RateLimit-Reset': str(current_epoch)})  # Rate limit will be "reset" in 2 secs.
+    assert clock.sleeps == [2]  # 2 secs. margin
+    assert int(clock.time() - current_epoch) == 2
+    assert limiter.remaining == 0
+
+
+def test_back_off_fail_fast():
+    reset = int(time.time()) + 100
+    limiter = RateLimiter(block=False)
+    with pytest.raises(SwhRateLimitError, match='Rate limit exceeded.') as excinfo:
+        limiter.back_off({'X-RateLimit-Reset': str(reset)})
+    assert excinfo.value.reset_time == reset
+
+
+def test_acquire_pings_only_without_state():
+    limiter = RateLimiter()
+    probe = _Probe(headers={'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    for _ in range(5):
+        limiter.acquire(probe)
+    assert probe.calls == 1
+    assert limiter.remaining == 5
+
+
+def test_acquire_fail_fast_when_exhausted():
+    limiter = RateLimiter(block=False)
+    limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    probe = _Probe()
+    with pytest.raises(SwhRateLimitError):
+        limiter.acquire(probe)
+    assert probe.calls == 0
+
+
+def test_acquire_refills_after_reset():
+    limiter = RateLimiter(margin=0)
+    limiter.update({'X-RateLimit-Limit': '120',
+                    'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset': str(int(time.time()) - 1)})
+    limiter.acquire(_Probe())
+    assert limiter.remaining == 119
+
+
+def test_update_never_grows_budget_within_window():
+    reset = str(int(time.time()) + 3600)
+    limiter = RateLimiter()
+    limiter.update({'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': reset})
+    limiter.update({'X-RateLimit-Remaining': '7', 'X-RateLimit-Reset': reset})
+    assert limiter.remaining == 5
+    limiter.update({'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': str(int(reset) - 3600)})
+    assert limiter.remaining == 5
+
+
+def test_update_ignores_missing_headers():
+    limiter = RateLimiter()
+    limiter.update({})
+    assert not limiter.has_state
+
+
+@responses.activate
+def test_client_requests_update_limiter_without_ping():
+    reset = str(int(time.time()) + 3600)
+    ping = responses.get(PING_URL, headers={'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': reset})
+    responses.get(MOCK_SAVE_URL, headers={'X-RateLimit-Remaining': '42', 'X-RateLimit-Reset': reset},
+                  body='[]', status=200)
+    client = swh.SwhClient()
+    for _ in range(3):
+        client._request(swh._RequestMethod.GET, 'MOCK', None)
+    assert ping.call_count == 1
+    assert client.rate_limiter.remaining == 40  # Never more than the server reported, minus local requests
+
+
+@responses.activate
+def test_client_request_retries_after_429(caplog):
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '1'})
+    responses.get(MOCK_SAVE_URL, status=429, headers={'X-RateLimit-Reset': str(int(time.time()) - 2)})
+    responses.get(MOCK_SAVE_URL, body='{"method": "GET"}', status=200)
+    client = swh.SwhClient()
+    with caplog.at_level(logging.DEBUG):
+        response = client._request(swh._RequestMethod.GET, 'MOCK', None)
+    assert response.content == b'{"method": "GET"}'
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_client_request_fails_fast_on_429():
+    responses.get(PING_URL, headers={'X-RateLimit-Remaining': '1'})
+    responses.get(MOCK_SAVE_URL, status=429, headers={'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    client = swh.SwhClient(rate_limiter=RateLimiter(block=False))
+    with pytest.raises(SwhRateLimitError):
+        client._request(swh._RequestMethod.GET, 'MOCK', None)
+
+
+def test_acquire_concurrent_callers_ping_once():
+    limiter = RateLimiter()
+    probe = _Probe(headers={'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+
+    def slow_probe():
+        time.sleep(0.2)
+        return probe()
+
+    threads = [threading.Thread(target=limiter.acquire, args=(slow_probe,)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert probe.calls == 1
+    assert limiter.remaining == 90
+
+
+def _token_probe(budgets):
+    calls = []
+
+    def probe(token):
+        calls.append(token)
+        return 200, {'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': str(budgets[token]),
+                     'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+    probe.calls = calls
+    return probe
+
+
+def test_token_pool_requires_tokens():
+    with pytest.raises(ValueError):
+        TokenPool([])
+
+
+def test_token_pool_hides_tokens():
+    assert 'secret' not in repr(TokenPool(['secret']))
+
+
+def test_token_pool_prefers_most_remaining_budget():
+    pool = TokenPool(['a', 'b', 'c'])
+    probe = _token_probe({'a': 2, 'b': 5, 'c': 3})
+    tokens = [pool.acquire(probe) for _ in range(10)]
+    assert sorted(probe.calls) == ['a', 'b', 'c']  # Every token is pinged once to learn its budget
+    assert tokens[:3] == ['b', 'b', 'b']  # 'b' has the most budget once all budgets are known
+    assert tokens.count('a') == 2 and tokens.count('b') == 5 and tokens.count('c') == 3
+
+
+def test_token_pool_rests_exhausted_tokens():
+    pool = TokenPool(['a', 'b'], margin=0)
+    reset = int(time.time()) + 3600
+    pool.update('a', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(reset)})
+    pool.update('b', {'X-RateLimit-Remaining': '20', 'X-RateLimit-Reset': str(reset)})
+    pool.back_off('b', {'X-RateLimit-Reset': str(reset)})
+    assert [pool.acquire(_Probe()) for _ in range(10)] == ['a'] * 10
+
+
+def test_token_pool_fail_fast_when_all_exhausted():
+    pool = TokenPool(['a', 'b'], block=False)
+    reset = int(time.time()) + 3600
+    pool.back_off('a', {'X-RateLimit-Reset': str(reset)})
+    pool.back_off('b', {'X-RateLimit-Reset': str(reset - 60)})
+    with pytest.raises(SwhRateLimitError) as info:
+        pool.acquire(_Probe())
+    assert info.value.reset_time == reset - 60 + 2  # The earliest reset, plus the margin
+
+
+def test_token_pool_waits_for_earliest_reset():
+    pool = TokenPool(['a', 'b'], margin=0)
+    now = int(time.time())
+    pool.back_off('a', {'X-RateLimit-Reset': str(now + 3600)})
+    pool.back_off('b', {'X-RateLimit-Reset': str(now + 1)})
+    started = time.time()
+    assert pool.acquire(_token_probe({'a': 10, 'b': 10})) == 'b'
+    assert time.time() - started < 5
+
+
+@responses.activate
+def test_save_with_token_pool():
+    budgets = {'a': '60', 'b': '50'}
+    seen = []
+
+    def ping(request):
+        token = request.headers['Authorization'][len('Bearer '):]
+        return 200, {'X-RateLimit-Remaining': budgets[token], 'X-RateLimit-Reset': str(int(time.time()) + 3600)}, ''
+
+    def post(request):
+        seen.append(request.headers['Authorization'])
+        if request.headers['Authorization'] == 'Bearer a':
+            return 429, {'X-RateLimit-Reset': str(int(time.time()) + 3600)}, ''
+        return 200, {'X-RateLimit-Remaining': '49'}, ''
+
+    responses.add_callback(responses.GET, PING_URL, callback=ping)
+    responses.add_callback(responses.POST, MOCK_SAVE_URL, callback=post)
+    pool = TokenPool(['a', 'b'])
+    client = swh.SwhClient()
+    client.save('MOCK', True, pool)
+    client.save('MOCK', True, pool)
+    # The token with the most budget is rested after a 429, and the request is repeated with the other token
+    assert seen == ['Bearer a', 'Bearer b', 'Bearer b']
+    assert pool.limiters['a'].remaining == 0
+    assert pool.limiters['b'].remaining == 49
+
+
+def _take_shared(path):
+    limiter = SharedRateLimiter(path, block=False)
+    return sum(1 for _ in range(5) if limiter._take() == 0)
+
+
+def test_shared_rate_limiter_shares_budget(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SharedRateLimiter(path), SharedRateLimiter(path)
+    first.update({'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '3',
+                  'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    assert second.has_state
+    probe = _Probe()
+    for limiter in (first, second, first):
+        limiter.acquire(probe)
+    assert probe.calls == 0
+    assert second._take() > 0  # The shared budget is used up
+    assert SharedRateLimiter(path, name='other')._take() == ratelimit._NEEDS_PROBE
+
+
+def test_shared_rate_limiter_shares_back_off(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SharedRateLimiter(path, block=False), SharedRateLimiter(path, block=False)
+    first.update({'X-RateLimit-Remaining': '50'})
+    with pytest.raises(SwhRateLimitError):
+        first.back_off({'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    with pytest.raises(SwhRateLimitError):
+        second.acquire(_Probe())
+
+
+def test_shared_rate_limiter_probes_once(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SharedRateLimiter(path), SharedRateLimiter(path)
+    assert first._take() == ratelimit._NEEDS_PROBE
+    assert second._take() == ratelimit._AWAIT_PROBE  # Another limiter is pinging the API
+    first._learn(200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    first._end_probe()
+    assert second._take() == 0
+
+
+def test_shared_rate_limiter_across_processes(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    SharedRateLimiter(path).update({'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        taken = pool.map(_take_shared, [path] * 4)
+    assert sum(taken) == 10
+
+
+def test_shared_rate_limiter_does_not_block_event_loop(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / 'ratelimit.db'))
+    state, threads = limiter._state, []
+
+    def recording_state():
+        threads.append(threading.get_ident())
+        return state()
+
+    async def probe():
+        return 200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+
+    async def test():
+        await limiter.acquire_async(probe)
+        await limiter.update_async({'X-RateLimit-Remaining': '5'})
+        return threading.get_ident()
+
+    limiter._state = recording_state
+    loop_thread = asyncio.run(test())
+    assert threads and loop_thread not in threads
+    assert limiter.has_state and limiter.remaining == 5
+
+
+def test_default_client_uses_shared_rate_limiter(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYSWH_RATE_LIMIT_FILE', str(tmp_path / 'ratelimit.db'))
+    monkeypatch.setattr(swh, '_default_client', None)
+    limiter = swh._get_default_client().rate_limiter
+    assert isinstance(limiter, SharedRateLimiter)
+    assert limiter.path == str(tmp_path / 'ratelimit.db')
+    monkeypatch.setattr(swh, '_default_client', None)
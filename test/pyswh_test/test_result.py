@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import pickle
+
+import pytest
+
+from pyswh import swh
+from pyswh.clock import VirtualClock
+from pyswh.errors import SwhSaveError, SwhSaveRejectedError
+from pyswh.polling import PollingStrategy
+from pyswh.result import SaveResult, compact_status
+from pyswh.transport import MemoryTransport
+
+API = 'https://archive.softwareheritage.org/api/1/'
+SAVE_URL = API + 'origin/save/git/url/MOCK/'
+
+
+def _task(request_status='accepted', task_status='succeeded', visit_status='full', **fields):
+    return dict({'id': 7, 'loading_task_id': 1, 'origin_url': 'MOCK', 'save_request_status': request_status,
+                 'save_task_status': task_status, 'visit_status': visit_status, 'visit_type': 'git',
+                 'save_request_date': '2022-10-13T10:00:00+00:00', 'snapshot_swhid': None}, **fields)
+
+
+def _client(transport, **kwargs):
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    return swh.SwhClient(transport=transport, polling=PollingStrategy(initial_delay=0, jitter=0), **kwargs)
+
+
+def test_compact_status():
+    assert compact_status(_task(note='MISS')) == {'origin_url': 'MOCK', 'save_request_status': 'accepted',
+                                                  'save_task_status': 'succeeded', 'visit_status': 'full',
+                                                  'loading_task_id': 1, 'note': 'MISS'}
+
+
+def test_save_returns_result():
+    transport = MemoryTransport()
+    transport.add('POST', SAVE_URL, json=_task(task_status='not yet scheduled', visit_status=None))
+    transport.add('GET', SAVE_URL, json=[_task(loading_task_id=0), _task()])
+    with _client(transport) as client:
+        result = client.save('MOCK', False, None)
+    assert isinstance(result, SaveResult) and result.succeeded
+    assert (result.origin_url, result.visit_type, result.task_id, result.polls) == ('MOCK', 'git', 1, 1)
+    assert (result.request_status, result.task_status, result.visit_status) == ('accepted', 'succeeded', 'full')
+    assert result.started_at > 0 and result.duration >= 0
+    assert not hasattr(result, '__dict__')
+    assert SaveResult('MOCK', clock=VirtualClock(start=1000.0)).started_at == 1000.0
+
+
+def test_save_post_only_returns_submitted_status():
+    transport = MemoryTransport()
+    transport.add('POST', SAVE_URL, json=_task(task_status='not yet scheduled', visit_status=None))
+    with _client(transport) as client:
+        result = client.save('MOCK', True, None)
+    assert (result.task_id, result.task_status, result.polls) == (1, 'not yet scheduled', 0)
+    assert not result.succeeded
+
+
+def test_error_carries_result_without_raw_response():
+    transport = MemoryTransport()
+    transport.add('POST', SAVE_URL, json=_task(task_status='not yet scheduled', visit_status=None))
+    transport.add('GET', SAVE_URL, json=[_task(task_status='failed', visit_status='partial')])
+    with _client(transport) as client:
+        with pytest.raises(SwhSaveError) as excinfo:
+            client.save('MOCK', False, None)
+    error = excinfo.value
+    assert str(error) == 'Saving "MOCK" has failed with visit status "partial"!'
+    assert (error.origin_url, error.task_id, error.task_status, error.visit_status) == ('MOCK', 1, 'failed', 'partial')
+    assert error.polls == 1 and error.raw is None
+    assert pickle.loads(pickle.dumps(error)).args == error.args
+
+
+def test_error_keeps_raw_response_on_request():
+    transport = MemoryTransport()
+    transport.add('POST', SAVE_URL, status=403, body=b'BLACKLISTED')
+    with _client(transport, keep_raw_responses=True) as client:
+        with pytest.raises(SwhSaveRejectedError) as excinfo:
+            client.save('MOCK', False, None)
+    assert excinfo.value.raw == b'BLACKLISTED'
+    assert 'BLACKLISTED' not in str(excinfo.value)
+    assert excinfo.value.origin_url == 'MOCK' and excinfo.value.task_id is None
+
+
+def test_save_many_results_carry_statuses():
+    transport = MemoryTransport()
+    transport.add('POST', SAVE_URL, json=_task(request_status='rejected', task_status=None, visit_status=None,
+                                               note='Not allowed'))
+    with _client(transport) as client:
+        [result] = client.save_many(['MOCK'])
+    assert result.outcome is swh.SaveOutcome.REJECTED
+    assert result.result.request_status == 'rejected'
+    assert result.error.result is result.result
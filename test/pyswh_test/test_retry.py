@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+from email.utils import formatdate
+import time
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.polling import PollingStrategy
+from pyswh.retry import _TRIAL_POLL_INTERVAL, CircuitBreaker, RetryPolicy
+from pyswh.testing import MockSwhServer
+from pyswh.transport import Headers, MemoryTransport, Response, TransportConnectionError
+
+API = 'https://archive.softwareheritage.org/api/1/'
+SAVE_URL = API + 'origin/save/git/url/MOCK/'
+FAST = RetryPolicy(initial_delay=0, max_delay=0, jitter=0)
+
+
+def _task(save_status):
+    return {'loading_task_id': 1, 'origin_url': 'MOCK', 'save_request_status': 'accepted',
+            'save_task_status': save_status, 'visit_status': 'full' if save_status == 'succeeded' else None}
+
+
+def _transport():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    return transport
+
+
+def _client(transport, **kwargs):
+    return swh.SwhClient(transport=transport, polling=PollingStrategy(initial_delay=0, jitter=0), **kwargs)
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(initial_delay=1, factor=2, max_delay=5, jitter=0, max_retry_after=60)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.delay(1, Headers({'Retry-After': '7'})) == 7
+    assert policy.delay(1, Headers({'Retry-After': '600'})) == 60
+    assert 25 < policy.delay(1, Headers({'Retry-After': formatdate(time.time() + 30, usegmt=True)})) <= 30
+    assert policy.delay(1, Headers({'Retry-After': 'soon'})) == 1
+
+
+def test_retry_policy_should_retry():
+    policy = RetryPolicy(max_attempts=3, resubmit=False)
+    assert policy.should_retry('GET', 2)
+    assert not policy.should_retry('GET', 3)
+    assert not policy.should_retry('POST', 1)
+    assert policy.should_retry('POST', 1, reached_api=False)
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+
+
+def test_client_retries_server_errors_with_retry_after():
+    transport = _transport()
+    transport.add('POST', SAVE_URL, json=_task('not yet scheduled'))
+    transport.add('GET', SAVE_URL, status=503, headers={'Retry-After': '0'})
+    transport.add('GET', SAVE_URL, status=502)
+    transport.add('GET', SAVE_URL, json=[_task('succeeded')])
+    with _client(transport, retry=RetryPolicy(initial_delay=0.01, jitter=0)) as client:
+        assert client.save('MOCK', False, None).polls == 1
+    assert [call[0] for call in transport.calls] == ['GET', 'POST', 'GET', 'GET', 'GET']
+
+
+def test_client_retries_connection_errors():
+    failures = []
+
+    def handler(method, url, headers, body):
+        if len(failures) < 2:
+            failures.append(url)
+            raise TransportConnectionError('Connection refused')
+        return Response(200, Headers(), b'{"loading_task_id": 1, "origin_url": "MOCK"}')
+
+    transport = MemoryTransport(handler)
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    with _client(transport, retry=FAST) as client:
+        client.save('MOCK', True, None)
+    assert failures == [SAVE_URL, SAVE_URL]
+
+
+def test_client_gives_up_after_max_attempts():
+    transport = _transport()
+    transport.add('POST', SAVE_URL, status=500)
+    with _client(transport, retry=RetryPolicy(max_attempts=3, initial_delay=0, jitter=0)) as client:
+        with pytest.raises(SwhSaveError, match='could not handle the request to save MOCK'):
+            client.save('MOCK', False, None)
+    assert len(transport.calls) == 4
+
+
+def test_client_does_not_resubmit_when_disabled():
+    transport = _transport()
+    transport.add('POST', SAVE_URL, status=502)
+    with _client(transport, retry=RetryPolicy(resubmit=False)) as client:
+        with pytest.raises(SwhSaveError, match='HTTP status 502'):
+            client.save('MOCK', False, None)
+    assert [call[0] for call in transport.calls] == ['GET', 'POST']
+
+
+def test_circuit_breaker_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert 0 < breaker._wait_time() <= 0.05
+    breaker.wait()
+    # The first request after the timeout is the trial, the others wait for it
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker._wait_time() == _TRIAL_POLL_INTERVAL
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.wait()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker._wait_time() == 0
+
+
+def test_circuit_breaker_pauses_requests_while_api_is_down():
+    transport = _transport()
+    for _ in range(3):
+        transport.add('POST', SAVE_URL, status=503)
+    transport.add('POST', SAVE_URL, json=_task('succeeded'))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    started = time.monotonic()
+    with _client(transport, retry=FAST, circuit_breaker=breaker) as client:
+        client.save('MOCK', True, None)
+    # Opened after the second failure, and again after the failed trial
+    assert time.monotonic() - started >= 0.2
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bulk_save_survives_server_errors():
+    origins = [f'https://example.org/repo-{i}' for i in range(10)]
+    with MockSwhServer(error_rate=0.3, seed=1) as server, \
+            swh.SwhClient(api_root_url=server.api_root_url, polling=PollingStrategy(initial_delay=0.01),
+                          retry=RetryPolicy(max_attempts=10, initial_delay=0, jitter=0)) as client:
+        results = list(client.save_many(origins, max_workers=4))
+    assert all(result.outcome is swh.SaveOutcome.SUCCEEDED for result in results)
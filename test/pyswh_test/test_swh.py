@@ -1,7 +1,12 @@
 # SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
 #
 # SPDX-License-Identifier: MIT
-import time
+from datetime import datetime, timedelta, timezone
+import itertools
+import json
+import re
+import sys
+import threading
 import logging
 
 import pytest
@@ -9,12 +14,24 @@ import responses
 import requests
 
 from pyswh import swh
+from pyswh import errors as swh_errors
+from pyswh.clock import VirtualClock
+from pyswh.polling import PollingStrategy
+from pyswh.retry import NO_RETRY
 # from pyswh.errors import SwhSaveError
 
 
 MOCK_SAVE_URL = 'https://archive.softwareheritage.org/api/1/origin/save/git/url/MOCK/'
 
 
+@pytest.fixture(autouse=True)
+def default_client():
+    # Give each test a fresh default client, so that no rate limit state leaks between tests
+    swh._default_client = None
+    yield
+    swh._default_client = None
+
+
 @pytest.mark.parametrize('test_input, expected', [
     ('abc', 'abc/'),
     ('abc/', 'abc/'),
@@ -25,18 +42,6 @@ def test_prepare_url(test_input, expected):
     assert swh._prepare_url(test_input) == expected
 
 
-@responses.activate
-def test_back_off():
-
-    current_epoch = int(time.time())
-    responses.get('https://my.api/api/1/foobar',
-                  headers={'X-RateLimit-Reset': str(current_epoch)},  # Rate limit will be "reset" in 2 secs.
-                  status=200)
-    response = requests.get('https://my.api/api/1/foobar')
-    swh._back_off(response)
-    assert int(time.time() - current_epoch) == 2  # 2 secs. added in MOT
-
-
 @responses.activate
 def test_check_rate_limit_pass(caplog):
     responses.get('https://archive.softwareheritage.org/api/1/ping/',
@@ -48,25 +53,29 @@ def test_check_rate_limit_pass(caplog):
 
 @responses.activate
 def test_check_rate_limit_429(caplog):
-    current_epoch = int(time.time())
+    clock = VirtualClock()
+    swh._default_client = swh.SwhClient(clock=clock)
+    current_epoch = int(clock.time())
     responses.get('https://archive.softwareheritage.org/api/1/ping/', status=429,
                   headers={'X-RateLimit-Reset': str(current_epoch)})
     with caplog.at_level(logging.DEBUG):
         swh._check_rate_limit()
-    assert int(time.time() - current_epoch) == 2  # 2 secs. added in MOT
+    assert clock.sleeps == [2]  # 2 secs. added in MOT
     assert caplog.records[0].msg == 'Too many requests! Backing off.'
     assert 'Rate limit exceeded' in caplog.records[1].msg
 
 
 @responses.activate
 def test_check_rate_limit_rate_limit(caplog):
-    current_epoch = int(time.time())
+    clock = VirtualClock()
+    swh._default_client = swh.SwhClient(clock=clock)
+    current_epoch = int(clock.time())
     responses.get('https://archive.softwareheritage.org/api/1/ping/',
                   headers={'X-RateLimit-Remaining': str(0),
                            'X-RateLimit-Reset': str(current_epoch)})
     with caplog.at_level(logging.DEBUG):
         swh._check_rate_limit()
-    assert int(time.time() - current_epoch) == 2  # 2 secs. added in MOT
+    assert clock.sleeps == [2]  # 2 secs. added in MOT
     assert caplog.records[0].msg == 'Rate limit exceeded. Backing off.'
     assert 'Rate limit exceeded' in caplog.records[1].msg
 
@@ -104,6 +113,7 @@ def test_init_save_pass():
 
 @responses.activate
 def test_init_save_raise():
+    swh._default_client = swh.SwhClient(retry=NO_RETRY)
     with pytest.raises(swh.SwhSaveError,
                        match='Could not connect to the Software Heritage API. Are you connected to the internet?'):
         swh._init_save('MOCK', None)
@@ -111,6 +121,7 @@ def test_init_save_raise():
 
 @responses.activate
 def test_check_save_progress_raise_connection():
+    swh._default_client = swh.SwhClient(retry=NO_RETRY)
     with pytest.raises(swh.SwhSaveError,
                        match='Could not connect to the Software Heritage API during progress check. '
                              'Are you connected to the internet?'):
@@ -145,6 +156,8 @@ def test_check_save_progress_fail(caplog):
 
 @responses.activate
 def test_check_save_progress_wait(caplog):
+    clock = VirtualClock()
+    swh._default_client = swh.SwhClient(polling=PollingStrategy(jitter=0), clock=clock)
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.get(MOCK_SAVE_URL,
                   headers={'X-RateLimit-Remaining': str(1)},
@@ -156,9 +169,10 @@ def test_check_save_progress_wait(caplog):
                   status=200)
     with caplog.at_level(logging.DEBUG):
         swh._check_save_progress('MOCK', None, '123')
-    assert caplog.records[1].msg == 'The save task for MOCK is pending. ' \
-                                    'Waiting for 1 sec. before checking the status again.'
+    assert re.fullmatch(r'The save task for MOCK is pending\. '
+                        r'Waiting for \d\.\d sec\. before checking the status again\.', caplog.records[1].msg)
     assert caplog.records[3].msg == 'Saving MOCK has succeeded with visit status full!'
+    assert clock.sleeps == [1.0]
 
 
 @responses.activate
@@ -176,9 +190,9 @@ def test_save_400():
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.post(MOCK_SAVE_URL, status=400, body=b'NO_URL')
     with pytest.raises(swh.SwhSaveError,
-                       match=f'An invalid visit type or origin url has been provided.\n'
-                             f'URL: MOCK\n{str(b"NO_URL")}'):
+                       match='An invalid visit type or origin url has been provided.\nURL: MOCK') as excinfo:
         swh.save('MOCK', False, None)
+    assert excinfo.value.raw is None  # The response is only kept on request
 
 
 @responses.activate
@@ -186,7 +200,7 @@ def test_save_403():
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.post(MOCK_SAVE_URL, status=403, body=b'BLACKLISTED')
     with pytest.raises(swh.SwhSaveError,
-                       match=f'The provided origin url is blacklisted.\nURL: MOCK\n{str(b"BLACKLISTED")}'):
+                       match='The provided origin url is blacklisted.\nURL: MOCK'):
         swh.save('MOCK', False, None)
 
 
@@ -195,16 +209,18 @@ def test_save_404():
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.post(MOCK_SAVE_URL, status=404, body=b'NOT FOUND')
     with pytest.raises(swh.SwhSaveError,
-                       match=f'No save requests have been found for a given origin.\nURL: MOCK\n{str(b"NOT FOUND")}'):
+                       match='No save requests have been found for a given origin.\nURL: MOCK'):
         swh.save('MOCK', False, None)
 
 
 @responses.activate
 def test_save_429(caplog):
+    clock = VirtualClock(start=1_000_000_000)
+    swh._default_client = swh.SwhClient(clock=clock)
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.post(MOCK_SAVE_URL,
                    status=429,
-                   headers={'X-RateLimit-Reset': str(int(time.time()) + 1)})
+                   headers={'X-RateLimit-Reset': str(int(clock.time()) + 1)})
     responses.post(MOCK_SAVE_URL,
                    headers={'X-RateLimit-Remaining': str(1)},
                    body='{"loading_task_id": "123", "save_task_status": "succeeded", "visit_status": "full",'
@@ -219,6 +235,7 @@ def test_save_429(caplog):
         swh.save('MOCK', False, None)
     assert caplog.records[1].msg == 'Rate limit exceeded. Waiting 3 seconds before retrying.'
     assert caplog.records[4].msg == 'Saving MOCK has succeeded with visit status full!'
+    assert clock.sleeps == [3]
 
 
 @responses.activate
@@ -234,6 +251,8 @@ def test_save_unknown_status(caplog):
 
 @responses.activate
 def test_save_succeed(caplog):
+    clock = VirtualClock()
+    swh._default_client = swh.SwhClient(polling=PollingStrategy(jitter=0), clock=clock)
     responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
     responses.post(MOCK_SAVE_URL,
                    headers={'X-RateLimit-Remaining': str(1)},
@@ -247,10 +266,11 @@ def test_save_succeed(caplog):
                   status=200)
     with caplog.at_level(logging.DEBUG):
         swh.save('MOCK', False, None)
-    assert caplog.records[1].msg == 'The request to save MOCK is still pending. ' \
-                                    'Waiting for 1 sec. before checking the status again.'
+    assert re.fullmatch(r'The request to save MOCK is still pending\. '
+                        r'Waiting for \d\.\d sec\. before checking the status again\.', caplog.records[1].msg)
     assert caplog.records[4].msg == 'Saving MOCK has succeeded with visit status full!'
-    assert caplog.records[6].msg == 'Saving MOCK has succeeded with visit status full!'
+    assert len(caplog.records) == 5  # The save progress is only checked once
+    assert clock.sleeps == [1.0]
 
 
 @responses.activate
@@ -266,29 +286,17 @@ def test_auth_token_header_log(caplog):
     assert caplog.records[0].msg == 'Making authenticated requests (authorization token).'
 
 
-@responses.activate
-def test_get_current_result_pass():
-    responses.get(MOCK_SAVE_URL,
-                  headers={'X-RateLimit-Remaining': str(1)},
-                  body='[{"loading_task_id": "123", "msg": "HIT"},'
-                       '{"loading_task_id": "122", "msg": "MISS"}]',
-                  status=200)
-    response_json = requests.get(MOCK_SAVE_URL).json()
-    assert swh._get_current_result(response_json, '123')['msg'] == 'HIT'
+def test_find_current_result_selects_task():
+    text = '[{"loading_task_id": "123", "msg": "HIT"}, {"loading_task_id": "122", "msg": "MISS"}]'
+    assert swh._find_current_result(text, '123')['msg'] == 'HIT'
 
 
-@responses.activate
-def test_get_current_result_raise():
-    responses.get(MOCK_SAVE_URL,
-                  headers={'X-RateLimit-Remaining': str(1)},
-                  body='[{"loading_task_id": "123", "msg": "HIT", "origin_url": "MOCK"},'
-                       '{"loading_task_id": "122", "msg": "MISS", "origin_url": "MOCK"}]',
-                  status=200)
-    response_json = requests.get(MOCK_SAVE_URL).json()
+def test_find_current_result_raise_for_other_task():
+    text = ('[{"loading_task_id": "123", "msg": "HIT", "origin_url": "MOCK"},'
+            '{"loading_task_id": "122", "msg": "MISS", "origin_url": "MOCK"}]')
     with pytest.raises(swh.SwhSaveError,
-                       match='Failed to retrieve the save task for MOCK.\n'
-                             r'Full response: \[\{.+\}\]'):
-        swh._get_current_result(response_json, '124')
+                       match=r'^Failed to retrieve the save task for MOCK\.$'):
+        swh._find_current_result(text, '124')
 
 
 @responses.activate
@@ -300,6 +308,237 @@ def test_check_status_rejected():
                   status=200)
     response = requests.get(MOCK_SAVE_URL)
     with pytest.raises(swh.SwhSaveError,
-                       match='The request to save MOCK has been rejected:\nNotes: MISS\n'
-                             r'Full response: b.*'):
+                       match='^The request to save MOCK has been rejected:\nNotes: MISS$'):
         swh._check_status(response, None, '123')
+
+
+def test_client_shares_adapter_across_threads():
+    client = swh.SwhClient(pool_maxsize=4)
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(client.session))
+    thread.start()
+    thread.join()
+    assert client.session is client.session
+    assert sessions[0] is not client.session
+    assert sessions[0].get_adapter('https://x.y/') is client.session.get_adapter('https://x.y/')
+    client.close()
+
+
+@responses.activate
+def test_client_api_root_url():
+    responses.get('https://staging.api/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
+    responses.post('https://staging.api/api/1/origin/save/git/url/MOCK/',
+                   body='{"method": "POST"}', status=200,
+                   content_type='application/json')
+    with swh.SwhClient(api_root_url='https://staging.api/api/1') as client:
+        assert client._init_save('MOCK', None).content == b'{"method": "POST"}'
+
+
+@responses.activate
+def test_save_uses_default_client():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(1)})
+    responses.post(MOCK_SAVE_URL, status=200, body='{"loading_task_id": "123"}')
+    swh.save('MOCK', True, None)
+    assert swh._get_default_client() is swh._get_default_client()
+    assert swh._get_default_client().session.get_adapter(MOCK_SAVE_URL) is swh._get_default_client().transport.adapter
+
+
+def _mock_origin(name, save_status='succeeded', request_status='accepted'):
+    url = f'https://archive.softwareheritage.org/api/1/origin/save/git/url/{name}/'
+    body = (f'{{"loading_task_id": "{name}-1", "save_task_status": "{save_status}", "visit_status": "full",'
+            f'"origin_url": "{name}", "save_request_status": "{request_status}", "note": "NOTE"}}')
+    responses.post(url, body=body, status=200, headers={'X-RateLimit-Remaining': str(100)})
+    responses.get(url, body=f'[{body}]', status=200, headers={'X-RateLimit-Remaining': str(100)})
+
+
+@responses.activate
+def test_save_many():
+    ping = responses.get('https://archive.softwareheritage.org/api/1/ping/',
+                         headers={'X-RateLimit-Remaining': str(100)})
+    for i in range(10):
+        _mock_origin(f'OK{i}')
+    _mock_origin('FAIL', save_status='failed')
+    _mock_origin('REJECT', request_status='rejected')
+    responses.post('https://archive.softwareheritage.org/api/1/origin/save/git/url/BLACK/', status=403)
+    origins = (f'OK{i}' for i in range(10))
+    results = {r.origin_url: r for r in swh.save_many(itertools.chain(origins, ['FAIL', 'REJECT', 'BLACK']),
+                                                      max_workers=3)}
+    assert len(results) == 13
+    assert all(results[f'OK{i}'].outcome is swh.SaveOutcome.SUCCEEDED for i in range(10))
+    assert results['OK0'].error is None
+    assert results['FAIL'].outcome is swh.SaveOutcome.FAILED
+    assert 'has failed with visit status' in str(results['FAIL'].error)
+    assert results['REJECT'].outcome is swh.SaveOutcome.REJECTED
+    assert isinstance(results['REJECT'].error, swh_errors.SwhSaveRejectedError)
+    assert results['BLACK'].outcome is swh.SaveOutcome.REJECTED
+    assert ping.call_count == 1  # All workers share one rate limiter
+
+
+@responses.activate
+def test_save_many_consumes_origins_lazily():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    for i in range(20):
+        _mock_origin(f'OK{i}')
+    consumed = []
+
+    def origins():
+        for i in range(20):
+            consumed.append(i)
+            yield f'OK{i}'
+
+    results = swh.save_many(origins(), max_workers=2)
+    next(results)
+    assert len(consumed) < 20
+    results.close()
+
+
+@responses.activate
+def test_save_returns_polls():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    responses.post(MOCK_SAVE_URL,
+                   body='{"loading_task_id": "123", "save_task_status": "pending", "visit_status": null, '
+                        '"origin_url": "MOCK", "save_request_status": "accepted"}',
+                   status=200)
+    for status in ('not yet scheduled', 'scheduled', 'succeeded'):
+        responses.get(MOCK_SAVE_URL,
+                      body=f'[{{"loading_task_id": "123", "save_task_status": "{status}", "visit_status": "full",'
+                           f'"origin_url": "MOCK", "save_request_status": "accepted"}}]',
+                      status=200)
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, jitter=0))
+    assert client.save('MOCK', False, None).polls == 3
+
+
+@responses.activate
+def test_save_timeout():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    responses.post(MOCK_SAVE_URL,
+                   body='{"loading_task_id": "123", "save_task_status": "pending", "visit_status": null, '
+                        '"origin_url": "MOCK", "save_request_status": "pending"}',
+                   status=200)
+    responses.get(MOCK_SAVE_URL,
+                  body='[{"loading_task_id": "123", "save_task_status": "pending", "visit_status": null,'
+                       '"origin_url": "MOCK", "save_request_status": "pending"}]',
+                  status=200)
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0.01, factor=2, timeout=0.1))
+    with pytest.raises(swh_errors.SwhSaveTimeoutError, match='Saving MOCK has not completed within 0.1 seconds'):
+        client.save('MOCK', False, None)
+    result = next(client.save_many(['MOCK']))
+    assert result.outcome is swh.SaveOutcome.FAILED
+    assert 0 < result.polls < 10
+
+
+def test_save_polling_is_not_recursive():
+    # Thousands of status checks must not exhaust the recursion limit
+    client = swh.SwhClient(polling=PollingStrategy(initial_delay=0, jitter=0))
+    statuses = iter(['scheduled'] * (sys.getrecursionlimit() + 10) + ['succeeded'])
+    client._request = lambda *args: _FakeResponse(next(statuses))
+    assert client._check_save_progress('MOCK', None, '123') == sys.getrecursionlimit() + 11
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, status):
+        self._json = {'loading_task_id': '123', 'save_task_status': status, 'visit_status': 'full'}
+        self.text = json.dumps([self._json])
+
+    def json(self):
+        return self._json
+
+
+MOCK_LATEST_VISIT_URL = 'https://archive.softwareheritage.org/api/1/origin/MOCK/visit/latest/?require_snapshot=true'
+
+
+def _visit(seconds_ago):
+    date = datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)
+    return {'origin': 'MOCK', 'visit': 1, 'date': date.isoformat(), 'status': 'full', 'type': 'git'}
+
+
+@responses.activate
+def test_save_min_age_skips_recently_visited_origin():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    visit = responses.get(MOCK_LATEST_VISIT_URL, json=_visit(60))
+    post = responses.post(MOCK_SAVE_URL)
+    client = swh.SwhClient()
+    assert client.save('MOCK', True, None, min_age=3600).polls == 0
+    assert client.save('MOCK', True, None, min_age=3600).task_id is None
+    assert post.call_count == 0
+    assert visit.call_count == 1  # The latest visit is cached
+
+
+@responses.activate
+def test_save_min_age_saves_stale_and_unvisited_origins():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    responses.get(MOCK_LATEST_VISIT_URL, json=_visit(7200))
+    responses.get('https://archive.softwareheritage.org/api/1/origin/NEW/visit/latest/?require_snapshot=true',
+                  status=404)
+    post = responses.post(MOCK_SAVE_URL)
+    post_new = responses.post('https://archive.softwareheritage.org/api/1/origin/save/git/url/NEW/')
+    client = swh.SwhClient()
+    client.save('MOCK', True, None, min_age=3600)
+    client.save('NEW', True, None, min_age=3600)
+    assert post.call_count == 1
+    assert post_new.call_count == 1
+    assert client.visit_cache.lookup('NEW') == (False, None)  # Saving invalidates the cached visit
+
+
+@responses.activate
+def test_save_min_age_saves_when_lookup_fails(caplog):
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    responses.get(MOCK_LATEST_VISIT_URL, status=500)
+    post = responses.post(MOCK_SAVE_URL)
+    swh.SwhClient(retry=NO_RETRY).save('MOCK', True, None, min_age=3600)
+    assert post.call_count == 1
+    assert 'Could not check the latest visit of MOCK' in caplog.text
+
+
+@responses.activate
+def test_save_many_min_age():
+    responses.get('https://archive.softwareheritage.org/api/1/ping/', headers={'X-RateLimit-Remaining': str(100)})
+    responses.get(MOCK_LATEST_VISIT_URL, json=_visit(60))
+    results = list(swh.save_many(['MOCK'], min_age=3600))
+    assert results == [swh.BulkSaveResult('MOCK', swh.SaveOutcome.SKIPPED)]
+
+
+def test_find_current_result_stops_at_task():
+    # The objects after the current task are not parsed, so that invalid JSON there goes unnoticed
+    text = '[ {"loading_task_id": 2, "origin_url": "MOCK"} , {"loading_task_id": 1, "origin_url": "MOCK"}, INVALID'
+    assert swh._find_current_result(text, 1)['loading_task_id'] == 1
+    with pytest.raises(ValueError):
+        swh._find_current_result(text, 3)
+    assert swh._find_current_result('{"loading_task_id": 1}', 5) == {'loading_task_id': 1}
+
+
+def test_find_current_result_remembers_position():
+    poll = PollingStrategy().start('MOCK')
+    history = ', '.join(f'{{"loading_task_id": {i}, "origin_url": "MOCK"}}' for i in range(100, 0, -1))
+    text = f'[{history}]'
+    assert swh._find_current_result(text, 42, poll)['loading_task_id'] == 42
+    assert text[poll.position:].startswith('{"loading_task_id": 42,')
+    # The remembered position is tried first, and a stale position falls back to a full scan
+    assert swh._find_current_result(f'[{history}, INVALID]', 42, poll)['loading_task_id'] == 42
+    shifted = f'[{{"loading_task_id": 101, "origin_url": "MOCK"}}, {history}]'
+    assert swh._find_current_result(shifted, 42, poll)['loading_task_id'] == 42
+    assert shifted[poll.position:].startswith('{"loading_task_id": 42,')
+
+
+def test_find_current_results_stop_at_last_task():
+    polls = {task_id: PollingStrategy().start('MOCK') for task_id in (2, 4)}
+    history = ', '.join(f'{{"loading_task_id": {i}, "origin_url": "MOCK"}}' for i in range(5, 0, -1))
+    text = f'[{history}, INVALID]'
+    found = swh._find_current_results(text, list(polls.items()))
+    assert sorted(found) == [2, 4]
+    assert text[polls[2].position:].startswith('{"loading_task_id": 2,')
+    # The remembered positions are tried first, so that the list is not parsed at all
+    corrupt = text.replace('"loading_task_id": 5', '"loading_task_id": X')
+    assert swh._find_current_results(corrupt, [(4, polls[4])]) == {4: found[4]}
+    assert swh._find_current_results(text.replace('INVALID', '{}'), list(polls.items())) == found
+    assert swh._find_current_results(' [ ] ', [(1, polls[2])]) == {}
+    assert swh._find_current_results('{"loading_task_id": 7}', []) == {7: {'loading_task_id': 7}}
+
+
+def test_find_current_result_raise():
+    with pytest.raises(swh.SwhSaveError, match='Failed to retrieve the save task for MOCK.'):
+        swh._find_current_result('[{"loading_task_id": 1, "origin_url": "MOCK"}]', 2)
+    with pytest.raises(swh.SwhSaveError, match='Failed to retrieve the save task for MOCK.'):
+        swh._find_current_result(' [ ] ', 2, PollingStrategy().start('MOCK'))
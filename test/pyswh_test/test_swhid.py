@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+from datetime import datetime, timedelta, timezone
+import os
+
+import pytest
+
+from pyswh import swhid
+from pyswh.swhid import ContentCache
+
+# The identifiers of the checkout are those of `git write-tree` and `git commit`
+CHECKOUT_SWHID = 'swh:1:dir:d49f37416174f2dba2151b3b616da4f6888dd5c4'
+
+
+@pytest.fixture
+def checkout(tmp_path):
+    (tmp_path / 'a' / 'b').mkdir(parents=True)
+    (tmp_path / 'a-b').mkdir()
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.git' / 'HEAD').write_text('ref: refs/heads/main\n')
+    (tmp_path / 'a' / 'b' / 'x').write_text('hello world\n')
+    (tmp_path / 'a-b' / 'y').write_text('y\n')
+    (tmp_path / 'a.c').write_text('z\n')
+    (tmp_path / 'e').write_text('')
+    (tmp_path / 'run.sh').write_text('#!/bin/sh\n')
+    (tmp_path / 'run.sh').chmod(0o755)
+    os.symlink('a/b/x', tmp_path / 'link')
+    return tmp_path
+
+
+def test_content_swhid(checkout):
+    assert swhid.content_swhid(checkout / 'e') == 'swh:1:cnt:e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+    assert swhid.identify(checkout / 'a' / 'b' / 'x') == 'swh:1:cnt:3b18e512dba79e4c8300dd08aeb37f8e728b8dad'
+
+
+def test_directory_swhid(checkout):
+    assert swhid.identify(checkout) == CHECKOUT_SWHID
+    swhids = list(swhid.iter_swhids(checkout))
+    assert swhids[-1] == ('', CHECKOUT_SWHID)
+    paths = [path for path, _ in swhids]
+    assert paths.index('a/b/x') < paths.index('a/b') < paths.index('a')
+    assert '.git/HEAD' not in paths
+    (checkout / 'empty').mkdir()
+    assert dict(swhid.iter_swhids(checkout))['empty'] == 'swh:1:dir:4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+
+
+def test_directory_swhid_uses_owner_executable_bit(checkout):
+    (checkout / 'run.sh').chmod(0o744)
+    assert swhid.identify(checkout) == CHECKOUT_SWHID
+    (checkout / 'run.sh').chmod(0o644)
+    regular = swhid.identify(checkout)
+    assert regular != CHECKOUT_SWHID
+    for mode in (0o611, 0o655):
+        (checkout / 'run.sh').chmod(mode)
+        assert swhid.identify(checkout) == regular
+
+
+def test_directory_swhid_on_process_pool(checkout, monkeypatch):
+    monkeypatch.setattr(swhid, '_MIN_POOL_FILES', 0)
+    assert swhid.directory_swhid(checkout, max_workers=2) == CHECKOUT_SWHID
+
+
+def test_cache_skips_unchanged_files(checkout, tmp_path_factory, monkeypatch):
+    path = str(tmp_path_factory.mktemp('cache') / 'contents.json')
+    assert swhid.directory_swhid(checkout, cache=ContentCache(path)) == CHECKOUT_SWHID
+    cache = ContentCache(path)
+    assert len(cache) == 5
+    read = []
+    hash_file = swhid._hash_file
+    monkeypatch.setattr(swhid, '_hash_file', lambda p: read.append(p) or hash_file(p))
+    (checkout / 'a.c').write_text('changed\n')
+    (checkout / 'e').unlink()
+    assert swhid.directory_swhid(checkout, cache=cache) != CHECKOUT_SWHID
+    assert read == [str(checkout / 'a.c')]
+    assert len(ContentCache(path)) == 4
+
+
+def test_revision_swhid():
+    author_date = datetime.fromtimestamp(1665655200, timezone(timedelta(hours=2)))
+    committer_date = datetime.fromtimestamp(1792188846, timezone.utc)
+    assert swhid.revision_swhid('swh:1:dir:2c436d7869120f00fd2e24af290b1d257aff8f2f', 'J <j@x>', author_date,
+                                'msg\n', committer_date=committer_date) == \
+        'swh:1:rev:3f2148655417ff416cd2980d37fda3dcf53a7d49'
+    with pytest.raises(ValueError, match='timezone-aware'):
+        swhid.revision_swhid(40 * '0', 'J <j@x>', datetime(2022, 10, 13), 'msg\n')
@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+
+import pytest
+import requests
+
+from pyswh import swh
+from pyswh.errors import SwhRateLimitError, SwhSaveError, SwhSaveRejectedError
+from pyswh.polling import PollingStrategy
+from pyswh.ratelimit import RateLimiter
+from pyswh.retry import NO_RETRY
+from pyswh.testing import MockSwhServer
+
+ORIGIN = 'https://example.org/repo'
+
+
+def _client(server, **kwargs):
+    return swh.SwhClient(api_root_url=server.api_root_url, polling=PollingStrategy(initial_delay=0.02, jitter=0),
+                         **kwargs)
+
+
+def test_mock_server_save_goes_through_task_states():
+    with MockSwhServer(pending_delay=0.05, schedule_delay=0.05, run_delay=0.05, visit_delay=0.05) as server:
+        response = requests.post(server.api_root_url + 'origin/save/git/url/' + ORIGIN + '/')
+        assert response.json()['save_request_status'] == 'pending'
+        with _client(server) as client:
+            assert client._check_status(response, None, response.json()['loading_task_id']) >= 3
+            history = requests.get(server.api_root_url + 'origin/save/git/url/' + ORIGIN + '/').json()
+        assert len(history) == 1
+        assert history[0]['save_task_status'] == 'succeeded'
+        assert history[0]['visit_status'] == 'full'
+        assert server.requests['save'] == 1
+        assert server.requests['status'] >= 4
+
+
+def test_mock_server_reports_latest_visit():
+    with MockSwhServer() as server, _client(server) as client:
+        assert client.latest_visit(ORIGIN) is None
+        client.save(ORIGIN, False, None)
+        client.visit_cache.discard(ORIGIN)
+        assert client.latest_visit(ORIGIN)['status'] == 'full'
+
+
+def test_mock_server_enforces_rate_limit():
+    with MockSwhServer(rate_limit=2) as server:
+        url = server.api_root_url + 'origin/save/git/url/' + ORIGIN + '/'
+        assert requests.post(url).headers['X-RateLimit-Remaining'] == '1'
+        assert requests.post(url).headers['X-RateLimit-Remaining'] == '0'
+        assert requests.post(url).status_code == 429
+        assert server.throttled == 1
+        # Pings do not use up the budget, but are throttled once it has been used up
+        assert requests.get(server.api_root_url + 'ping/').status_code == 429
+        with _client(server, rate_limiter=RateLimiter(block=False)) as client:
+            with pytest.raises(SwhRateLimitError):
+                client.save(ORIGIN, True, None)
+
+
+def test_mock_server_injects_rejections_and_failures():
+    with MockSwhServer(reject_rate=1.0) as server, _client(server) as client:
+        with pytest.raises(SwhSaveRejectedError):
+            client.save(ORIGIN, False, None)
+    with MockSwhServer(failure_rate=1.0) as server, _client(server) as client:
+        with pytest.raises(SwhSaveError, match='has failed'):
+            client.save(ORIGIN, False, None)
+
+
+def test_status_check_server_error_fails_save():
+    with MockSwhServer(schedule_delay=1.0) as server, _client(server, retry=NO_RETRY) as client:
+        task_id = client._init_save(ORIGIN, None).json()['loading_task_id']
+        server.error_rate = 1.0
+        with pytest.raises(SwhSaveError, match='HTTP status 502'):
+            client._check_save_progress(ORIGIN, None, task_id)
+
+
+def test_status_check_server_error_fails_multiplexed_save():
+    with MockSwhServer(schedule_delay=0.05) as server, \
+            _client(server, multiplex_polling=True, retry=NO_RETRY) as client:
+        handle = client.submit(ORIGIN)
+        server.error_rate = 1.0
+        assert isinstance(handle.exception(timeout=5), SwhSaveError)
+
+
+def test_mock_server_bulk_save():
+    with MockSwhServer(schedule_delay=0.02, failure_rate=0.5, seed=1) as server, _client(server) as client:
+        origins = [f'{ORIGIN}-{i}' for i in range(10)]
+        results = list(client.save_many(origins, max_workers=4))
+    assert sorted(result.origin_url for result in results) == sorted(origins)
+    outcomes = {result.outcome for result in results}
+    assert outcomes == {swh.SaveOutcome.SUCCEEDED, swh.SaveOutcome.FAILED}
+
+
+def test_mock_server_async_save():
+    aio = pytest.importorskip('pyswh.aio')
+
+    async def save():
+        async with aio.AsyncSwhClient(api_root_url=server.api_root_url,
+                                      polling=PollingStrategy(initial_delay=0.02, jitter=0)) as client:
+            return await client.save(ORIGIN, False, None)
+
+    with MockSwhServer(schedule_delay=0.05) as server:
+        assert asyncio.run(save()).polls >= 2
@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import json
+import subprocess
+import sys
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhSaveError
+from pyswh.polling import PollingStrategy
+from pyswh.retry import NO_RETRY
+from pyswh.testing import MockSwhServer
+from pyswh.transport import (Headers, MemoryTransport, RequestsTransport, Response, Transport,
+                             TransportConnectionError, TransportError, Urllib3Transport, create_transport)
+
+API = 'https://archive.softwareheritage.org/api/1/'
+SAVE_URL = API + 'origin/save/git/url/MOCK/'
+
+
+def _task(save_status):
+    return {'loading_task_id': 1, 'origin_url': 'MOCK', 'save_request_status': 'accepted',
+            'save_task_status': save_status, 'visit_status': 'full' if save_status == 'succeeded' else None}
+
+
+def test_headers_are_case_insensitive():
+    headers = Headers({'X-RateLimit-Remaining': '5'})
+    assert headers['x-ratelimit-remaining'] == '5'
+    assert headers.get('X-RATELIMIT-REMAINING') == '5'
+    assert list(headers) == ['X-RateLimit-Remaining']
+    assert 'X-RateLimit-Reset' not in headers
+
+
+def test_response_decodes_json():
+    response = Response(200, Headers(), '{"a": "ä"}'.encode('utf-8'))
+    assert response.text == '{"a": "ä"}'
+    assert response.json() == {'a': 'ä'}
+
+
+def test_memory_transport_replays_responses_in_order():
+    transport = MemoryTransport()
+    transport.add('GET', SAVE_URL, json=[_task('scheduled')])
+    transport.add('GET', SAVE_URL, json=[_task('succeeded')])
+    statuses = [transport.request('get', SAVE_URL, {}).json()[0]['save_task_status'] for _ in range(3)]
+    assert statuses == ['scheduled', 'succeeded', 'succeeded']
+    assert [call[:2] for call in transport.calls] == [('GET', SAVE_URL)] * 3
+    with pytest.raises(TransportConnectionError):
+        transport.request('POST', SAVE_URL, {})
+
+
+def test_memory_transport_streams_responses():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'vault/flat/raw/', body=b'abcdef', headers={'Content-Length': '6'})
+    with transport.stream('GET', API + 'vault/flat/raw/', {}) as response:
+        assert response.headers['content-length'] == '6'
+        assert list(response.iter_content(4)) == [b'abcd', b'ef']
+
+
+def test_memory_transport_falls_back_to_handler():
+    transport = MemoryTransport(lambda method, url, headers, body: Response(404, Headers(), b'{}'))
+    assert transport.request('GET', API + 'ping/', {}).status_code == 404
+
+
+def test_client_saves_through_memory_transport():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', SAVE_URL, json=_task('not yet scheduled'))
+    transport.add('GET', SAVE_URL, json=[_task('scheduled')])
+    transport.add('GET', SAVE_URL, json=[_task('succeeded')])
+    with swh.SwhClient(transport=transport, polling=PollingStrategy(initial_delay=0, jitter=0)) as client:
+        assert client.save('MOCK', False, 'TOKEN').polls == 2
+    assert transport.calls[1][2]['Authorization'] == 'Bearer TOKEN'
+
+
+def test_client_does_not_close_passed_transport():
+    class ClosingTransport(Transport):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    transport = ClosingTransport()
+    with swh.SwhClient(transport=transport) as client:
+        assert client.transport is transport
+    assert not transport.closed
+
+
+def test_client_reports_connection_errors_as_save_errors():
+    with swh.SwhClient(api_root_url='http://127.0.0.1:1/api/1/', transport=Urllib3Transport(),
+                       retry=NO_RETRY) as client:
+        with pytest.raises(SwhSaveError, match='Could not connect'):
+            client.save('MOCK', True, None)
+
+
+@pytest.mark.parametrize('bodies', [[], [_task('not yet scheduled')]])
+def test_client_reports_transport_errors_as_save_errors(bodies):
+    def handler(method, url, headers, body):
+        if bodies:
+            return Response(200, Headers(), json.dumps(bodies.pop()).encode('utf-8'))
+        raise TransportError('Read timed out')
+
+    transport = MemoryTransport(handler)
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    with swh.SwhClient(transport=transport, retry=NO_RETRY) as client:
+        with pytest.raises(SwhSaveError, match='Request to the Software Heritage API failed') as ei:
+            client.save('MOCK', False, None)
+    assert isinstance(ei.value.__cause__, TransportError)
+
+
+@pytest.mark.parametrize('transport', [RequestsTransport, Urllib3Transport])
+def test_transports_save_against_mock_server(transport):
+    with MockSwhServer(schedule_delay=0.05, rate_limit=100) as server, \
+            swh.SwhClient(api_root_url=server.api_root_url, transport=transport(),
+                          polling=PollingStrategy(initial_delay=0.02, jitter=0)) as client:
+        assert client.save('https://example.org/repo', False, None).polls >= 2
+        assert client.rate_limiter.remaining < 100
+
+
+def test_transport_from_environment(monkeypatch):
+    monkeypatch.setenv('PYSWH_TRANSPORT', 'urllib3')
+    assert isinstance(swh.SwhClient().transport, Urllib3Transport)
+    monkeypatch.delenv('PYSWH_TRANSPORT')
+    assert isinstance(swh.SwhClient().transport, RequestsTransport)
+    with pytest.raises(ValueError, match='Unknown transport'):
+        create_transport('curl')
+
+
+def test_import_does_not_load_http_libraries():
+    code = "import sys, pyswh.swh; print(sorted({'requests', 'urllib3', 'asyncio'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
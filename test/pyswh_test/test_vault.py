@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2022 Stephan Druskat <pyswh@sdruskat.net>
+#
+# SPDX-License-Identifier: MIT
+import gzip
+import itertools
+import json
+import os
+
+import pytest
+
+from pyswh import swh
+from pyswh.errors import SwhVaultError
+from pyswh.polling import PollingStrategy
+from pyswh.retry import RetryPolicy
+from pyswh.transport import Headers, MemoryTransport, Response, TransportError
+from pyswh.vault import BundleVerifier, parse_content_range, resolve_bundle_type
+
+API = 'https://archive.softwareheritage.org/api/1/'
+DIRECTORY = 'swh:1:dir:' + 40 * '1'
+REVISION = 'swh:1:rev:' + 40 * '2'
+BUNDLE = gzip.compress(os.urandom(50_000) + 100_000 * b'x')
+POLLING = PollingStrategy(initial_delay=0.0, jitter=0)
+
+
+def _vault_url(swhid, bundle_type='flat'):
+    return f'{API}vault/{bundle_type}/{swhid}/'
+
+
+class _BundleServer(MemoryTransport):
+    """
+    Serves bundles with support for ranges, and cuts the first `interruptions` downloads short.
+    """
+
+    def __init__(self, bundles, interruptions=0, ranges=True):
+        super().__init__(self._serve)
+        self.bundles = bundles
+        self.interruptions = interruptions
+        self.ranges = ranges
+        self.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '1000'})
+
+    def _serve(self, method, url, headers, body):
+        swhid = next(part for part in url.split('/') if part.startswith('swh:'))
+        bundle = self.bundles[swhid]
+        if not url.endswith('/raw/'):
+            return Response(200, Headers(), json.dumps({
+                'status': 'done', 'swhid': swhid, 'fetch_url': url + 'raw/'}).encode('utf-8'))
+        start = int(headers['Range'][6:-1]) if self.ranges and 'Range' in headers else 0
+        if start >= len(bundle):
+            return Response(416, Headers({'Content-Range': f'bytes */{len(bundle)}'}), b'')
+        if start:
+            return Response(206, Headers({'Content-Range': f'bytes {start}-{len(bundle) - 1}/{len(bundle)}',
+                                          'Content-Length': str(len(bundle) - start)}), bundle[start:])
+        return Response(200, Headers({'Content-Length': str(len(bundle))}), bundle)
+
+    def stream(self, method, url, headers, timeout=None, body=None):
+        response = super().stream(method, url, headers, timeout, body)
+        if self.interruptions and url.endswith('/raw/'):
+            self.interruptions -= 1
+            chunks = response._chunks
+
+            def interrupted(size):
+                yield from itertools.islice(chunks(size), 1)
+                raise TransportError('Connection lost')
+
+            response._chunks = interrupted
+        return response
+
+
+def _client(transport):
+    return swh.SwhClient(transport=transport, retry=RetryPolicy(initial_delay=0.0, jitter=0))
+
+
+def test_resolve_bundle_type():
+    assert resolve_bundle_type(DIRECTORY) == 'flat'
+    assert resolve_bundle_type(REVISION) == 'gitfast'
+    assert resolve_bundle_type(REVISION, 'git-bare') == 'git-bare'
+    with pytest.raises(ValueError, match='cannot cook'):
+        resolve_bundle_type(DIRECTORY, 'gitfast')
+    with pytest.raises(ValueError, match='cannot cook'):
+        resolve_bundle_type('swh:1:cnt:' + 40 * '3')
+
+
+def test_parse_content_range():
+    assert parse_content_range('bytes 100-199/1000') == (100, 1000)
+    assert parse_content_range('bytes */1000') == (None, 1000)
+    assert parse_content_range('bytes 0-9/*') == (0, None)
+    assert parse_content_range(None) == (None, None)
+
+
+def test_bundle_verifier():
+    verifier = BundleVerifier()
+    for i in range(0, len(BUNDLE), 1000):
+        verifier.update(BUNDLE[i:i + 1000])
+    verifier.finish()
+    assert verifier.compressed and verifier.size == len(BUNDLE)
+    truncated = BundleVerifier()
+    truncated.update(BUNDLE[:-10])
+    with pytest.raises(SwhVaultError, match='truncated'):
+        truncated.finish()
+    corrupt = BundleVerifier()
+    with pytest.raises(SwhVaultError, match='corrupt'):
+        corrupt.update(BUNDLE[:-8] + bytes(8))
+        corrupt.finish()
+    plain = BundleVerifier()
+    plain.update(b'not compressed')
+    plain.finish()
+    assert plain.compressed is False
+
+
+def test_cook_polls_until_done():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', _vault_url(DIRECTORY), json={'status': 'new'})
+    transport.add('GET', _vault_url(DIRECTORY), json={'status': 'pending', 'progress_message': 'Cooking'})
+    transport.add('GET', _vault_url(DIRECTORY), json={'status': 'done', 'fetch_url': _vault_url(DIRECTORY) + 'raw/'})
+    with _client(transport) as client:
+        assert client.cook(DIRECTORY, polling=POLLING)['fetch_url'] == _vault_url(DIRECTORY) + 'raw/'
+    assert [call[0] for call in transport.calls[1:]] == ['POST', 'GET', 'GET']
+
+
+def test_cook_fails():
+    transport = MemoryTransport()
+    transport.add('GET', API + 'ping/', headers={'X-RateLimit-Remaining': '100'})
+    transport.add('POST', _vault_url(REVISION, 'gitfast'), json={'status': 'failed', 'progress_message': 'Boom'})
+    with _client(transport) as client:
+        with pytest.raises(SwhVaultError, match='Boom'):
+            client.cook(REVISION, polling=POLLING)
+
+
+def test_fetch_resumes_interrupted_download(tmp_path):
+    transport = _BundleServer({DIRECTORY: BUNDLE}, interruptions=2)
+    path = str(tmp_path / 'bundle.tar.gz')
+    with _client(transport) as client:
+        assert client.fetch(DIRECTORY, path) == len(BUNDLE)
+    with open(path, 'rb') as f:
+        assert f.read() == BUNDLE
+    assert not os.path.exists(path + '.part')
+    ranges = [call[2].get('Range') for call in transport.calls if call[1].endswith('/raw/')]
+    assert ranges[0] is None and all(ranges[1:])
+
+
+def test_download_resumes_partial_file(tmp_path):
+    transport = _BundleServer({DIRECTORY: BUNDLE})
+    path = str(tmp_path / 'bundle.tar.gz')
+    with open(path + '.part', 'wb') as f:
+        f.write(BUNDLE[:1000])
+    with _client(transport) as client:
+        client.download(DIRECTORY, path, chunk_size=4096)
+    assert transport.calls[-1][2]['Range'] == 'bytes=1000-'
+    with open(path, 'rb') as f:
+        assert f.read() == BUNDLE
+
+
+def test_download_starts_over_if_range_is_ignored(tmp_path):
+    transport = _BundleServer({DIRECTORY: BUNDLE}, ranges=False)
+    path = str(tmp_path / 'bundle.tar.gz')
+    with open(path + '.part', 'wb') as f:
+        f.write(BUNDLE[:1000])
+    with _client(transport) as client:
+        assert client.download(DIRECTORY, path) == len(BUNDLE)
+    with open(path, 'rb') as f:
+        assert f.read() == BUNDLE
+
+
+def test_download_rejects_corrupt_bundle(tmp_path):
+    transport = _BundleServer({DIRECTORY: BUNDLE[:-8] + bytes(8)})
+    path = str(tmp_path / 'bundle.tar.gz')
+    with _client(transport) as client:
+        with pytest.raises(SwhVaultError, match='corrupt'):
+            client.download(DIRECTORY, path)
+    assert not os.path.exists(path) and not os.path.exists(path + '.part')
+
+
+def test_fetch_many(tmp_path):
+    bundles = {DIRECTORY: BUNDLE, REVISION: gzip.compress(b'revision')}
+    transport = _BundleServer(bundles, interruptions=1)
+    jobs = [(swhid, str(tmp_path / swhid)) for swhid in bundles] + [('swh:1:cnt:' + 40 * '3', str(tmp_path / 'c'))]
+    with _client(transport) as client:
+        results = {result.swhid: result for result in client.fetch_many(jobs, max_workers=2, polling=POLLING)}
+    assert results[DIRECTORY].succeeded and results[DIRECTORY].size == len(BUNDLE)
+    assert results[REVISION].succeeded
+    assert not results['swh:1:cnt:' + 40 * '3'].succeeded